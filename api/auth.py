@@ -1,18 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Security, BackgroundTasks, Request
+from fastapi import APIRouter, HTTPException, Depends, status, Security, Request
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
 from schemas import UserCreate, Token, User, RequestEmail, PasswordResetRequest, PasswordReset
 from services.auth import create_access_token, Hash, get_email_from_token, create_password_reset_token, verify_password_reset_token
 from services.users import UserService
 from database.db import get_db
-from services.email import send_email
+from services.email import enqueue_verification_email, enqueue_password_reset_email
+from services.user_cache import user_cache
+from services.rate_limit import limiter, by_ip
+from conf.config import config
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 @router.post("/register", response_model=User, status_code=status.HTTP_201_CREATED)
 async def register_user(
   user_data: UserCreate,
-  background_tasks: BackgroundTasks,
   request: Request,
   db: Session = Depends(get_db),
 ):
@@ -21,7 +23,6 @@ async def register_user(
 
   Args:
     user_data: User data for registration.
-    background_tasks: Background task queue.
     request: HTTP request.
     db: Database session.
 
@@ -46,21 +47,25 @@ async def register_user(
       status_code=status.HTTP_409_CONFLICT,
       detail="Користувач з таким іменем вже існує",
     )
-  user_data.password = Hash().get_password_hash(user_data.password)
+  user_data.password = await Hash().get_password_hash_async(user_data.password)
+  # Queued before create_user commits, so the user and the email are
+  # written in the same transaction.
+  enqueue_verification_email(db, user_data.email, user_data.username, request.base_url)
   new_user = await user_service.create_user(user_data)
-  background_tasks.add_task(
-    send_email, new_user.email, new_user.username, request.base_url
-  )
   return new_user
 
 @router.post("/login", response_model=Token)
+@limiter.limit(config.RATE_LIMIT_LOGIN, key=by_ip)
 async def login_user(
-  form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+  request: Request,
+  form_data: OAuth2PasswordRequestForm = Depends(),
+  db: Session = Depends(get_db),
 ):
   """
   Authenticates user, verifies password, and returns access token.
 
   Args:
+    request: HTTP request.
     form_data: Form data containing username and password.
     db: Database session.
 
@@ -72,7 +77,7 @@ async def login_user(
   """
   user_service = UserService(db)
   user = await user_service.get_user_by_username(form_data.username)
-  if not user or not Hash().verify_password(form_data.password, user.hashed_password):
+  if not user or not await Hash().verify_password_async(form_data.password, user.hashed_password):
     raise HTTPException(
       status_code=status.HTTP_401_UNAUTHORIZED,
       detail="Неправильний логін або пароль",
@@ -84,15 +89,17 @@ async def login_user(
       detail="Електронна адреса не підтверджена",
     )
   access_token = await create_access_token(data={"sub": user.username})
+  await user_cache.record_active(request.app.state.redis, user.username)
   return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/confirmed_email/{token}")
-async def confirmed_email(token: str, db: Session = Depends(get_db)):
+async def confirmed_email(token: str, request: Request, db: Session = Depends(get_db)):
   """
   Confirms a user's email address.
 
   Args:
     token: The email confirmation token.
+    request: HTTP request.
     db: The database session.
 
   Returns:
@@ -111,12 +118,12 @@ async def confirmed_email(token: str, db: Session = Depends(get_db)):
   if user.confirmed:
     return {"message": "Ваша електронна пошта вже підтверджена"}
   await user_service.confirmed_email(email)
+  await user_cache.invalidate(request.app.state.redis, user.username)
   return {"message": "Електронну пошту підтверджено"}
 
 @router.post("/request_email")
 async def request_email(
   body: RequestEmail,
-  background_tasks: BackgroundTasks,
   request: Request,
   db: Session = Depends(get_db),
 ):
@@ -125,7 +132,6 @@ async def request_email(
 
   Args:
     body: RequestEmail object containing the user's email.
-    background_tasks: Background task queue for sending the email.
     request: HTTP request object.
     db: Database session for user operations.
 
@@ -138,23 +144,22 @@ async def request_email(
   if user.confirmed:
       return {"message": "Ваша електронна пошта вже підтверджена"}
   if user:
-      background_tasks.add_task(
-          send_email, user.email, user.username, request.base_url
-      )
+      enqueue_verification_email(db, user.email, user.username, request.base_url)
+      await db.commit()
   return {"message": "Перевірте свою електронну пошту для підтвердження"}
 
 @router.post("/password-reset-request")
 async def request_password_reset(
-  request: PasswordResetRequest,
-  background_tasks: BackgroundTasks,
+  body: PasswordResetRequest,
+  request: Request,
   db: Session = Depends(get_db),
 ):
   """
   Initiates a password reset.
 
   Args:
+    body: A PasswordResetRequest schema object containing the user's email.
     request: The FastAPI request object containing details about the incoming request.
-    background_tasks: A FastAPI background tasks object for sending the email asynchronously.
     db: A database session dependency injected via Depends(get_db).
 
   Raises:
@@ -165,7 +170,7 @@ async def request_password_reset(
     Message
   """
   user_service = UserService(db)
-  user = await user_service.get_user_by_email(request.email)
+  user = await user_service.get_user_by_email(body.email)
   
   if not user:
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Користувач не знайдений.")
@@ -173,7 +178,8 @@ async def request_password_reset(
   token = create_password_reset_token({"sub": user.email})
 
   reset_link = f"{request.base_url}password-reset/{token}"
-  background_tasks.add_task(send_email, user.email, "Оновити пароль", reset_link)
+  enqueue_password_reset_email(db, user.email, user.username, reset_link)
+  await db.commit()
   
   return {"message": "Лист для оновлення паролю був відправлений."}
 
@@ -181,6 +187,7 @@ async def request_password_reset(
 async def reset_password(
   token: str,
   body: PasswordReset,
+  request: Request,
   db: Session = Depends(get_db),
 ):
   """
@@ -189,6 +196,7 @@ async def reset_password(
   Args:
     token: The password reset token string received from the request URL.
     body: A PasswordReset schema object containing the new password.
+    request: HTTP request.
     db: A database session dependency injected via Depends(get_db).
 
   Raises:
@@ -207,9 +215,10 @@ async def reset_password(
   if not user:
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Користувач не знайдений.")
 
-  hashed_password = Hash().get_password_hash(body.new_password)
+  hashed_password = await Hash().get_password_hash_async(body.new_password)
 
-  user.password = hashed_password
+  user.hashed_password = hashed_password
   await user_service.update_user(user)
+  await user_cache.invalidate(request.app.state.redis, user.username)
   
   return {"message": "Пароль успішно оновлено."}
@@ -1,37 +1,129 @@
-from typing import List
+from datetime import UTC, datetime
+from typing import List, TYPE_CHECKING
 
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from database.db import get_db
-from schemas import ContactBase, ContactResponse
+from database.db import get_db, get_redis, sessionmanager
+from schemas import (
+  ContactBase,
+  ContactResponse,
+  ContactBatchGet,
+  ContactBatchResponse,
+  ContactBulkDelete,
+  ContactBulkUpdate,
+  ContactBulkResult,
+  BulkImportReport,
+)
 from services.contacts import ContactService
-from services.auth import get_current_user
+from repository.contacts import BatchTooLargeError
+from services.contacts_io import get_reader, WRITERS
+from services.etags import not_modified
+from services.serializers import contacts_response
+from repository.versions import contact_versions, recent_contact_writes
+from services.auth import get_current_user, get_read_db
+from conf.config import config
 from schemas import User
 
+if TYPE_CHECKING:
+  from aioredis import Redis
+
 router = APIRouter(prefix="/contacts", tags=["contacts"])
 
 @router.get("/", response_model=List[ContactResponse])
 async def read_contacts(
+  request: Request,
+  response: Response,
   skip: int = 0,
-  limit: int = 100,
+  limit: int = Query(100, ge=1, le=1000),
+  cursor: str | None = None,
+  q: str | None = Query(None, min_length=1, max_length=50),
   first_name: str | None = None,
   last_name: str | None = None,
   email: str | None = None,
-  db: AsyncSession = Depends(get_db),
+  db: AsyncSession = Depends(get_read_db),
   user: User = Depends(get_current_user),
 ):
+  # Ranked search orders by similarity and pages by offset only.
+  if q is not None and (cursor is not None or first_name or last_name or email):
+    raise HTTPException(
+      status_code=status.HTTP_400_BAD_REQUEST,
+      detail="q cannot be combined with cursor, first_name, last_name or email",
+    )
+
+  # ETags are per URL, so the query string needs no place in the tag.
+  cached = await not_modified(request, response, contact_versions, user.id)
+  if cached is not None:
+    return cached
+
   contact_service = ContactService(db)
-  contacts = await contact_service.search_contacts(skip, limit, first_name, last_name, email, user)
-  return contacts
+  if q is not None:
+    contacts = await contact_service.search_contacts_ranked(q, skip, limit, user)
+    return contacts_response(contacts, response)
 
+  if cursor is None:
+    contacts = await contact_service.search_contacts(skip, limit, first_name, last_name, email, user)
+    return contacts_response(contacts, response)
+
+  # Keyset mode: an empty `cursor` requests the first page, the next page
+  # cursor is returned in `X-Next-Cursor` and in a `Link: rel="next"` header.
+  try:
+    contacts, next_cursor = await contact_service.search_contacts_page(
+      cursor, limit, first_name, last_name, email, user
+    )
+  except ValueError:
+    raise HTTPException(
+      status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+    )
+  if next_cursor:
+    next_url = request.url.include_query_params(cursor=next_cursor)
+    response.headers["X-Next-Cursor"] = next_cursor
+    response.headers["Link"] = f'<{next_url}>; rel="next"'
+  return contacts_response(contacts, response)
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_contacts(
+  request: Request,
+  format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+  user: User = Depends(get_current_user),
+):
+  writer, media_type = WRITERS[format]
+
+  # The stream owns its session: it outlives the request dependencies. When
+  # the client disconnects Starlette cancels this generator, which closes the
+  # server-side cursor and the session.
+  recent_write = bool(sessionmanager.replicas) and await recent_contact_writes.check(
+    request.app.state.redis, user.id
+  )
+
+  async def batches():
+    async with sessionmanager.read_session(recent_write) as session:
+      contact_service = ContactService(session)
+      async for batch in contact_service.stream_contacts(user, config.EXPORT_BATCH_SIZE):
+        if await request.is_disconnected():
+          break
+        yield batch
+
+  return StreamingResponse(
+    writer(batches()),
+    media_type=media_type,
+    headers={"Content-Disposition": f'attachment; filename="contacts.{format}"'},
+  )
 
 @router.get("/{contact_id}", response_model=ContactResponse)
 async def read_contact(
   contact_id: int,
-  db: AsyncSession = Depends(get_db),
+  request: Request,
+  response: Response,
+  db: AsyncSession = Depends(get_read_db),
   user: User = Depends(get_current_user),
 ):
+  cached = await not_modified(request, response, contact_versions, user.id)
+  if cached is not None:
+    return cached
+
   contact_service = ContactService(db)
   contact = await contact_service.get_contact(contact_id, user)
   if contact is None:
@@ -44,19 +136,84 @@ async def read_contact(
 async def create_contact(
   body: ContactBase,
   db: AsyncSession = Depends(get_db),
+  redis: "Redis" = Depends(get_redis),
   user: User = Depends(get_current_user),
 ):
-  contact_service = ContactService(db)
+  contact_service = ContactService(db, redis)
   return await contact_service.create_contact(body, user)
 
+@router.post("/bulk", response_model=BulkImportReport)
+async def import_contacts(
+  request: Request,
+  db: AsyncSession = Depends(get_db),
+  redis: "Redis" = Depends(get_redis),
+  user: User = Depends(get_current_user),
+):
+  # The body is parsed as it streams in: a JSON array, NDJSON or CSV with a
+  # header row, picked by Content-Type.
+  reader = get_reader(request.headers.get("content-type"))
+  if reader is None:
+    raise HTTPException(
+      status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+      detail="Expected application/json, application/x-ndjson or text/csv",
+    )
+  contact_service = ContactService(db, redis)
+  try:
+    return await contact_service.import_contacts(
+      reader(request.stream()), user, config.BULK_IMPORT_CHUNK_SIZE, config.BULK_IMPORT_MAX_ERRORS
+    )
+  except ValueError as e:
+    raise HTTPException(
+      status_code=status.HTTP_400_BAD_REQUEST, detail=f"Malformed body: {e}"
+    )
+
+@router.post("/batch-get", response_model=ContactBatchResponse)
+async def batch_get_contacts(
+  body: ContactBatchGet,
+  db: AsyncSession = Depends(get_read_db),
+  user: User = Depends(get_current_user),
+):
+  contact_service = ContactService(db)
+  contacts, missing = await contact_service.get_contacts_batch(body.ids, user)
+  return {"contacts": contacts, "missing": missing}
+
+@router.post("/bulk-delete", response_model=ContactBulkResult)
+async def bulk_delete_contacts(
+  body: ContactBulkDelete,
+  db: AsyncSession = Depends(get_db),
+  redis: "Redis" = Depends(get_redis),
+  user: User = Depends(get_current_user),
+):
+  contact_service = ContactService(db, redis)
+  try:
+    ids = await contact_service.remove_contacts(body, user, config.BULK_DELETE_MAX)
+  except BatchTooLargeError as e:
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+  return {"ids": ids}
+
+@router.post("/bulk-update", response_model=ContactBulkResult)
+async def bulk_update_contacts(
+  body: ContactBulkUpdate,
+  db: AsyncSession = Depends(get_db),
+  redis: "Redis" = Depends(get_redis),
+  user: User = Depends(get_current_user),
+):
+  contact_service = ContactService(db, redis)
+  try:
+    ids = await contact_service.update_contacts(body, user, config.BULK_UPDATE_MAX)
+  except BatchTooLargeError as e:
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+  return {"ids": ids}
+
 @router.put("/{contact_id}", response_model=ContactResponse)
 async def update_contact(
   body: ContactBase,
   contact_id: int,
   db: AsyncSession = Depends(get_db),
+  redis: "Redis" = Depends(get_redis),
   user: User = Depends(get_current_user),
 ):
-  contact_service = ContactService(db)
+  contact_service = ContactService(db, redis)
   contact = await contact_service.update_contact(contact_id, body, user)
   if contact is None:
     raise HTTPException(
@@ -68,9 +225,10 @@ async def update_contact(
 async def remove_contact(
   contact_id: int,
   db: AsyncSession = Depends(get_db),
+  redis: "Redis" = Depends(get_redis),
   user: User = Depends(get_current_user),
 ):
-  contact_service = ContactService(db)
+  contact_service = ContactService(db, redis)
   contact = await contact_service.remove_contact(contact_id, user)
   if contact is None:
     raise HTTPException(
@@ -80,10 +238,20 @@ async def remove_contact(
 
 @router.get("/birthdays/", response_model=List[ContactResponse])
 async def upcoming_birthdays(
-  db: AsyncSession = Depends(get_db),
+  request: Request,
+  response: Response,
+  days: int = Query(config.BIRTHDAYS_WINDOW_DAYS, ge=0, le=366),
+  db: AsyncSession = Depends(get_read_db),
   user: User = Depends(get_current_user),
 ):
+  # The window moves every day even when the contacts do not. The tag and
+  # the query use the same UTC date, so they never describe different days.
+  today = datetime.now(UTC).date()
+  cached = await not_modified(request, response, contact_versions, user.id, today)
+  if cached is not None:
+    return cached
+
   contact_service = ContactService(db)
-  contacts = await contact_service.get_upcoming_birthdays(user)
-  return contacts
+  contacts = await contact_service.get_upcoming_birthdays(user, days, today)
+  return contacts_response(contacts, response)
 
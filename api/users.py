@@ -1,26 +1,27 @@
 from fastapi import APIRouter, Depends, Request, File, UploadFile, HTTPException, status
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 from schemas import User
 from services.auth import get_current_user
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
+from sqlalchemy import update
 from database.models import User as DBUser
 from database.db import get_db
-import cloudinary.uploader
+from services.user_cache import user_cache
+from services.rate_limit import limiter, by_user
+from services.avatars import get_avatar_storage, process_avatar
 
 router = APIRouter(prefix="/users", tags=["users"])
-limiter = Limiter(key_func=get_remote_address)
+avatar_storage = get_avatar_storage()
 
 @router.get(
   "/me", response_model=User, description="No more than 10 requests per minute"
 )
-@limiter.limit("10/minute")
+@limiter.limit("10/minute", key=by_user)
 async def me(request: Request, user: DBUser = Depends(get_current_user)):
   return user
 
 @router.put("/avatar", description="Update user avatar")
 async def update_avatar(
+  request: Request,
   file: UploadFile = File(...),
   current_user: User = Depends(get_current_user),
   db: AsyncSession = Depends(get_db)
@@ -33,21 +34,27 @@ async def update_avatar(
 
   if current_user.role == "admin":
     try:
-      upload_result = cloudinary.uploader.upload(file.file, folder="avatars")
+      avatar_url = await process_avatar(file, avatar_storage)
 
-      stmt = select(User).where(User.id == current_user.id)
+      stmt = (
+        update(DBUser)
+        .where(DBUser.id == current_user.id)
+        .values(avatar=avatar_url)
+        .returning(DBUser.username)
+      )
       result = await db.execute(stmt)
-      user = result.scalar_one_or_none()
+      username = result.scalar_one_or_none()
 
-      if not user:
+      if not username:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-      user.avatar = upload_result["secure_url"]
       await db.commit()
-      await db.refresh(user)
+      await user_cache.invalidate(request.app.state.redis, username)
 
-      return {"avatar_url": user.avatar}
+      return {"avatar_url": avatar_url}
 
+    except HTTPException:
+      raise
     except Exception as e:
       raise HTTPException(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
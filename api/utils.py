@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import secrets
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Security, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 
-from database.db import get_db
+from database.db import get_db, sessionmanager
+from services.auth import hash_pool, token_cache
+from services.user_cache import user_cache
+from services.metrics import metrics
+from conf.config import config
 
 router = APIRouter(tags=["utils"])
 
@@ -24,3 +32,55 @@ async def healthchecker(db: AsyncSession = Depends(get_db)):
       status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
       detail="Error connecting to the database",
     )
+
+
+@router.get("/readyz", include_in_schema=False)
+async def readiness(request: Request):
+  # Ready once warmup finished, and no longer while shutting down.
+  if not getattr(request.app.state, "ready", False):
+    return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"status": "not ready"})
+  return {"status": "ready"}
+
+
+scrape_scheme = HTTPBearer(auto_error=False)
+
+async def verify_scrape_token(
+  credentials: HTTPAuthorizationCredentials | None = Security(scrape_scheme),
+):
+  """
+  Lets scrapers through to internal endpoints with the static METRICS_TOKEN.
+
+  A JWT would expire under a long-running scraper, so these endpoints take a
+  dedicated token instead.
+
+  Raises:
+    HTTPException: 404 if no token is configured, 401 if it does not match.
+  """
+  if not config.METRICS_TOKEN:
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+  if credentials is None or not secrets.compare_digest(
+    credentials.credentials.encode(), config.METRICS_TOKEN.encode()
+  ):
+    raise HTTPException(
+      status_code=status.HTTP_401_UNAUTHORIZED,
+      detail="Invalid scrape token",
+      headers={"WWW-Authenticate": "Bearer"},
+    )
+
+@router.get("/internal/stats", dependencies=[Depends(verify_scrape_token)])
+async def internal_stats():
+  return {
+    "db_pool": sessionmanager.stats(),
+    "hash_pool": hash_pool.stats(),
+    "token_cache": token_cache.stats(),
+    "user_cache": user_cache.stats(),
+  }
+
+@router.get(
+  "/metrics",
+  response_class=PlainTextResponse,
+  include_in_schema=False,
+  dependencies=[Depends(verify_scrape_token)],
+)
+async def prometheus_metrics():
+  return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
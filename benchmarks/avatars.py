@@ -0,0 +1,68 @@
+"""
+Offline benchmark of the avatar pipeline with the local storage backend.
+
+Generates random JPEG/PNG uploads, then measures concurrent first uploads
+(read, hash, resize in the worker pool, store) and repeated uploads of the
+same content (served by content-hash deduplication).
+
+Usage:
+  python -m benchmarks.avatars --uploads 50 --concurrency 8 --side 2048
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from fastapi import UploadFile
+from PIL import Image
+
+from services.avatars import LocalAvatarStorage, process_avatar
+
+def _image(side: int, fmt: str) -> bytes:
+  image = Image.frombytes("RGB", (side, side), os.urandom(side * side * 3))
+  output = io.BytesIO()
+  image.save(output, format=fmt)
+  return output.getvalue()
+
+async def _timed_uploads(payloads: list[bytes], storage, concurrency: int) -> dict:
+  semaphore = asyncio.Semaphore(concurrency)
+  samples = []
+
+  async def one(data: bytes):
+    async with semaphore:
+      started = time.perf_counter()
+      await process_avatar(UploadFile(io.BytesIO(data), filename="avatar"), storage)
+      samples.append((time.perf_counter() - started) * 1000)
+
+  started = time.perf_counter()
+  await asyncio.gather(*(one(data) for data in payloads))
+  elapsed = time.perf_counter() - started
+  return {
+    "uploads": len(samples),
+    "median_ms": round(statistics.median(samples), 3),
+    "max_ms": round(max(samples), 3),
+    "uploads_per_s": round(len(samples) / elapsed, 2),
+  }
+
+async def run(uploads: int, concurrency: int, side: int) -> dict:
+  payloads = [_image(side, "PNG" if n % 2 else "JPEG") for n in range(uploads)]
+  with tempfile.TemporaryDirectory() as root:
+    storage = LocalAvatarStorage(root, "http://localhost/avatars")
+    first = await _timed_uploads(payloads, storage, concurrency)
+    repeated = await _timed_uploads(payloads, storage, concurrency)
+  return {"side": side, "concurrency": concurrency, "first_upload": first, "deduplicated": repeated}
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--uploads", type=int, default=50)
+  parser.add_argument("--concurrency", type=int, default=8)
+  parser.add_argument("--side", type=int, default=2048, help="side of the generated square images in pixels")
+  args = parser.parse_args()
+  print(json.dumps(asyncio.run(run(args.uploads, args.concurrency, args.side)), indent=2))
+
+if __name__ == "__main__":
+  main()
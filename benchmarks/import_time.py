@@ -0,0 +1,98 @@
+"""
+Measures the cold import cost of a module, per imported module and package.
+
+Runs `python -X importtime -c "import <module>"` in fresh interpreters and
+reports the median wall time, the slowest modules by cumulative and by self
+time, and self time summed per top-level package (sqlalchemy, pydantic, ...).
+
+Usage:
+  python -m benchmarks.import_time --module main --runs 5 --top 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+def parse_importtime(stderr: str) -> list[dict]:
+  """
+  Parses `-X importtime` output.
+
+  Args:
+    stderr: The interpreter's stderr.
+
+  Returns:
+    One {"module", "self_us", "cumulative_us"} entry per imported module.
+  """
+  entries = []
+  for line in stderr.splitlines():
+    if not line.startswith("import time:"):
+      continue
+    fields = line[len("import time:"):].split("|")
+    if len(fields) != 3 or not fields[0].strip().isdigit():
+      continue
+    entries.append({
+      "module": fields[2].strip(),
+      "self_us": int(fields[0]),
+      "cumulative_us": int(fields[1]),
+    })
+  return entries
+
+def _import_once(module: str) -> tuple[float, list[dict]]:
+  started = time.perf_counter()
+  result = subprocess.run(
+    [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+    capture_output=True, text=True, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+  )
+  elapsed = time.perf_counter() - started
+  if result.returncode != 0:
+    raise SystemExit(f"import {module} failed:\n{result.stderr[-2000:]}")
+  return elapsed, parse_importtime(result.stderr)
+
+def run(module: str, runs: int, top: int) -> dict:
+  walls = []
+  samples = defaultdict(list)
+  for _ in range(runs):
+    wall, entries = _import_once(module)
+    walls.append(wall)
+    for entry in entries:
+      samples[entry["module"]].append(entry)
+
+  modules = [
+    {
+      "module": name,
+      "self_ms": round(statistics.median(e["self_us"] for e in entries) / 1000, 2),
+      "cumulative_ms": round(statistics.median(e["cumulative_us"] for e in entries) / 1000, 2),
+    }
+    for name, entries in samples.items()
+  ]
+  packages = defaultdict(float)
+  for entry in modules:
+    packages[entry["module"].split(".")[0]] += entry["self_ms"]
+
+  return {
+    "module": module,
+    "runs": runs,
+    "wall_ms": round(statistics.median(walls) * 1000, 1),
+    "imported_modules": len(modules),
+    "by_cumulative": sorted(modules, key=lambda e: -e["cumulative_ms"])[:top],
+    "by_self": sorted(modules, key=lambda e: -e["self_ms"])[:top],
+    "by_package": [
+      {"package": name, "self_ms": round(ms, 2)}
+      for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:top]
+    ],
+  }
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--module", default="main")
+  parser.add_argument("--runs", type=int, default=5)
+  parser.add_argument("--top", type=int, default=20)
+  args = parser.parse_args()
+  print(json.dumps(run(args.module, args.runs, args.top), indent=2))
+
+if __name__ == "__main__":
+  main()
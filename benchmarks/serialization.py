@@ -0,0 +1,82 @@
+"""
+Micro-benchmark of contact list serialization, per row.
+
+"before" replays FastAPI's default path for `response_model=List[ContactResponse]`:
+validate the ORM objects into models, dump them to JSON-compatible Python
+and encode with the stdlib `json` module as JSONResponse does. "after" is
+`services.serializers.dump_contacts`, used by the list, search and
+birthdays routes.
+
+The scenarios use each route's typical page: a full list page, a ranked
+search page and a birthdays window, where every row has a birthday.
+
+Usage:
+  python -m benchmarks.serialization --repeat 200
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from pydantic import TypeAdapter
+
+from database.models import Contact
+from schemas import ContactResponse
+from services.serializers import dump_contacts, orjson
+
+SCENARIOS = {"list": (1000, 0.3), "search": (100, 0.3), "birthdays": (50, 0.0)}
+
+_adapter = TypeAdapter(List[ContactResponse])
+
+def _fastapi_default(contacts) -> bytes:
+  value = _adapter.validate_python(contacts, from_attributes=True)
+  content = _adapter.dump_python(value, mode="json")
+  return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+def _contacts(rows: int, missing_birthdays: float) -> list[Contact]:
+  rng = random.Random(rows)
+  start = datetime(1960, 1, 1)
+  return [
+    Contact(
+      id=i,
+      first_name=f"First{i}",
+      last_name=f"Last{rng.randrange(10_000)}",
+      email=f"user{i}@example.com",
+      phone=f"+380{rng.randrange(10**9):09d}",
+      birthday=None if rng.random() < missing_birthdays else start + timedelta(days=rng.randrange(20_000)),
+      user_id=1,
+    )
+    for i in range(1, rows + 1)
+  ]
+
+def _per_row_us(encode, contacts, repeat: int) -> float:
+  started = time.perf_counter()
+  for _ in range(repeat):
+    encode(contacts)
+  return round((time.perf_counter() - started) / (repeat * len(contacts)) * 1_000_000, 3)
+
+def run(repeat: int) -> dict:
+  results = {"encoder": "orjson" if orjson is not None else "TypeAdapter"}
+  for name, (rows, missing) in SCENARIOS.items():
+    contacts = _contacts(rows, missing)
+    assert json.loads(_fastapi_default(contacts)) == json.loads(dump_contacts(contacts))
+    before = _per_row_us(_fastapi_default, contacts, repeat)
+    after = _per_row_us(dump_contacts, contacts, repeat)
+    results[name] = {
+      "rows": rows,
+      "before_us_per_row": before,
+      "after_us_per_row": after,
+      "speedup": round(before / after, 2) if after else None,
+    }
+  return results
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--repeat", type=int, default=200)
+  args = parser.parse_args()
+  print(json.dumps(run(args.repeat), indent=2))
+
+if __name__ == "__main__":
+  main()
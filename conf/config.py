@@ -1,31 +1,108 @@
 from pydantic import ConfigDict, EmailStr
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
+import functools
 import os
 
 load_dotenv()
 class Config:
   DB_URL = os.environ.get("DB_URL")
+  DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+  DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+  DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+  DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+  DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+  DB_REPLICA_URLS = [url.strip() for url in os.environ.get("DB_REPLICA_URLS", "").split(",") if url.strip()]
+  DB_REPLICA_COOLDOWN = float(os.environ.get("DB_REPLICA_COOLDOWN", 30))
+  DB_REPLICA_MAX_LAG = float(os.environ.get("DB_REPLICA_MAX_LAG", 5))
+  DB_REPLICA_CHECK_INTERVAL = float(os.environ.get("DB_REPLICA_CHECK_INTERVAL", 5))
+  # Reads stay on the primary this long after a user's own write; keep it at
+  # least DB_REPLICA_MAX_LAG so lagging replicas never hide the write.
+  DB_READ_YOUR_WRITES_SECONDS = float(os.environ.get("DB_READ_YOUR_WRITES_SECONDS", DB_REPLICA_MAX_LAG))
+  WARMUP_DB_CONNECTIONS = int(os.environ.get("WARMUP_DB_CONNECTIONS", DB_POOL_SIZE))
+  WARMUP_REDIS_CONNECTIONS = int(os.environ.get("WARMUP_REDIS_CONNECTIONS", 4))
+  WARMUP_USERS = int(os.environ.get("WARMUP_USERS", 500))
+  # On SIGTERM /readyz fails this long before the server stops accepting, so
+  # load balancers stop routing here first.
+  SHUTDOWN_READY_DELAY = float(os.environ.get("SHUTDOWN_READY_DELAY", 5))
+  SHUTDOWN_DRAIN_SECONDS = float(os.environ.get("SHUTDOWN_DRAIN_SECONDS", 30))
+  SERVER_HOST = os.environ.get("SERVER_HOST", "0.0.0.0")
+  SERVER_PORT = int(os.environ.get("SERVER_PORT", 8000))
+  SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", os.cpu_count() or 1))
+  SERVER_MAX_REQUESTS = int(os.environ.get("SERVER_MAX_REQUESTS", 10000))
+  SERVER_MAX_REQUESTS_JITTER = int(os.environ.get("SERVER_MAX_REQUESTS_JITTER", 1000))
+  SERVER_GRACEFUL_TIMEOUT = float(
+    os.environ.get("SERVER_GRACEFUL_TIMEOUT", SHUTDOWN_READY_DELAY + SHUTDOWN_DRAIN_SECONDS + 5)
+  )
+  SERVER_TIMEOUT = float(os.environ.get("SERVER_TIMEOUT", 60))
+  SERVER_KEEPALIVE = float(os.environ.get("SERVER_KEEPALIVE", 5))
+  SERVER_PRELOAD = os.environ.get("SERVER_PRELOAD", "false").lower() in ("1", "true", "yes")
+  SERVER_RUN_MIGRATIONS = os.environ.get("SERVER_RUN_MIGRATIONS", "false").lower() in ("1", "true", "yes")
+  REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost")
   JWT_SECRET = os.environ.get("JWT_SECRET")
-  JWT_ALGORITHM = os.environ.get("JWT_ALGORITHM")
-  JWT_EXPIRATION_SECONDS = int(os.environ.get("JWT_EXPIRATION_SECONDS"))
+  JWT_ALGORITHM = os.environ.get("JWT_ALGORITHM", "HS256")
+  JWT_EXPIRATION_SECONDS = int(os.environ.get("JWT_EXPIRATION_SECONDS", 3600))
+  BIRTHDAYS_WINDOW_DAYS = int(os.environ.get("BIRTHDAYS_WINDOW_DAYS", 7))
+  BULK_IMPORT_CHUNK_SIZE = int(os.environ.get("BULK_IMPORT_CHUNK_SIZE", 500))
+  BULK_IMPORT_MAX_ERRORS = int(os.environ.get("BULK_IMPORT_MAX_ERRORS", 1000))
+  BATCH_GET_MAX_IDS = int(os.environ.get("BATCH_GET_MAX_IDS", 500))
+  BULK_DELETE_MAX = int(os.environ.get("BULK_DELETE_MAX", 5000))
+  BULK_UPDATE_MAX = int(os.environ.get("BULK_UPDATE_MAX", 5000))
+  EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 1000))
+  QUERY_DEBUG = os.environ.get("QUERY_DEBUG", "false").lower() in ("1", "true", "yes")
+  QUERY_REPEAT_THRESHOLD = int(os.environ.get("QUERY_REPEAT_THRESHOLD", 3))
+  # Static bearer token for scraping /api/metrics and /api/internal/stats;
+  # both answer 404 while it is unset.
+  METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+  OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", 50))
+  OUTBOX_POLL_INTERVAL = float(os.environ.get("OUTBOX_POLL_INTERVAL", 1))
+  OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", 8))
+  OUTBOX_BACKOFF_BASE = float(os.environ.get("OUTBOX_BACKOFF_BASE", 30))
+  OUTBOX_BACKOFF_MAX = float(os.environ.get("OUTBOX_BACKOFF_MAX", 3600))
+  OUTBOX_LEASE_SECONDS = int(os.environ.get("OUTBOX_LEASE_SECONDS", 300))
+  AVATAR_STORAGE = os.environ.get("AVATAR_STORAGE", "cloudinary")
+  AVATAR_LOCAL_DIR = os.environ.get("AVATAR_LOCAL_DIR", "media/avatars")
+  AVATAR_BASE_URL = os.environ.get("AVATAR_BASE_URL", "/media/avatars")
+  AVATAR_MAX_BYTES = int(os.environ.get("AVATAR_MAX_BYTES", 5 * 1024 * 1024))
+  AVATAR_SIZE = int(os.environ.get("AVATAR_SIZE", 256))
+  AVATAR_WORKERS = int(os.environ.get("AVATAR_WORKERS", 2))
+  CLOUDINARY_NAME = os.environ.get("CLOUDINARY_NAME", "your_cloud_name")
+  CLOUDINARY_API_KEY = os.environ.get("CLOUDINARY_API_KEY", "your_api_key")
+  CLOUDINARY_API_SECRET = os.environ.get("CLOUDINARY_API_SECRET", "your_api_secret")
+  RATE_LIMIT_LOGIN = os.environ.get("RATE_LIMIT_LOGIN", "10/minute")
+  HASH_WORKERS = int(os.environ.get("HASH_WORKERS", os.cpu_count() or 1))
+  HASH_MAX_PENDING = int(os.environ.get("HASH_MAX_PENDING", HASH_WORKERS * 4))
+  TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", 10000))
+  USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", 3600))
+  USER_CACHE_LOCAL_TTL = float(os.environ.get("USER_CACHE_LOCAL_TTL", 5))
+  USER_CACHE_LOCAL_SIZE = int(os.environ.get("USER_CACHE_LOCAL_SIZE", 10000))
 
 config = Config
 
+# Read from the environment and .env by BaseSettings itself, and only when
+# first needed: importing this module must not fail or pay for validation.
 class Settings(BaseSettings):
-  MAIL_USERNAME: EmailStr = os.environ.get("MAIL_USERNAME")
-  MAIL_PASSWORD: str = os.environ.get("MAIL_PASSWORD")
-  MAIL_FROM: EmailStr = os.environ.get("MAIL_FROM")
-  MAIL_PORT: int = int(os.environ.get("MAIL_PORT"))
-  MAIL_SERVER: str = os.environ.get("MAIL_SERVER")
-  MAIL_FROM_NAME: str = os.environ.get("MAIL_FROM_NAME")
-  MAIL_STARTTLS: bool = os.environ.get("MAIL_STARTTLS")
-  MAIL_SSL_TLS: bool = os.environ.get("MAIL_SSL_TLS")
-  USE_CREDENTIALS: bool = os.environ.get("USE_CREDENTIALS")
-  VALIDATE_CERTS: bool = os.environ.get("VALIDATE_CERTS")
+  MAIL_USERNAME: EmailStr | None = None
+  MAIL_PASSWORD: str | None = None
+  MAIL_FROM: EmailStr | None = None
+  MAIL_PORT: int
+  MAIL_SERVER: str | None = None
+  MAIL_FROM_NAME: str | None = None
+  MAIL_STARTTLS: bool | None = None
+  MAIL_SSL_TLS: bool | None = None
+  USE_CREDENTIALS: bool | None = None
+  VALIDATE_CERTS: bool | None = None
 
   model_config = ConfigDict(
     extra="ignore", env_file=".env", env_file_encoding="utf-8", case_sensitive=True
   )
 
-settings = Settings()
+@functools.lru_cache(maxsize=None)
+def get_settings() -> Settings:
+  """
+  Builds and validates the mail settings on first use.
+
+  Returns:
+    The shared Settings instance.
+  """
+  return Settings()
@@ -1,23 +1,171 @@
+import asyncio
 import contextlib
+import time
 
-from sqlalchemy.exc import SQLAlchemyError
+from fastapi import Request
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import (
+  DBAPIError,
+  InterfaceError,
+  OperationalError,
+  SQLAlchemyError,
+  TimeoutError as PoolTimeoutError,
+)
 from sqlalchemy.ext.asyncio import (
   AsyncEngine,
   async_sessionmaker,
   create_async_engine,
 )
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from conf.config import config
 
+class PoolStats:
+  """
+  Connection pool counters collected by `instrumented_pool`.
+  """
+  def __init__(self):
+    self.checkouts = 0
+    self.timeouts = 0
+    self.wait_total = 0.0
+    self.wait_max = 0.0
+
+  def record_wait(self, seconds: float):
+    self.checkouts += 1
+    self.wait_total += seconds
+    self.wait_max = max(self.wait_max, seconds)
+
+  def as_dict(self) -> dict:
+    return {
+      "checkouts": self.checkouts,
+      "timeouts": self.timeouts,
+      "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+      "wait_max_ms": round(self.wait_max * 1000, 3),
+    }
+
+def instrumented_pool(stats: PoolStats, base: type[QueuePool] = AsyncAdaptedQueuePool) -> type[QueuePool]:
+  """
+  Builds a queue pool class that reports checkout waits and timeouts to `stats`.
+
+  Args:
+    stats: The counters to update.
+    base: The pool class to extend.
+
+  Returns:
+    A pool class for `create_async_engine(poolclass=...)`.
+  """
+  class InstrumentedPool(base):
+    def _do_get(self):
+      started = time.perf_counter()
+      try:
+        connection = super()._do_get()
+      except PoolTimeoutError:
+        stats.timeouts += 1
+        raise
+      stats.record_wait(time.perf_counter() - started)
+      return connection
+
+  return InstrumentedPool
+
+REPLICA_LAG_SQL = text(
+  "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+  " ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+def _engine_options(url: str, stats: PoolStats, **pool) -> dict:
+  # SQLite (tests, local runs) keeps the dialect's default pool.
+  if make_url(url).get_backend_name() == "sqlite":
+    return {}
+  return {"poolclass": instrumented_pool(stats), **pool}
+
+def _session_maker(engine: AsyncEngine) -> async_sessionmaker:
+  # Objects stay loaded after commit: writes return their rows through
+  # RETURNING and must not trigger a reload.
+  return async_sessionmaker(autoflush=False, autocommit=False, expire_on_commit=False, bind=engine)
+
+class Replica:
+  """
+  A read replica with its own pool and health state.
+  """
+  def __init__(self, url: str, **pool):
+    self.name = make_url(url).render_as_string(hide_password=True)
+    self.pool_stats = PoolStats()
+    self.engine = create_async_engine(url, **_engine_options(url, self.pool_stats, **pool))
+    self.session_maker = _session_maker(self.engine)
+    self.in_flight = 0
+    self.failures = 0
+    self.lag: float | None = None
+    self.down_until = 0.0
+
+  @property
+  def available(self) -> bool:
+    return time.monotonic() >= self.down_until
+
+  def mark_down(self, seconds: float):
+    self.failures += 1
+    self.down_until = time.monotonic() + seconds
+
+  def stats(self) -> dict:
+    return {
+      "name": self.name,
+      "available": self.available,
+      "in_flight": self.in_flight,
+      "failures": self.failures,
+      "lag_s": self.lag,
+      **self.pool_stats.as_dict(),
+    }
+
 class DatabaseSessionManager:
   """
   Manages database sessions.
+
+  Writes always use the primary. `read_session` spreads read-only work over
+  the replicas, preferring the one with the fewest sessions in flight. A
+  replica that fails, or lags more than `replica_max_lag` seconds at the last
+  `check_replicas`, sits out `replica_cooldown` seconds. When no replica is
+  available reads go to the primary.
   """
-  def __init__(self, url: str):
-    self._engine: AsyncEngine | None = create_async_engine(url)
-    self._session_maker: async_sessionmaker = async_sessionmaker(
-      autoflush=False, autocommit=False, bind=self._engine
-    )
+  def __init__(
+    self,
+    url: str,
+    pool_size: int = 5,
+    max_overflow: int = 10,
+    pool_timeout: float = 30,
+    pool_recycle: int = 1800,
+    pool_pre_ping: bool = True,
+    replica_urls: list[str] = (),
+    replica_cooldown: float = 30,
+    replica_max_lag: float = 5,
+  ):
+    pool = {
+      "pool_size": pool_size,
+      "max_overflow": max_overflow,
+      "pool_timeout": pool_timeout,
+      "pool_recycle": pool_recycle,
+      "pool_pre_ping": pool_pre_ping,
+    }
+    self.pool_stats = PoolStats()
+    self._engine: AsyncEngine | None = create_async_engine(url, **_engine_options(url, self.pool_stats, **pool))
+    self._session_maker: async_sessionmaker = _session_maker(self._engine)
+    self.replicas = [Replica(replica_url, **pool) for replica_url in replica_urls]
+    self.replica_cooldown = replica_cooldown
+    self.replica_max_lag = replica_max_lag
+
+  @property
+  def engine(self) -> AsyncEngine:
+    """
+    The engine sessions are bound to.
+    """
+    return self._engine
+
+  @property
+  def engines(self) -> list[AsyncEngine]:
+    """
+    The primary engine followed by every replica engine.
+    """
+    return [self._engine, *(replica.engine for replica in self.replicas)]
 
   @contextlib.asynccontextmanager
   async def session(self):
@@ -41,7 +189,117 @@ class DatabaseSessionManager:
     finally:
       await session.close()
 
-sessionmanager = DatabaseSessionManager(config.DB_URL)
+  def _pick_replica(self) -> Replica | None:
+    available = [replica for replica in self.replicas if replica.available]
+    return min(available, key=lambda replica: replica.in_flight, default=None)
+
+  @contextlib.asynccontextmanager
+  async def read_session(self, recent_write: bool = False):
+    """
+    Provides a session for read-only work, on a replica when one is available.
+
+    The session connects lazily like any other, so a route that answers
+    without querying never checks out a connection. A replica that fails
+    while connecting or mid-query is taken out for `replica_cooldown`
+    seconds and later reads go elsewhere.
+
+    Args:
+      recent_write: The caller wrote recently and must read from the primary
+        to see its own changes.
+
+    Yields:
+      An asynchronous database session.
+    """
+    replica = None if recent_write else self._pick_replica()
+    if replica is None:
+      async with self.session() as session:
+        yield session
+      return
+    session = replica.session_maker()
+    replica.in_flight += 1
+    try:
+      yield session
+    except (DBAPIError, OSError) as e:
+      if isinstance(e, OSError) or e.connection_invalidated or isinstance(e, (OperationalError, InterfaceError)):
+        replica.mark_down(self.replica_cooldown)
+      await session.rollback()
+      raise
+    except SQLAlchemyError:
+      await session.rollback()
+      raise
+    finally:
+      replica.in_flight -= 1
+      await session.close()
+
+  async def check_replicas(self):
+    """
+    Pings every replica and takes out the unreachable and lagging ones.
+    """
+    for replica in self.replicas:
+      try:
+        async with replica.engine.connect() as connection:
+          if connection.dialect.name == "postgresql":
+            lag = float((await connection.execute(REPLICA_LAG_SQL)).scalar() or 0)
+          else:
+            await connection.execute(text("SELECT 1"))
+            lag = 0.0
+      except (SQLAlchemyError, OSError):
+        replica.mark_down(self.replica_cooldown)
+        continue
+      replica.lag = lag
+      if lag > self.replica_max_lag:
+        replica.mark_down(self.replica_cooldown)
+      else:
+        replica.down_until = 0.0
+
+  async def monitor_replicas(self, interval: float):
+    """
+    Runs `check_replicas` every `interval` seconds until cancelled.
+    """
+    while self.replicas:
+      await self.check_replicas()
+      await asyncio.sleep(interval)
+
+  async def close(self):
+    """
+    Closes every pooled connection of the primary and the replicas.
+    """
+    for engine in [self._engine, *(replica.engine for replica in self.replicas)]:
+      await engine.dispose()
+
+  def stats(self) -> dict:
+    """
+    Reports connection pool usage.
+
+    Returns:
+      Checkout wait times and timeouts, plus the pool size, in-use, idle and
+      overflow connection counts when the engine uses a queue pool, and the
+      health of every replica.
+    """
+    data = self.pool_stats.as_dict()
+    pool = self._engine.pool
+    if isinstance(pool, QueuePool):
+      data.update(
+        size=pool.size(),
+        in_use=pool.checkedout(),
+        idle=pool.checkedin(),
+        overflow=max(0, pool.overflow()),
+      )
+    if self.replicas:
+      data["replicas"] = [replica.stats() for replica in self.replicas]
+    return data
+
+sessionmanager = DatabaseSessionManager(
+  config.DB_URL,
+  pool_size=config.DB_POOL_SIZE,
+  max_overflow=config.DB_MAX_OVERFLOW,
+  pool_timeout=config.DB_POOL_TIMEOUT,
+  pool_recycle=config.DB_POOL_RECYCLE,
+  pool_pre_ping=config.DB_POOL_PRE_PING,
+  replica_urls=config.DB_REPLICA_URLS,
+  replica_cooldown=config.DB_REPLICA_COOLDOWN,
+  replica_max_lag=config.DB_REPLICA_MAX_LAG,
+)
 
 async def get_db():
   """
@@ -52,3 +310,12 @@ async def get_db():
   """
   async with sessionmanager.session() as session:
     yield session
+
+def get_redis(request: Request):
+  """
+  Provides the application's shared Redis client.
+
+  Returns:
+    The Redis client opened at startup.
+  """
+  return request.app.state.redis
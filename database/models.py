@@ -1,7 +1,7 @@
-from datetime import datetime
+from datetime import date, datetime
 
-from sqlalchemy import Column, Integer, String, Boolean, func, Enum
-from sqlalchemy.orm import relationship, mapped_column, Mapped, DeclarativeBase
+from sqlalchemy import Column, Integer, SmallInteger, String, Text, Boolean, func, Enum, Index, text
+from sqlalchemy.orm import relationship, backref, mapped_column, Mapped, DeclarativeBase
 from sqlalchemy.sql.schema import ForeignKey
 from sqlalchemy.sql.sqltypes import DateTime
 import enum
@@ -10,6 +10,20 @@ class Role(str, enum.Enum):
   user = "user"
   admin = "admin"
 
+def birthday_doy(birthday: date | None) -> int | None:
+  """
+  Returns the day of `birthday` in a leap-year calendar.
+
+  Args:
+    birthday: The birth date, or None.
+
+  Returns:
+    The day number (1..366), or None if `birthday` is None.
+  """
+  if birthday is None:
+    return None
+  return date(2000, birthday.month, birthday.day).timetuple().tm_yday
+
 class Base(DeclarativeBase):
     pass
 
@@ -23,10 +37,32 @@ class Contact(Base):
   birthday: Mapped[datetime] = mapped_column(
     "birthday", DateTime, default=func.now()
   )
+  # Day of the birthday in a leap-year calendar (1..366, Feb 29 is always 60),
+  # so an annual window is a plain range on an indexed integer.
+  birthday_doy: Mapped[int | None] = mapped_column(SmallInteger, nullable=True)
   user_id = Column(
     "user_id", ForeignKey("users.id", ondelete="CASCADE"), default=None
   )
-  user = relationship("User", backref="contacts")
+  # Never load implicitly: a lazy load per contact is an N+1 in disguise.
+  user = relationship("User", backref=backref("contacts", lazy="raise_on_sql"), lazy="raise_on_sql")
+
+  __table_args__ = (
+    Index("ix_contacts_user_id_name_order", "user_id", "last_name", "first_name", "id"),
+    Index("ix_contacts_user_id_birthday_doy", "user_id", "birthday_doy"),
+    Index("ix_contacts_user_id_id", "user_id", "id"),
+    Index("ix_contacts_user_id_lower_email", "user_id", text("lower(email)")),
+    # Trigram indexes for ranked search; PostgreSQL only, and they need the
+    # pg_trgm extension the migration creates.
+    *(
+      Index(
+        f"ix_contacts_{column}_trgm",
+        column,
+        postgresql_using="gin",
+        postgresql_ops={column: "gin_trgm_ops"},
+      ).ddl_if(dialect="postgresql")
+      for column in ("first_name", "last_name", "email")
+    ),
+  )
 
 class User(Base):
   __tablename__ = "users"
@@ -39,3 +75,28 @@ class User(Base):
   confirmed = Column(Boolean, default=False)
   avatar = Column(String(255), nullable=True)
   role = Column(Enum(Role), default=Role.user)
+
+class EmailOutbox(Base):
+  """
+  Emails waiting for the outbox worker.
+
+  Rows are written in the same transaction as the change that triggers them.
+  A worker claims a batch by pushing `next_attempt_at` forward by a lease, so
+  a crashed worker's rows become claimable again when the lease runs out.
+  """
+  __tablename__ = "email_outbox"
+  id = Column(Integer, primary_key=True)
+  recipient = Column(String(255), nullable=False)
+  subject = Column(String(255), nullable=False)
+  template = Column(String(100), nullable=False)
+  template_body = Column(Text, nullable=False)
+  status = Column(String(20), nullable=False, default="pending")
+  attempts = Column(Integer, nullable=False, default=0)
+  next_attempt_at = Column(DateTime, nullable=False, default=func.now())
+  last_error = Column(Text, nullable=True)
+  created_at = Column(DateTime, default=func.now())
+  sent_at = Column(DateTime, nullable=True)
+
+  __table_args__ = (
+    Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+  )
@@ -1,14 +1,70 @@
+import asyncio
+import contextlib
+
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
 from starlette.responses import JSONResponse
-from slowapi.errors import RateLimitExceeded
-import cloudinary
-import cloudinary.uploader
-import aioredis
-
 from api import utils, contacts, auth, users
+from services.user_cache import user_cache
+from services.rate_limit import RateLimitExceeded
+from services.metrics import MetricsMiddleware, instrument_engine, instrument_redis
+from services.avatars import UPLOAD_CHUNK_SIZE, UploadSizeLimit
+from services.query_budget import QueryBudgetMiddleware, track_queries
+from services.lifecycle import InFlightRequests, delay_shutdown_signal, warm_up
+from database.db import sessionmanager
+from conf.config import config
+
+in_flight = InFlightRequests()
+
+async def connect_redis():
+  """
+  Opens the shared Redis client; tests and benchmarks replace it with fakeredis.
+
+  Returns:
+    The Redis client.
+  """
+  # Imported here, so tools and tests that import the app never load it.
+  import aioredis
+
+  return await aioredis.from_url(config.REDIS_URL, decode_responses=True)
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+  """
+  Opens and warms the pools before the app reports ready, and drains
+  in-flight requests before closing them.
+  """
+  app.state.ready = False
+  app.state.redis = instrument_redis(await connect_redis())
+  await warm_up(
+    app.state.redis,
+    sessionmanager,
+    db_connections=config.WARMUP_DB_CONNECTIONS,
+    redis_connections=config.WARMUP_REDIS_CONNECTIONS,
+    users=config.WARMUP_USERS,
+  )
+  user_cache_listener = asyncio.create_task(user_cache.listen(app.state.redis))
+  replica_monitor = asyncio.create_task(
+    sessionmanager.monitor_replicas(config.DB_REPLICA_CHECK_INTERVAL)
+  )
+  restore_signal = delay_shutdown_signal(app, config.SHUTDOWN_READY_DELAY)
+  app.state.ready = True
+
+  yield
 
-app = FastAPI()
+  restore_signal()
+  app.state.ready = False
+  await in_flight.drain(config.SHUTDOWN_DRAIN_SECONDS)
+  # A task that already died re-raises here; it must not keep the pools open.
+  for task in (user_cache_listener, replica_monitor):
+    task.cancel()
+    with contextlib.suppress(Exception, asyncio.CancelledError):
+      await task
+  await app.state.redis.close()
+  await sessionmanager.close()
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
   "<http://localhost:3000>"
@@ -21,33 +77,45 @@ app.add_middleware(
   allow_methods=["*"],
   allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+# Multipart framing adds a little to the file itself; process_avatar enforces
+# the exact cap on the file while reading it.
+app.add_middleware(
+  UploadSizeLimit,
+  paths={"/api/users/avatar"},
+  max_bytes=config.AVATAR_MAX_BYTES + UPLOAD_CHUNK_SIZE,
+)
+# Replicas too: the read routes run their queries there.
+for engine in sessionmanager.engines:
+  instrument_engine(engine)
+  track_queries(engine)
+
+if config.QUERY_DEBUG:
+  app.add_middleware(QueryBudgetMiddleware, repeat_threshold=config.QUERY_REPEAT_THRESHOLD)
+# Outermost, so a request counts until its last byte is sent.
+app.add_middleware(in_flight.middleware)
 
 @app.exception_handler(RateLimitExceeded)
 async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
   return JSONResponse(
     status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-    content={"error": "Перевищено ліміт запитів. Спробуйте пізніше."},
+    content={"error": "Перевищено ліміт запитів. Спробуйте пізніше.", "detail": str(exc)},
+    headers={"Retry-After": str(exc.retry_after)},
   )
 
-@app.on_event("startup")
-async def startup():
-  app.state.redis = await aioredis.from_url("redis://localhost", decode_responses=True)
-
-@app.on_event("shutdown")
-async def shutdown():
-  await app.state.redis.close()
-
 app.include_router(utils.router, prefix="/api")
 app.include_router(contacts.router, prefix="/api")
 app.include_router(auth.router, prefix="/api")
 app.include_router(users.router, prefix="/api")
 
-cloudinary.config(
-  cloud_name="your_cloud_name",
-  api_key="your_api_key",
-  api_secret="your_api_secret"
-)
+if config.AVATAR_STORAGE == "local":
+  app.mount(
+    config.AVATAR_BASE_URL,
+    StaticFiles(directory=config.AVATAR_LOCAL_DIR, check_dir=False),
+    name="avatars",
+  )
 
+# Development server with auto-reload; production runs `python -m server`.
 if __name__ == "__main__":
   import uvicorn
 
@@ -0,0 +1,34 @@
+"""contacts birthday_doy
+
+Revision ID: 5f09b8e3c2d1
+Revises: c3a7d51e04b9
+Create Date: 2026-10-18 11:48:03.102957
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f09b8e3c2d1'
+down_revision: Union[str, None] = 'c3a7d51e04b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('birthday_doy', sa.SmallInteger(), nullable=True))
+    # Day of the birthday in a leap-year calendar, see database.models.birthday_doy.
+    op.execute(
+        "UPDATE contacts SET birthday_doy = EXTRACT(DOY FROM make_date("
+        "2000, EXTRACT(MONTH FROM birthday)::int, EXTRACT(DAY FROM birthday)::int))"
+        " WHERE birthday IS NOT NULL"
+    )
+    op.create_index('ix_contacts_user_id_birthday_doy', 'contacts', ['user_id', 'birthday_doy'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_birthday_doy', table_name='contacts')
+    op.drop_column('contacts', 'birthday_doy')
@@ -0,0 +1,31 @@
+"""contacts keyset index
+
+Revision ID: 8e1f6c2a9d47
+Revises: 4b2532e0cbf1
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e1f6c2a9d47'
+down_revision: Union[str, None] = '4b2532e0cbf1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_contacts_user_id_name_order',
+        'contacts',
+        ['user_id', 'last_name', 'first_name', 'id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_name_order', table_name='contacts')
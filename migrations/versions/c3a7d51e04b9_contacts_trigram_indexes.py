@@ -0,0 +1,42 @@
+"""contacts trigram indexes
+
+Revision ID: c3a7d51e04b9
+Revises: 8e1f6c2a9d47
+Create Date: 2026-10-18 11:02:15.774630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a7d51e04b9'
+down_revision: Union[str, None] = '8e1f6c2a9d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGRAM_COLUMNS = ('first_name', 'last_name', 'email')
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in TRIGRAM_COLUMNS:
+        op.create_index(
+            f'ix_contacts_{column}_trgm',
+            'contacts',
+            [column],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'},
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for column in TRIGRAM_COLUMNS:
+        op.drop_index(f'ix_contacts_{column}_trgm', table_name='contacts')
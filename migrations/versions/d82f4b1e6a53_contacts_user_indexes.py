@@ -0,0 +1,35 @@
+"""contacts user indexes
+
+Revision ID: d82f4b1e6a53
+Revises: a41c9e7f2b60
+Create Date: 2026-10-18 15:06:27.554180
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd82f4b1e6a53'
+down_revision: Union[str, None] = 'a41c9e7f2b60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # (user_id, last_name, first_name) is already served by the prefix of
+    # ix_contacts_user_id_name_order.
+    op.create_index('ix_contacts_user_id_id', 'contacts', ['user_id', 'id'], unique=False)
+    op.create_index(
+        'ix_contacts_user_id_lower_email',
+        'contacts',
+        ['user_id', sa.text('lower(email)')],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_lower_email', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_id', table_name='contacts')
@@ -1,21 +1,54 @@
-from typing import List
+import calendar
+from difflib import SequenceMatcher
+from typing import AsyncIterator, List, TYPE_CHECKING
 
-from sqlalchemy import select, and_, or_
+from sqlalchemy import select, insert, update, delete, and_, or_, tuple_, func, any_, literal, ARRAY, Integer
 from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
-from database.models import Contact, User
+from database.models import Contact, User, birthday_doy
+from repository.versions import contact_versions, recent_contact_writes
 from schemas import ContactBase
 
+if TYPE_CHECKING:
+  from aioredis import Redis
+
+# Stable ordering shared by offset and keyset pagination. It is backed by the
+# (user_id, last_name, first_name, id) index on contacts.
+CONTACT_ORDER = (Contact.last_name, Contact.first_name, Contact.id)
+
+# Columns covered by free-text search and by the pg_trgm GIN indexes.
+SEARCH_COLUMNS = (Contact.first_name, Contact.last_name, Contact.email)
+
+class BatchTooLargeError(Exception):
+  """
+  Raised when a bulk write would touch more Contacts than allowed.
+  """
+  def __init__(self, limit: int):
+    super().__init__(f"The selection matches more than {limit} contacts")
+    self.limit = limit
+
 class ContactRepository:
-  def __init__(self, session: AsyncSession):
+  def __init__(self, session: AsyncSession, redis: "Redis | None" = None):
     """
     Initialize a ContactsRepository.
 
     Args:
       session: An AsyncSession object connected to the database.
+      redis: The Redis client holding the contact data versions. Without it
+        mutations do not invalidate ETags.
     """
     self.db = session
+    self.redis = redis
+    self._changed_users = set()
+
+  async def _commit(self, *user_ids: int):
+    await self.db.commit()
+    if self.redis is not None:
+      for user_id in {*user_ids, *self._changed_users}:
+        await recent_contact_writes.mark(self.redis, user_id)
+        await contact_versions.bump(self.redis, user_id)
+    self._changed_users.clear()
 
   async def get_contacts(self, skip: int, limit: int, user: User) -> List[Contact]:
     """
@@ -29,10 +62,43 @@ class ContactRepository:
     Returns:
       A list of Contacts.
     """
-    stmt = select(Contact).filter_by(user=user).offset(skip).limit(limit)
+    stmt = (
+      select(Contact)
+      .filter(Contact.user_id == user.id)
+      .order_by(*CONTACT_ORDER)
+      .offset(skip)
+      .limit(limit)
+    )
     contacts = await self.db.execute(stmt)
     return contacts.scalars().all()
 
+  async def stream_contacts(self, user: User, batch_size: int) -> AsyncIterator[list]:
+    """
+    Stream every Contact owned by `user` in fixed-size batches.
+
+    Plain column rows are fetched through a server-side cursor, so neither
+    the driver nor the session identity map grows with the address book.
+
+    Args:
+      user: The owner of the Contacts.
+      batch_size: The number of rows per batch.
+
+    Yields:
+      Lists of (id, first_name, last_name, email, phone, birthday) rows.
+    """
+    stmt = (
+      select(Contact.id, Contact.first_name, Contact.last_name, Contact.email, Contact.phone, Contact.birthday)
+      .filter(Contact.user_id == user.id)
+      .order_by(*CONTACT_ORDER)
+      .execution_options(yield_per=batch_size)
+    )
+    result = await self.db.stream(stmt)
+    try:
+      async for batch in result.partitions(batch_size):
+        yield batch
+    finally:
+      await result.close()
+
   async def get_contact_by_id(self, contact_id: int, user: User) -> Contact | None:
     """
     Get a Contact by its id.
@@ -44,10 +110,34 @@ class ContactRepository:
     Returns:
       The Contact with the specified id, or None if no such Contact exists.
     """
-    stmt = select(Contact).filter_by(id=contact_id, user=user)
+    stmt = select(Contact).filter(Contact.id == contact_id, Contact.user_id == user.id)
     contact = await self.db.execute(stmt)
     return contact.scalar_one_or_none()
 
+  async def get_contacts_by_ids(self, ids: List[int], user: User) -> List[Contact]:
+    """
+    Get the Contacts with the given ids in a single query.
+
+    Args:
+      ids: The ids of the Contacts to get.
+      user: The owner of the Contacts.
+
+    Returns:
+      The found Contacts, in no particular order.
+    """
+    if not ids:
+      return []
+    stmt = select(Contact).filter(Contact.user_id == user.id, self._ids_filter(ids))
+    contacts = await self.db.execute(stmt)
+    return contacts.scalars().all()
+
+  def _ids_filter(self, ids: List[int]):
+    # On PostgreSQL the ids are bound as one array parameter, so the statement
+    # text (and its prepared statement) is the same for any number of ids.
+    if self.db.bind.dialect.name == "postgresql":
+      return Contact.id == any_(literal(list(ids), ARRAY(Integer)))
+    return Contact.id.in_(ids)
+
   async def create_contact(self, body: ContactBase, user: User) -> Contact:
     """
     Create a new Contact with the given attributes.
@@ -59,16 +149,42 @@ class ContactRepository:
     Returns:
       A Contact with the assigned attributes.
     """
-    if body.birthday and body.birthday.tzinfo:
-      body.birthday = body.birthday.replace(tzinfo=None)
-    contact = Contact(
-      **body.model_dump(exclude_unset=True),
-      user=user
-    )
-    self.db.add(contact)
-    await self.db.commit()
-    await self.db.refresh(contact)
-    return await self.get_contact_by_id(contact.id, user)
+    values = body.model_dump(exclude_unset=True)
+    # Explicit, since the column default would leave birthday_doy unset.
+    values["birthday"] = values.get("birthday") or datetime.utcnow()
+    stmt = insert(Contact).values(**_contact_values(values), user_id=user.id).returning(Contact)
+    contact = await self.db.execute(stmt)
+    contact = contact.scalar_one()
+    await self._commit(user.id)
+    return contact
+
+  async def create_contacts(self, bodies: List[ContactBase], user: User) -> int:
+    """
+    Insert many Contacts with a single multi-row INSERT.
+
+    The caller owns the transaction, call `commit` once every chunk is written.
+
+    Args:
+      bodies: The ContactModels to insert.
+      user: The User who owns the Contacts.
+
+    Returns:
+      The number of inserted Contacts.
+    """
+    if not bodies:
+      return 0
+    rows = []
+    for body in bodies:
+      values = body.model_dump()
+      values["birthday"] = values["birthday"] or datetime.utcnow()
+      rows.append({**_contact_values(values), "user_id": user.id})
+    await self.db.execute(insert(Contact).values(rows))
+    self._changed_users.add(user.id)
+    return len(rows)
+
+  async def commit(self):
+    """Commit the current transaction."""
+    await self._commit()
 
   async def remove_contact(self, contact_id: int, user: User) -> Contact | None:
     """
@@ -81,10 +197,15 @@ class ContactRepository:
     Returns:
       The deleted Contact, or None if no Contact with the given id exists.
     """
-    contact = await self.get_contact_by_id(contact_id, user)
-    if contact:
-      await self.db.delete(contact)
-      await self.db.commit()
+    stmt = (
+      delete(Contact)
+      .where(Contact.id == contact_id, Contact.user_id == user.id)
+      .returning(Contact)
+      .execution_options(synchronize_session=False)
+    )
+    contact = await self.db.execute(stmt)
+    contact = contact.scalar_one_or_none()
+    await self._commit(*([user.id] if contact is not None else []))
     return contact
 
   async def update_contact(
@@ -100,17 +221,103 @@ class ContactRepository:
     Returns:
       The updated Contact, or None if no Contact with the given id exists.
     """
-    if body.birthday and body.birthday.tzinfo:
-      body.birthday = body.birthday.replace(tzinfo=None)
-    contact = await self.get_contact_by_id(contact_id, user)
-    if contact:
-      for key, value in body.dict(exclude_unset=True).items():
-        setattr(contact, key, value)
+    values = _contact_values(body.model_dump(exclude_unset=True))
+    stmt = (
+      update(Contact)
+      .where(Contact.id == contact_id, Contact.user_id == user.id)
+      .values(**values)
+      .returning(Contact)
+      .execution_options(synchronize_session=False)
+    )
+    contact = await self.db.execute(stmt)
+    contact = contact.scalar_one_or_none()
+    await self._commit(*([user.id] if contact is not None else []))
+    return contact
 
-      await self.db.commit()
-      await self.db.refresh(contact)
+  async def remove_contacts(
+    self, ids: List[int] | None, filters: dict | None, user: User, max_rows: int
+  ) -> List[int]:
+    """
+    Delete many Contacts with a single DELETE.
 
-    return contact
+    Args:
+      ids: The ids of the Contacts to delete, or None to select by `filters`.
+      filters: Exact first_name, last_name and email values, all of which must match.
+      user: The owner of the Contacts.
+      max_rows: The maximum number of Contacts one call may delete.
+
+    Returns:
+      The ids of the deleted Contacts.
+
+    Raises:
+      BatchTooLargeError: If more than `max_rows` Contacts match; nothing is deleted.
+    """
+    selection = await self._selection(ids, filters, user, max_rows)
+    stmt = (
+      delete(Contact)
+      .where(Contact.user_id == user.id, selection)
+      .returning(Contact.id)
+      .execution_options(synchronize_session=False)
+    )
+    return await self._write_many(stmt, user, max_rows)
+
+  async def update_contacts(
+    self, ids: List[int] | None, filters: dict | None, values: dict, user: User, max_rows: int
+  ) -> List[int]:
+    """
+    Apply one patch to many Contacts with a single UPDATE.
+
+    Args:
+      ids: The ids of the Contacts to update, or None to select by `filters`.
+      filters: Exact first_name, last_name and email values, all of which must match.
+      values: The attributes to assign.
+      user: The owner of the Contacts.
+      max_rows: The maximum number of Contacts one call may update.
+
+    Returns:
+      The ids of the updated Contacts.
+
+    Raises:
+      BatchTooLargeError: If more than `max_rows` Contacts match; nothing is updated.
+    """
+    selection = await self._selection(ids, filters, user, max_rows)
+    stmt = (
+      update(Contact)
+      .where(Contact.user_id == user.id, selection)
+      .values(**_contact_values(dict(values)))
+      .returning(Contact.id)
+      .execution_options(synchronize_session=False)
+    )
+    return await self._write_many(stmt, user, max_rows)
+
+  async def _selection(self, ids: List[int] | None, filters: dict | None, user: User, max_rows: int):
+    # Checked before writing, so an oversized selection never takes row locks.
+    # An id list no longer than the limit cannot exceed it and needs no count.
+    if ids is not None:
+      condition = self._ids_filter(ids)
+      if len(set(ids)) <= max_rows:
+        return condition
+    else:
+      condition = _exact_filter(filters or {})
+      if condition is None:
+        raise ValueError("A bulk write needs ids or at least one filter")
+    count = await self.db.scalar(
+      select(func.count()).select_from(Contact).where(Contact.user_id == user.id, condition)
+    )
+    if count > max_rows:
+      raise BatchTooLargeError(max_rows)
+    return condition
+
+  async def _write_many(self, stmt, user: User, max_rows: int) -> List[int]:
+    # Rows inserted after the count can still push a write over the limit;
+    # the RETURNING rows catch that and the write is rolled back.
+    result = await self.db.execute(stmt)
+    ids = result.scalars().all()
+    if len(ids) > max_rows:
+      await self.db.rollback()
+      raise BatchTooLargeError(max_rows)
+    await self._commit(*([user.id] if ids else []))
+    return ids
 
   async def search_contacts(
       self, skip: int, limit: int, first_name: str | None, last_name: str | None, email: str | None,  user: User,
@@ -129,42 +336,178 @@ class ContactRepository:
     Returns:
       The Contact that fits search query or None if no such Contact exists.
     """
-    stmt = select(Contact).filter_by(user=user).offset(skip).limit(limit)
+    stmt = self._search_stmt(first_name, last_name, email, user)
+    stmt = stmt.offset(skip).limit(limit)
+
+    results = await self.db.execute(stmt)
+    return results.scalars().all()
+
+  async def search_contacts_after(
+      self, after: tuple[str, str, int] | None, limit: int, first_name: str | None, last_name: str | None,
+      email: str | None, user: User,
+  ) -> List[Contact]:
+    """
+    Search Contacts with keyset pagination.
 
-    if first_name or last_name or email:
-      filters = []
-      if first_name:
-        filters.append(Contact.first_name.ilike(f"%{first_name}%"))
-      if last_name:
-        filters.append(Contact.last_name.ilike(f"%{last_name}%"))
-      if email:
-        filters.append(Contact.email.ilike(f"%{email}%"))
-      stmt = stmt.filter(or_(*filters))
+    Rows are ordered by (last_name, first_name, id) and the page starts right
+    after the `after` key, so the database seeks on the index instead of
+    skipping rows.
+
+    Args:
+      after: The (last_name, first_name, id) of the last Contact of the previous page, or None for the first page.
+      limit: The maximum number of Contacts to return.
+      first_name: The first name of the Contact.
+      last_name: The last name of the Contact.
+      email: The email of the Contact.
+      user: The User who owns the Contact.
+
+    Returns:
+      A list of Contacts that follow the `after` key.
+    """
+    stmt = self._search_stmt(first_name, last_name, email, user)
+    if after is not None:
+      stmt = stmt.filter(tuple_(*CONTACT_ORDER) > tuple_(*after))
+    stmt = stmt.limit(limit)
 
     results = await self.db.execute(stmt)
     return results.scalars().all()
+
+  async def search_contacts_ranked(self, query: str, skip: int, limit: int, user: User) -> List[Contact]:
+    """
+    Search Contacts by a free-text term ranked by similarity.
+
+    On PostgreSQL the term is matched with the pg_trgm `%` operator (typo
+    tolerant) and `ILIKE`, both served by the trigram GIN indexes, and rows are
+    ranked by the best `similarity()` over first name, last name and email.
+    Other databases fall back to an `ILIKE` substring match ranked in Python.
+
+    Args:
+      query: The search term.
+      skip: The number of Contacts to skip.
+      limit: The maximum number of Contacts to return.
+      user: The User who owns the Contacts.
+
+    Returns:
+      A list of matching Contacts, best match first.
+    """
+    substring = or_(*(column.ilike(f"%{query}%") for column in SEARCH_COLUMNS))
+
+    if self.db.bind.dialect.name == "postgresql":
+      rank = func.greatest(*(func.similarity(column, query) for column in SEARCH_COLUMNS))
+      fuzzy = or_(*(column.op("%")(query) for column in SEARCH_COLUMNS))
+      stmt = (
+        select(Contact)
+        .filter(Contact.user_id == user.id, or_(fuzzy, substring))
+        .order_by(rank.desc(), Contact.id)
+        .offset(skip)
+        .limit(limit)
+      )
+      results = await self.db.execute(stmt)
+      return results.scalars().all()
+
+    stmt = select(Contact).filter(Contact.user_id == user.id, substring)
+    results = await self.db.execute(stmt)
+    contacts = sorted(
+      results.scalars().all(), key=lambda contact: (-_similarity(query, contact), contact.id)
+    )
+    return contacts[skip:skip + limit]
+
+  def _search_stmt(self, first_name: str | None, last_name: str | None, email: str | None, user: User):
+    stmt = select(Contact).filter(Contact.user_id == user.id).order_by(*CONTACT_ORDER)
+    condition = _search_filter(first_name, last_name, email)
+    if condition is not None:
+      stmt = stmt.filter(condition)
+    return stmt
   
-  async def get_upcoming_birthdays(self, user: User) -> List[Contact]:
+  async def get_upcoming_birthdays(self, user: User, days: int = 7, today: date | None = None) -> List[Contact]:
     """
-    Retrieves contacts with birthdays within the next week.
+    Retrieves contacts whose birthday falls within the next `days` days.
+
+    The lookup uses the indexed (user_id, birthday_doy) pair, so it matches
+    every year, wraps around the year end and celebrates Feb 29 birthdays on
+    Feb 28 in non-leap years.
 
     Args:
       user: The user whose contacts to check.
+      days: The size of the window after today, inclusive.
+      today: The first day of the window, defaults to the current UTC date.
 
     Returns:
-      A list of contacts with upcoming birthdays.
+      A list of contacts with upcoming birthdays, nearest first.
     """
-    today = datetime.utcnow()
-    next_week = today + timedelta(days=7)
+    today = today or datetime.utcnow().date()
+    windows = birthday_windows(today, days)
 
-    stmt = select(Contact).filter(
-      and_(
-        Contact.user == user,
-        Contact.birthday >= today.replace(hour=0, minute=0, second=0, microsecond=0),
-        Contact.birthday <= next_week.replace(hour=23, minute=59, second=59, microsecond=999999),
+    stmt = (
+      select(Contact)
+      .filter(
+        Contact.user_id == user.id,
+        or_(*(Contact.birthday_doy.between(start, end) for start, end in windows)),
       )
+      .order_by(Contact.birthday_doy < windows[0][0], Contact.birthday_doy, Contact.id)
     )
 
     results = await self.db.execute(stmt)
     return results.scalars().all()
 
+
+def birthday_windows(today: date, days: int) -> list[tuple[int, int]]:
+  """
+  Translates a window of `days` days starting at `today` into birthday_doy ranges.
+
+  Args:
+    today: The first day of the window.
+    days: The size of the window after today, inclusive.
+
+  Returns:
+    One inclusive (start, end) range, or two when the window crosses the year end.
+  """
+  if days >= 365:
+    return [(1, 366)]
+  end = today + timedelta(days=days)
+  start_doy = birthday_doy(today)
+  end_doy = birthday_doy(end)
+  if end_doy == 59 and not calendar.isleap(end.year):
+    end_doy = 60
+  if today.year == end.year:
+    return [(start_doy, end_doy)]
+  return [(start_doy, 366), (1, end_doy)]
+
+def _search_filter(first_name: str | None, last_name: str | None, email: str | None):
+  filters = []
+  if first_name:
+    filters.append(Contact.first_name.ilike(f"%{first_name}%"))
+  if last_name:
+    filters.append(Contact.last_name.ilike(f"%{last_name}%"))
+  if email:
+    filters.append(Contact.email.ilike(f"%{email}%"))
+  return or_(*filters) if filters else None
+
+def _exact_filter(filters: dict):
+  # Destructive writes match whole values and require every given one:
+  # substrings ORed together would reach far more rows than the caller named.
+  conditions = []
+  if filters.get("first_name"):
+    conditions.append(Contact.first_name == filters["first_name"])
+  if filters.get("last_name"):
+    conditions.append(Contact.last_name == filters["last_name"])
+  if filters.get("email"):
+    # Emails compare case-insensitively, on the (user_id, lower(email)) index.
+    conditions.append(func.lower(Contact.email) == filters["email"].lower())
+  return and_(*conditions) if conditions else None
+
+def _contact_values(values: dict) -> dict:
+  # Stores birthdays as naive UTC and keeps birthday_doy in step with them.
+  birthday = values.get("birthday")
+  if birthday is not None and birthday.tzinfo:
+    values["birthday"] = birthday = birthday.replace(tzinfo=None)
+  if "birthday" in values:
+    values["birthday_doy"] = birthday_doy(birthday)
+  return values
+
+def _similarity(query: str, contact: Contact) -> float:
+  query = query.lower()
+  return max(
+    SequenceMatcher(None, query, (value or "").lower()).ratio()
+    for value in (contact.first_name, contact.last_name, contact.email)
+  )
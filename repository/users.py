@@ -18,6 +18,11 @@ class UserRepository:
     user = await self.db.execute(stmt)
     return user.scalar_one_or_none()
 
+  async def get_users_by_usernames(self, usernames: list[str]) -> list[User]:
+    stmt = select(User).filter(User.username.in_(usernames))
+    users = await self.db.execute(stmt)
+    return users.scalars().all()
+
   async def get_user_by_email(self, email: str) -> User | None:
     stmt = select(User).filter_by(email=email)
     user = await self.db.execute(stmt)
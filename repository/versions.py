@@ -0,0 +1,119 @@
+import logging
+import time
+from typing import TYPE_CHECKING
+
+from conf.config import config
+
+if TYPE_CHECKING:
+  from aioredis import Redis
+
+logger = logging.getLogger(__name__)
+
+class DataVersions:
+  """
+  Per-user data version counters kept in Redis.
+
+  Writers bump the counter after their transaction commits, so a reader that
+  sees a version never sees data older than it. A reader racing a write can
+  only pair newer data with an older version, which costs the client one
+  extra full response and never serves it stale data.
+
+  A missing counter, after an eviction, a flush or a restart of Redis, is
+  seeded from the clock instead of starting over at zero, so it never counts
+  through versions that were already handed out.
+  """
+  def __init__(self, name: str):
+    self.name = name
+
+  def _key(self, user_id: int) -> str:
+    return f"version:{self.name}:{user_id}"
+
+  async def get(self, redis: "Redis", user_id: int) -> int | None:
+    """
+    Returns the current version of a user's data.
+
+    Args:
+      redis: The Redis client.
+      user_id: The owner of the data.
+
+    Returns:
+      The version, or None if Redis is unavailable.
+    """
+    key = self._key(user_id)
+    try:
+      version = await redis.get(key)
+      if version is None:
+        # Re-read, so readers racing to seed the counter agree on one value.
+        await redis.set(key, time.time_ns(), nx=True)
+        version = await redis.get(key)
+      return int(version)
+    except Exception:
+      logger.warning("Could not read %s version", self.name, exc_info=True)
+      return None
+
+  async def bump(self, redis: "Redis", user_id: int):
+    """
+    Invalidates every version handed out for a user's data.
+
+    Args:
+      redis: The Redis client.
+      user_id: The owner of the data.
+    """
+    key = self._key(user_id)
+    try:
+      if not await redis.set(key, time.time_ns(), nx=True):
+        await redis.incr(key)
+    except Exception:
+      logger.error("Could not bump %s version of user %s", self.name, user_id, exc_info=True)
+
+class RecentWrites:
+  """
+  Remembers for `window` seconds that a user wrote, so their reads can stay
+  on the primary until replicas have caught up.
+
+  The mark lives in Redis so it holds whichever worker serves the next
+  request; the writing worker also keeps it locally and skips the lookup.
+  """
+  def __init__(self, name: str, window: float):
+    self.name = name
+    self.window = window
+    self._local: dict[str, float] = {}
+
+  def _key(self, key) -> str:
+    return f"recent-write:{self.name}:{key}"
+
+  async def mark(self, redis: "Redis", key):
+    """
+    Records a write by `key`, a user id or username.
+    """
+    if self.window <= 0:
+      return
+    if len(self._local) > 10000:
+      now = time.monotonic()
+      self._local = {k: until for k, until in self._local.items() if until > now}
+    self._local[str(key)] = time.monotonic() + self.window
+    try:
+      await redis.set(self._key(key), 1, px=int(self.window * 1000))
+    except Exception:
+      logger.warning("Could not record a %s write", self.name, exc_info=True)
+
+  async def check(self, redis: "Redis", key) -> bool:
+    """
+    Tells whether `key` wrote within the window.
+
+    Returns:
+      True if reads must go to the primary, also when Redis is unavailable.
+    """
+    if self.window <= 0:
+      return False
+    if self._local.get(str(key), 0.0) > time.monotonic():
+      return True
+    try:
+      return bool(await redis.exists(self._key(key)))
+    except Exception:
+      logger.warning("Could not check %s writes", self.name, exc_info=True)
+      return True
+
+contact_versions = DataVersions("contacts")
+recent_contact_writes = RecentWrites("contacts", config.DB_READ_YOUR_WRITES_SECONDS)
+recent_user_writes = RecentWrites("user", config.DB_READ_YOUR_WRITES_SECONDS)
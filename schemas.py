@@ -1,5 +1,7 @@
 from datetime import datetime
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, model_validator
+
+from conf.config import config
 
 class ContactBase(BaseModel):
   first_name: str = Field(max_length=50)
@@ -13,6 +15,69 @@ class ContactResponse(ContactBase):
 
   model_config = ConfigDict(from_attributes=True)
 
+class ContactBatchGet(BaseModel):
+  ids: list[int] = Field(min_length=1, max_length=config.BATCH_GET_MAX_IDS)
+
+class ContactBatchResponse(BaseModel):
+  contacts: list[ContactResponse]
+  missing: list[int]
+
+class ContactFilter(BaseModel):
+  first_name: str | None = Field(None, min_length=1, max_length=50)
+  last_name: str | None = Field(None, min_length=1, max_length=50)
+  email: str | None = Field(None, min_length=1, max_length=50)
+
+class ContactSelection(BaseModel):
+  """
+  Contacts picked either by id or by a filter of exact values, all of which
+  must match; emails compare case-insensitively.
+  """
+  ids: list[int] | None = Field(None, min_length=1)
+  filter: ContactFilter | None = None
+
+  @model_validator(mode="after")
+  def check_selection(self):
+    if (self.ids is None) == (self.filter is None):
+      raise ValueError("Provide either ids or filter")
+    if self.filter is not None and not self.filter.model_dump(exclude_none=True):
+      raise ValueError("filter needs at least one field")
+    return self
+
+class ContactBulkDelete(ContactSelection):
+  ids: list[int] | None = Field(None, min_length=1, max_length=config.BULK_DELETE_MAX)
+
+class ContactPatch(BaseModel):
+  first_name: str | None = Field(None, max_length=50)
+  last_name: str | None = Field(None, max_length=50)
+  email: str | None = Field(None, max_length=50)
+  phone: str | None = Field(None, max_length=50)
+  birthday: datetime | None = None
+
+class ContactBulkUpdate(ContactSelection):
+  ids: list[int] | None = Field(None, min_length=1, max_length=config.BULK_UPDATE_MAX)
+  patch: ContactPatch
+
+  @model_validator(mode="after")
+  def check_patch(self):
+    if not self.patch.model_fields_set:
+      raise ValueError("patch needs at least one field")
+    for field in ("first_name", "last_name", "email", "phone", "birthday"):
+      if field in self.patch.model_fields_set and getattr(self.patch, field) is None:
+        raise ValueError(f"patch.{field} cannot be null")
+    return self
+
+class ContactBulkResult(BaseModel):
+  ids: list[int]
+
+class BulkImportError(BaseModel):
+  row: int
+  error: str
+
+class BulkImportReport(BaseModel):
+  inserted: int
+  failed: int
+  errors: list[BulkImportError]
+
 class User(BaseModel):
   id: int
   username: str
@@ -22,6 +87,10 @@ class User(BaseModel):
   class Config:
     orm_mode = True
   
+class CurrentUser(User):
+  role: str = "user"
+  confirmed: bool = False
+
 class UserCreate(BaseModel):
   username: str
   email: str
@@ -0,0 +1,129 @@
+"""
+Production entry point: a pre-fork gunicorn master managing uvicorn workers.
+
+  python -m server
+
+- SERVER_WORKERS processes (default: one per CPU) serve `main:app`. Each
+  uses uvloop and httptools when they are installed.
+- One-time jobs run once before forking, each in a subprocess so the master
+  never imports the app: migrations when SERVER_RUN_MIGRATIONS is set, and
+  the shared Redis user cache warmup. Each worker's lifespan then only warms
+  its own pools and local caches.
+- A worker is recycled after SERVER_MAX_REQUESTS requests, plus a random
+  jitter of up to SERVER_MAX_REQUESTS_JITTER so workers do not restart
+  together.
+- `kill -HUP <master pid>` reloads gracefully: new workers start and old
+  ones stop accepting, drain in-flight requests, and exit within
+  SERVER_GRACEFUL_TIMEOUT seconds. New workers import the app afresh, so a
+  reload picks up new code. With SERVER_PRELOAD the master imports the app
+  once and shares it with the workers, which saves memory, but then a code
+  change needs a full restart.
+- Metrics live in each worker's memory: /api/metrics reports only the
+  worker that answered, and is not aggregated across workers. Scrape every
+  worker, or run one worker per container.
+
+`python main.py` remains the single-process development server.
+"""
+import importlib.util
+import logging
+import os
+import subprocess
+import sys
+
+from gunicorn.app.base import BaseApplication
+
+try:
+  from uvicorn_worker import UvicornWorker
+except ImportError:  # uvicorn < 0.30 ships the worker itself
+  from uvicorn.workers import UvicornWorker
+
+from conf.config import config
+
+logger = logging.getLogger("server")
+
+# services.lifecycle.SHARED_WARMUP_DONE_ENV, which the master must not import.
+SHARED_WARMUP_DONE_ENV = "CONTACTS_SHARED_WARMUP_DONE"
+
+class Worker(UvicornWorker):
+  # "auto" picks uvloop and httptools when installed, asyncio and h11 otherwise.
+  CONFIG_KWARGS = {"loop": "auto", "http": "auto", "lifespan": "on"}
+
+def on_starting(server):
+  """Runs once in the master, before any worker is forked."""
+  if config.SERVER_RUN_MIGRATIONS:
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], check=True)
+
+  if subprocess.run([sys.executable, "-m", "services.lifecycle"]).returncode == 0:
+    os.environ[SHARED_WARMUP_DONE_ENV] = "1"
+  else:
+    # Workers fall back to warming the shared tier themselves.
+    logger.warning("Shared warmup failed")
+
+  per_worker = config.DB_POOL_SIZE + config.DB_MAX_OVERFLOW
+  logger.info(
+    "Starting %s workers: up to %s database connections in total",
+    server.cfg.workers, server.cfg.workers * per_worker,
+  )
+  if not server.cfg.preload_app:
+    # The settings were read already; workers forked after a HUP import the
+    # config afresh instead of inheriting the master's copy.
+    sys.modules.pop("conf.config", None)
+    sys.modules.pop("conf", None)
+
+def post_worker_init(worker):
+  """Runs in every worker once it is set up, before it serves requests."""
+  loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+  http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+  worker.log.info(
+    "Worker %s ready: %s loop, %s parser, recycled after %s requests",
+    worker.pid, loop, http, worker.max_requests or "unlimited",
+  )
+
+def worker_exit(server, worker):
+  server.log.info("Worker %s exited", worker.pid)
+
+def options() -> dict:
+  """
+  Builds the gunicorn settings from the app config.
+
+  Returns:
+    Gunicorn settings by name.
+  """
+  return {
+    "bind": f"{config.SERVER_HOST}:{config.SERVER_PORT}",
+    "workers": config.SERVER_WORKERS,
+    "worker_class": Worker,
+    "max_requests": config.SERVER_MAX_REQUESTS,
+    "max_requests_jitter": config.SERVER_MAX_REQUESTS_JITTER,
+    "graceful_timeout": config.SERVER_GRACEFUL_TIMEOUT,
+    "timeout": config.SERVER_TIMEOUT,
+    "keepalive": config.SERVER_KEEPALIVE,
+    # Importing the app before forking shares its memory between workers
+    # (nothing connects at import time, so no socket is shared), at the cost
+    # of HUP reloads keeping the old code.
+    "preload_app": config.SERVER_PRELOAD,
+    "on_starting": on_starting,
+    "post_worker_init": post_worker_init,
+    "worker_exit": worker_exit,
+  }
+
+class Server(BaseApplication):
+  def __init__(self, settings: dict):
+    self.settings = settings
+    super().__init__()
+
+  def load_config(self):
+    for key, value in self.settings.items():
+      self.cfg.set(key, value)
+
+  def load(self):
+    from main import app
+
+    return app
+
+def main():
+  logging.basicConfig(level=logging.INFO)
+  Server(options()).run()
+
+if __name__ == "__main__":
+  main()
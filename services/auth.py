@@ -1,19 +1,93 @@
-import json
-from aioredis import Redis
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, UTC
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from database.db import get_db
+from database.db import get_db, get_redis, sessionmanager
+from repository.versions import recent_contact_writes, recent_user_writes
 from schemas import User
 from conf.config import config
 from services.users import UserService
-from main import app
+from services.user_cache import user_cache
+
+if TYPE_CHECKING:
+  from aioredis import Redis
+
+class HashPool:
+  """
+  Runs bcrypt in a bounded thread pool so it never blocks the event loop.
+
+  bcrypt releases the GIL, so the workers hash in parallel. Calls beyond
+  `max_pending` (running plus queued) are rejected with 503 instead of
+  queueing, so a login flood cannot starve unrelated requests.
+  """
+  def __init__(self, workers: int, max_pending: int):
+    self.workers = workers
+    self.max_pending = max_pending
+    self.pending = 0
+    self.rejected = 0
+    self._lock = threading.Lock()
+    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+
+  async def run(self, fn, *args):
+    """
+    Runs `fn(*args)` in the pool.
+
+    Args:
+      fn: The blocking callable.
+      *args: Positional arguments for `fn`.
+
+    Returns:
+      The result of `fn`.
+
+    Raises:
+      HTTPException: If the pool already holds `max_pending` calls.
+    """
+    if self.pending >= self.max_pending:
+      self.rejected += 1
+      raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Сервер перевантажений. Спробуйте пізніше.",
+        headers={"Retry-After": "1"},
+      )
+    with self._lock:
+      self.pending += 1
+    # Released when the job itself finishes: a cancelled awaiter (a client
+    # that disconnected) leaves the job queued or running in the executor.
+    job = self._executor.submit(fn, *args)
+    job.add_done_callback(self._release)
+    return await asyncio.wrap_future(job)
+
+  def _release(self, job):
+    with self._lock:
+      self.pending -= 1
+
+  def stats(self) -> dict:
+    """
+    Returns the pool counters.
+
+    Returns:
+      dict: Worker count, calls in flight, queue depth and rejected calls.
+    """
+    return {
+      "workers": self.workers,
+      "max_pending": self.max_pending,
+      "pending": self.pending,
+      "queue_depth": max(0, self.pending - self.workers),
+      "rejected": self.rejected,
+    }
+
+hash_pool = HashPool(config.HASH_WORKERS, config.HASH_MAX_PENDING)
 
 class Hash:
   """Hashes and verifies passwords using bcrypt."""
@@ -44,6 +118,104 @@ class Hash:
     """
     return self.pwd_context.hash(password)
 
+  async def verify_password_async(self, plain_password, hashed_password):
+    """
+    Verifies a password in `hash_pool` without blocking the event loop.
+
+    Args:
+      plain_password (str): The plain text password to verify.
+      hashed_password (str): The hashed password to compare against.
+
+    Returns:
+      bool: True if the passwords match, False otherwise.
+    """
+    return await hash_pool.run(self.verify_password, plain_password, hashed_password)
+
+  async def get_password_hash_async(self, password: str):
+    """
+    Hashes a password in `hash_pool` without blocking the event loop.
+
+    Args:
+      password (str): The plain text password to hash.
+
+    Returns:
+      str: The hashed password.
+    """
+    return await hash_pool.run(self.get_password_hash, password)
+
+class TokenCache:
+  """
+  Bounded LRU of verified JWT claims keyed by the SHA-256 digest of the token.
+
+  An entry is dropped as soon as the token's `exp` is reached, so a cached
+  token is never accepted after it would fail `jwt.decode`.
+  """
+  def __init__(self, maxsize: int):
+    self.maxsize = maxsize
+    self.hits = 0
+    self.misses = 0
+    self._entries: OrderedDict[bytes, dict] = OrderedDict()
+
+  @staticmethod
+  def _key(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+  def get(self, token: str) -> dict | None:
+    """
+    Returns the cached claims of `token`.
+
+    Args:
+      token (str): The raw JWT.
+
+    Returns:
+      dict | None: The decoded claims, or None if absent or expired.
+    """
+    key = self._key(token)
+    payload = self._entries.get(key)
+    if payload is None:
+      self.misses += 1
+      return None
+    if time.time() >= payload["exp"]:
+      del self._entries[key]
+      self.misses += 1
+      return None
+    self._entries.move_to_end(key)
+    self.hits += 1
+    return payload
+
+  def put(self, token: str, payload: dict):
+    """
+    Caches the verified claims of `token`.
+
+    Args:
+      token (str): The raw JWT.
+      payload (dict): Claims returned by `jwt.decode`; tokens without `exp` are not cached.
+    """
+    if self.maxsize <= 0 or not isinstance(payload.get("exp"), (int, float)):
+      return
+    key = self._key(token)
+    self._entries[key] = payload
+    self._entries.move_to_end(key)
+    while len(self._entries) > self.maxsize:
+      self._entries.popitem(last=False)
+
+  def clear(self):
+    """Drops every entry and resets the counters."""
+    self._entries.clear()
+    self.hits = 0
+    self.misses = 0
+
+  def stats(self) -> dict:
+    """
+    Returns the cache counters.
+
+    Returns:
+      dict: Size, capacity, hits and misses.
+    """
+    return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+token_cache = TokenCache(config.TOKEN_CACHE_SIZE)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 async def create_access_token(data: dict, expires_delta: Optional[int] = None):
@@ -71,10 +243,10 @@ async def create_access_token(data: dict, expires_delta: Optional[int] = None):
 async def get_current_user(
   token: str = Depends(oauth2_scheme),
   db: AsyncSession = Depends(get_db),
-  redis: Redis = Depends(lambda: app.state.redis),
+  redis: "Redis" = Depends(get_redis),
 ):
   """
-  Retrieves the current user, using Redis caching to reduce database queries.
+  Retrieves the current user, using the two-tier user cache to reduce database queries.
 
   Args:
     token (str): The JWT token from the `Authorization` header.
@@ -93,32 +265,49 @@ async def get_current_user(
     headers={"WWW-Authenticate": "Bearer"},
   )
 
-  try:
-    payload = jwt.decode(token, config.JWT_SECRET, algorithms=[config.JWT_ALGORITHM])
-    username = payload.get("sub")
-    if username is None:
+  payload = token_cache.get(token)
+  if payload is None:
+    try:
+      payload = jwt.decode(token, config.JWT_SECRET, algorithms=[config.JWT_ALGORITHM])
+    except JWTError:
       raise credentials_exception
-  except JWTError:
+    token_cache.put(token, payload)
+
+  username = payload.get("sub")
+  if username is None:
     raise credentials_exception
 
-  cached_user = await redis.get(f"user:{username}")
+  cached_user = await user_cache.get(redis, username)
   if cached_user:
-    return User(**json.loads(cached_user))
+    return cached_user
 
-  user_service = UserService(db)
-  user = await user_service.get_user_by_username(username)
+  if sessionmanager.replicas and not await recent_user_writes.check(redis, username):
+    async with sessionmanager.read_session() as read_db:
+      user = await UserService(read_db).get_user_by_username(username)
+  else:
+    user = await UserService(db).get_user_by_username(username)
 
   if user is None:
     raise credentials_exception
 
-  await redis.set(
-    f"user:{username}",
-    json.dumps(user.dict()),
-    ex=3600,
-  )
+  await user_cache.set(redis, user)
 
   return user
 
+async def get_read_db(request: Request, user: User = Depends(get_current_user)):
+  """
+  Provides a session for read-only routes, on a replica unless the current
+  user changed their contacts within the read-your-writes window.
+
+  Yields:
+    An asynchronous database session.
+  """
+  recent_write = False
+  if sessionmanager.replicas:
+    recent_write = await recent_contact_writes.check(request.app.state.redis, user.id)
+  async with sessionmanager.read_session(recent_write) as session:
+    yield session
+
 def create_email_token(data: dict):
   """
   Creates a JWT token for email verification.
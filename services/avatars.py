@@ -0,0 +1,262 @@
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from fastapi import HTTPException, UploadFile, status
+from PIL import Image, ImageOps, UnidentifiedImageError
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from conf.config import config
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+ALLOWED_FORMATS = {"JPEG", "PNG"}
+
+# Pillow releases the GIL while decoding and resampling, so resizing runs in
+# parallel here without blocking the event loop.
+image_executor = ThreadPoolExecutor(max_workers=config.AVATAR_WORKERS, thread_name_prefix="avatar")
+
+class AvatarStorage(ABC):
+  """
+  Where processed avatars are stored, keyed by content hash.
+  """
+  @abstractmethod
+  async def exists(self, key: str) -> bool:
+    """Returns True if an avatar with `key` is already stored."""
+
+  @abstractmethod
+  async def save(self, key: str, data: bytes) -> str:
+    """Stores a JPEG avatar under `key` and returns its public URL."""
+
+  @abstractmethod
+  def url(self, key: str) -> str:
+    """Returns the public URL of the avatar stored under `key`."""
+
+class LocalAvatarStorage(AvatarStorage):
+  """
+  Stores avatars as files under `root`, served from `base_url`.
+  """
+  def __init__(self, root: str | Path, base_url: str):
+    self.root = Path(root)
+    self.base_url = base_url.rstrip("/")
+
+  def _path(self, key: str) -> Path:
+    return self.root / f"{key}.jpg"
+
+  async def exists(self, key: str) -> bool:
+    return await asyncio.to_thread(self._path(key).exists)
+
+  def _write(self, key: str, data: bytes):
+    self.root.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+      f.write(data)
+    os.replace(tmp_path, self._path(key))
+
+  async def save(self, key: str, data: bytes) -> str:
+    await asyncio.to_thread(self._write, key, data)
+    return self.url(key)
+
+  def url(self, key: str) -> str:
+    return f"{self.base_url}/{key}.jpg"
+
+class CloudinaryAvatarStorage(AvatarStorage):
+  """
+  Stores avatars in Cloudinary under `folder`; blocking SDK calls run in threads.
+  """
+  def __init__(self, folder: str = "avatars"):
+    self.folder = folder
+    self._configured = False
+
+  def _sdk(self):
+    # The SDK pulls in requests and urllib3, so it is imported and configured
+    # on the first avatar operation rather than at startup.
+    import cloudinary
+
+    if not self._configured:
+      cloudinary.config(
+        cloud_name=config.CLOUDINARY_NAME,
+        api_key=config.CLOUDINARY_API_KEY,
+        api_secret=config.CLOUDINARY_API_SECRET,
+      )
+      self._configured = True
+    return cloudinary
+
+  def _public_id(self, key: str) -> str:
+    return f"{self.folder}/{key}"
+
+  async def exists(self, key: str) -> bool:
+    self._sdk()
+    import cloudinary.api
+    from cloudinary.exceptions import NotFound
+
+    try:
+      await asyncio.to_thread(cloudinary.api.resource, self._public_id(key))
+    except NotFound:
+      return False
+    return True
+
+  async def save(self, key: str, data: bytes) -> str:
+    self._sdk()
+    import cloudinary.uploader
+
+    result = await asyncio.to_thread(
+      cloudinary.uploader.upload, data, public_id=key, folder=self.folder, overwrite=False
+    )
+    return result["secure_url"]
+
+  def url(self, key: str) -> str:
+    cloudinary = self._sdk()
+    return cloudinary.CloudinaryImage(self._public_id(key)).build_url(secure=True, format="jpg")
+
+def get_avatar_storage() -> AvatarStorage:
+  """
+  Builds the storage backend selected by AVATAR_STORAGE.
+
+  Returns:
+    The configured AvatarStorage.
+  """
+  if config.AVATAR_STORAGE == "local":
+    return LocalAvatarStorage(config.AVATAR_LOCAL_DIR, config.AVATAR_BASE_URL)
+  return CloudinaryAvatarStorage()
+
+class UploadSizeLimit:
+  """
+  ASGI middleware capping the raw request body of upload routes.
+
+  Form parsing spools the whole multipart body before a handler runs, so the
+  cap has to hold here: a Content-Length over it is refused unread, and a
+  body without one (chunked) is cut off as soon as it crosses the cap.
+  """
+  def __init__(self, app, paths: set[str], max_bytes: int):
+    self.app = app
+    self.paths = paths
+    self.max_bytes = max_bytes
+
+  async def __call__(self, scope, receive, send):
+    if scope["type"] != "http" or scope["path"] not in self.paths:
+      await self.app(scope, receive, send)
+      return
+
+    content_length = Headers(scope=scope).get("content-length")
+    if content_length is not None and not content_length.isdigit():
+      await self._reject(scope, receive, send, status.HTTP_400_BAD_REQUEST, "Invalid Content-Length header.")
+      return
+    if content_length is not None and int(content_length) > self.max_bytes:
+      await self._reject(scope, receive, send, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, self._too_large())
+      return
+
+    received = 0
+    rejected = False
+
+    async def limited_receive():
+      nonlocal received, rejected
+      if rejected:
+        return {"type": "http.disconnect"}
+      message = await receive()
+      if message["type"] == "http.request":
+        received += len(message.get("body", b""))
+        if received > self.max_bytes:
+          # The app is still reading the body, so nothing was sent yet. It
+          # sees a disconnect, and whatever it answers to that is dropped.
+          rejected = True
+          await self._reject(scope, receive, send, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, self._too_large())
+          return {"type": "http.disconnect"}
+      return message
+
+    async def guarded_send(message):
+      if not rejected:
+        await send(message)
+
+    await self.app(scope, limited_receive, guarded_send)
+
+  def _too_large(self) -> str:
+    return f"Request body must not exceed {self.max_bytes} bytes."
+
+  async def _reject(self, scope, receive, send, status_code: int, detail: str):
+    await JSONResponse({"detail": detail}, status_code=status_code)(scope, receive, send)
+
+async def read_upload(file: UploadFile, max_bytes: int) -> tuple[bytes, str]:
+  """
+  Reads an upload in chunks, hashing it and enforcing a hard size cap.
+
+  Args:
+    file: The uploaded file.
+    max_bytes: The largest accepted upload.
+
+  Returns:
+    The file content and its SHA-256 hex digest.
+
+  Raises:
+    HTTPException: If the upload is larger than `max_bytes`.
+  """
+  digest = hashlib.sha256()
+  chunks = []
+  size = 0
+  while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+    size += len(chunk)
+    if size > max_bytes:
+      raise HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Avatar must not exceed {max_bytes} bytes.",
+      )
+    digest.update(chunk)
+    chunks.append(chunk)
+  return b"".join(chunks), digest.hexdigest()
+
+def resize_avatar(data: bytes, size: int) -> bytes:
+  """
+  Crops an image to a centered square of `size` pixels and encodes it as JPEG.
+
+  Args:
+    data: The uploaded JPEG or PNG.
+    size: The side of the square avatar.
+
+  Returns:
+    The encoded JPEG.
+
+  Raises:
+    ValueError: If the data is not a JPEG or PNG image.
+  """
+  try:
+    image = Image.open(io.BytesIO(data))
+    if image.format not in ALLOWED_FORMATS:
+      raise ValueError(f"Unsupported image format {image.format}")
+    image = ImageOps.exif_transpose(image).convert("RGB")
+  except (UnidentifiedImageError, OSError) as e:
+    raise ValueError("Invalid image") from e
+  avatar = ImageOps.fit(image, (size, size), Image.LANCZOS)
+  output = io.BytesIO()
+  avatar.save(output, format="JPEG", quality=85, optimize=True)
+  return output.getvalue()
+
+async def process_avatar(file: UploadFile, storage: AvatarStorage) -> str:
+  """
+  Stores a resized avatar, skipping the work for content already stored.
+
+  Args:
+    file: The uploaded image.
+    storage: Where to store the avatar.
+
+  Returns:
+    The public URL of the avatar.
+
+  Raises:
+    HTTPException: If the upload is too large or not a valid image.
+  """
+  data, digest = await read_upload(file, config.AVATAR_MAX_BYTES)
+  key = f"{digest}-{config.AVATAR_SIZE}"
+  if await storage.exists(key):
+    return storage.url(key)
+
+  loop = asyncio.get_running_loop()
+  try:
+    avatar = await loop.run_in_executor(image_executor, resize_avatar, data, config.AVATAR_SIZE)
+  except ValueError as e:
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+  return await storage.save(key, avatar)
@@ -1,33 +1,172 @@
+import base64
+import json
+from datetime import date
+from typing import AsyncIterator, TYPE_CHECKING
+
+from pydantic import ValidationError
+
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from repository.contacts import ContactRepository
-from schemas import ContactBase
-from database.models import User
+from schemas import ContactBase, ContactBulkDelete, ContactBulkUpdate
+from database.models import Contact, User
+
+if TYPE_CHECKING:
+  from aioredis import Redis
+
+def encode_cursor(contact: Contact) -> str:
+  """
+  Encodes the sort key of a Contact into an opaque pagination cursor.
+
+  Args:
+    contact: The last Contact of the current page.
+
+  Returns:
+    A URL-safe cursor string.
+  """
+  key = json.dumps([contact.last_name, contact.first_name, contact.id], separators=(",", ":"))
+  return base64.urlsafe_b64encode(key.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[str, str, int]:
+  """
+  Decodes a pagination cursor produced by `encode_cursor`.
+
+  Args:
+    cursor: The cursor string received from the client.
+
+  Returns:
+    The (last_name, first_name, id) sort key.
+
+  Raises:
+    ValueError: If the cursor is malformed.
+  """
+  try:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    last_name, first_name, contact_id = json.loads(raw)
+  except (ValueError, TypeError) as e:
+    raise ValueError("Invalid cursor") from e
+  if not (isinstance(last_name, str) and isinstance(first_name, str) and isinstance(contact_id, int)):
+    raise ValueError("Invalid cursor")
+  return last_name, first_name, contact_id
+
+def _describe(error: ValueError) -> str:
+  if isinstance(error, ValidationError):
+    return "; ".join(
+      f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()
+    )
+  return str(error)
 
 class ContactService:
-  def __init__(self, db: AsyncSession):
-    self.contact_repository = ContactRepository(db)
+  def __init__(self, db: AsyncSession, redis: "Redis | None" = None):
+    self.contact_repository = ContactRepository(db, redis)
 
   async def create_contact(self, body: ContactBase, user: User):
     return await self.contact_repository.create_contact(body, user)
 
+  async def import_contacts(
+    self, rows: AsyncIterator[object], user: User, chunk_size: int, max_errors: int
+  ) -> dict:
+    """
+    Validates rows as they arrive and inserts them in chunks.
+
+    Only one chunk is held in memory. Invalid rows are reported and skipped,
+    valid rows are committed together once the input is exhausted.
+
+    Args:
+      rows: Decoded rows; a ValueError item marks a row that failed to parse.
+      user: The owner of the new Contacts.
+      chunk_size: The number of rows per multi-row INSERT.
+      max_errors: The maximum number of row errors to report in detail.
+
+    Returns:
+      A report with the inserted and failed counts and per-row errors.
+    """
+    inserted = 0
+    failed = 0
+    errors = []
+    chunk = []
+    index = 0
+    async for row in rows:
+      index += 1
+      try:
+        if isinstance(row, ValueError):
+          raise row
+        chunk.append(ContactBase.model_validate(row))
+      except ValueError as e:
+        failed += 1
+        if len(errors) < max_errors:
+          errors.append({"row": index, "error": _describe(e)})
+        continue
+      if len(chunk) >= chunk_size:
+        inserted += await self.contact_repository.create_contacts(chunk, user)
+        chunk = []
+    inserted += await self.contact_repository.create_contacts(chunk, user)
+    await self.contact_repository.commit()
+    return {"inserted": inserted, "failed": failed, "errors": errors}
+
+  def stream_contacts(self, user: User, batch_size: int):
+    return self.contact_repository.stream_contacts(user, batch_size)
+
   async def get_contacts(self, skip: int, limit: int, user: User):
     return await self.contact_repository.get_contacts(skip, limit, user)
 
   async def get_contact(self, contact_id: int, user: User):
     return await self.contact_repository.get_contact_by_id(contact_id, user)
 
+  async def get_contacts_batch(self, ids: list[int], user: User) -> tuple[list[Contact], list[int]]:
+    """
+    Gets many Contacts at once, in the order they were requested.
+
+    Args:
+      ids: The requested ids; duplicates are returned once.
+      user: The owner of the Contacts.
+
+    Returns:
+      The found Contacts and the ids that do not exist for this user.
+    """
+    ids = list(dict.fromkeys(ids))
+    found = {
+      contact.id: contact for contact in await self.contact_repository.get_contacts_by_ids(ids, user)
+    }
+    contacts = [found[contact_id] for contact_id in ids if contact_id in found]
+    missing = [contact_id for contact_id in ids if contact_id not in found]
+    return contacts, missing
+
   async def update_contact(self, contact_id: int, body: ContactBase, user: User):
     return await self.contact_repository.update_contact(contact_id, body, user)
 
   async def remove_contact(self, contact_id: int, user: User):
     return await self.contact_repository.remove_contact(contact_id, user)
 
+  async def remove_contacts(self, body: ContactBulkDelete, user: User, max_rows: int) -> list[int]:
+    filters = body.filter.model_dump(exclude_none=True) if body.filter else None
+    return await self.contact_repository.remove_contacts(body.ids, filters, user, max_rows)
+
+  async def update_contacts(self, body: ContactBulkUpdate, user: User, max_rows: int) -> list[int]:
+    filters = body.filter.model_dump(exclude_none=True) if body.filter else None
+    values = body.patch.model_dump(exclude_unset=True)
+    return await self.contact_repository.update_contacts(body.ids, filters, values, user, max_rows)
+
   async def search_contacts(
     self, skip: int, limit: int, first_name: str | None, last_name: str | None, email: str | None, user: User
   ):
     return await self.contact_repository.search_contacts(skip, limit, first_name, last_name, email, user)
-  
-  async def get_upcoming_birthdays(self, user: User):
-    return await self.contact_repository.get_upcoming_birthdays(user)
 
+  async def search_contacts_ranked(self, query: str, skip: int, limit: int, user: User):
+    return await self.contact_repository.search_contacts_ranked(query, skip, limit, user)
+
+  async def search_contacts_page(
+    self, cursor: str, limit: int, first_name: str | None, last_name: str | None, email: str | None, user: User
+  ):
+    after = decode_cursor(cursor) if cursor else None
+    contacts = await self.contact_repository.search_contacts_after(
+      after, limit + 1, first_name, last_name, email, user
+    )
+    next_cursor = None
+    if len(contacts) > limit:
+      contacts = contacts[:limit]
+      next_cursor = encode_cursor(contacts[-1])
+    return contacts, next_cursor
+  
+  async def get_upcoming_birthdays(self, user: User, days: int = 7, today: date | None = None):
+    return await self.contact_repository.get_upcoming_birthdays(user, days, today)
@@ -0,0 +1,212 @@
+import codecs
+import csv
+import io
+import json
+from typing import AsyncIterator, Callable
+
+# A single JSON/CSV record larger than this is rejected instead of buffered.
+MAX_RECORD_SIZE = 64 * 1024
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+  decoder = codecs.getincrementaldecoder("utf-8")()
+  buffer = ""
+  async for chunk in chunks:
+    buffer += decoder.decode(chunk)
+    *lines, buffer = buffer.split("\n")
+    if len(buffer) > MAX_RECORD_SIZE:
+      raise ValueError("Record is too large")
+    for line in lines:
+      yield line.rstrip("\r")
+  buffer += decoder.decode(b"", final=True)
+  if buffer:
+    yield buffer.rstrip("\r")
+
+async def read_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[object]:
+  """
+  Parses a newline-delimited JSON body one line at a time.
+
+  Args:
+    chunks: The raw request body.
+
+  Yields:
+    The decoded value of every non-empty line, or a ValueError for a line
+    that is not valid JSON.
+  """
+  async for line in _lines(chunks):
+    if not line.strip():
+      continue
+    try:
+      yield json.loads(line)
+    except ValueError as e:
+      yield ValueError(f"Invalid JSON: {e}")
+
+async def read_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[object]:
+  """
+  Parses a CSV body with a header row one record at a time.
+
+  Quoted fields may span lines. Empty cells are read as None.
+
+  Args:
+    chunks: The raw request body.
+
+  Yields:
+    A dict per record keyed by the header, or a ValueError for a record with
+    the wrong number of cells.
+  """
+  header = None
+  record = ""
+  async for line in _lines(chunks):
+    record = f"{record}\n{line}" if record else line
+    if record.count('"') % 2:
+      if len(record) > MAX_RECORD_SIZE:
+        raise ValueError("Record is too large")
+      continue
+    values = next(csv.reader([record]), [])
+    record = ""
+    if not values:
+      continue
+    if header is None:
+      header = [name.strip() for name in values]
+      continue
+    if len(values) != len(header):
+      yield ValueError(f"Expected {len(header)} columns, got {len(values)}")
+      continue
+    yield {name: value if value != "" else None for name, value in zip(header, values)}
+  if record:
+    raise ValueError("Unterminated quoted field")
+
+async def read_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[object]:
+  """
+  Parses a JSON array body one element at a time.
+
+  Args:
+    chunks: The raw request body.
+
+  Yields:
+    Every element of the array.
+
+  Raises:
+    ValueError: If the body is not a well-formed JSON array, or anything but
+      whitespace follows it.
+  """
+  decoder = json.JSONDecoder()
+  text_decoder = codecs.getincrementaldecoder("utf-8")()
+  buffer = ""
+  # What may come next: "[" at the start, then an element or "]", then
+  # alternately "," or "]" and an element, and only whitespace after "]".
+  expect = "open"
+
+  async def feed():
+    async for chunk in chunks:
+      yield text_decoder.decode(chunk), False
+    yield text_decoder.decode(b"", final=True), True
+
+  async for text, final in feed():
+    buffer += text
+    pos = 0
+    while True:
+      while pos < len(buffer) and buffer[pos] in " \t\r\n":
+        pos += 1
+      if pos == len(buffer):
+        break
+      char = buffer[pos]
+      if expect == "end":
+        raise ValueError("Unexpected data after the JSON array")
+      if expect == "open":
+        if char != "[":
+          raise ValueError("Expected a JSON array")
+        expect = "first"
+        pos += 1
+        continue
+      if char == "]" and expect in ("first", "separator"):
+        expect = "end"
+        pos += 1
+        continue
+      if expect == "separator":
+        if char != ",":
+          raise ValueError("Expected ',' or ']' between array elements")
+        expect = "element"
+        pos += 1
+        continue
+      try:
+        value, end = decoder.raw_decode(buffer, pos)
+      except json.JSONDecodeError:
+        # Most likely an element split across chunks, wait for more data.
+        break
+      if end == len(buffer) and not final:
+        # A number may continue in the next chunk.
+        break
+      pos = end
+      expect = "separator"
+      yield value
+    buffer = buffer[pos:]
+    if len(buffer) > MAX_RECORD_SIZE:
+      raise ValueError("Record is too large")
+  if expect != "end":
+    raise ValueError("Malformed JSON array")
+
+READERS: dict[str, Callable[[AsyncIterator[bytes]], AsyncIterator[object]]] = {
+  "application/json": read_json_array,
+  "application/x-ndjson": read_ndjson,
+  "application/ndjson": read_ndjson,
+  "text/csv": read_csv,
+}
+
+def get_reader(content_type: str | None):
+  """
+  Picks the body parser for a Content-Type header.
+
+  Args:
+    content_type: The Content-Type header value, defaults to JSON.
+
+  Returns:
+    The matching reader, or None if the media type is not supported.
+  """
+  media_type = (content_type or "application/json").split(";")[0].strip().lower()
+  return READERS.get(media_type)
+
+EXPORT_FIELDS = ("id", "first_name", "last_name", "email", "phone", "birthday")
+
+def _export_values(row) -> list:
+  return [value.isoformat() if hasattr(value, "isoformat") else value for value in row]
+
+async def write_ndjson(batches: AsyncIterator[list]) -> AsyncIterator[bytes]:
+  """
+  Encodes batches of export rows as newline-delimited JSON.
+
+  Args:
+    batches: Lists of rows ordered as EXPORT_FIELDS.
+
+  Yields:
+    One encoded chunk per batch.
+  """
+  async for batch in batches:
+    yield "".join(
+      json.dumps(dict(zip(EXPORT_FIELDS, _export_values(row))), ensure_ascii=False) + "\n"
+      for row in batch
+    ).encode()
+
+async def write_csv(batches: AsyncIterator[list]) -> AsyncIterator[bytes]:
+  """
+  Encodes batches of export rows as CSV with a header row.
+
+  Args:
+    batches: Lists of rows ordered as EXPORT_FIELDS.
+
+  Yields:
+    The header, then one encoded chunk per batch.
+  """
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  writer.writerow(EXPORT_FIELDS)
+  yield buffer.getvalue().encode()
+  async for batch in batches:
+    buffer.seek(0)
+    buffer.truncate()
+    writer.writerows(_export_values(row) for row in batch)
+    yield buffer.getvalue().encode()
+
+WRITERS = {
+  "ndjson": (write_ndjson, "application/x-ndjson"),
+  "csv": (write_csv, "text/csv; charset=utf-8"),
+}
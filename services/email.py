@@ -1,41 +1,78 @@
-from pathlib import Path
+import json
+from datetime import datetime
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
 from pydantic import EmailStr
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from database.models import EmailOutbox
 from services.auth import create_email_token
-from conf.config import settings
-
-conf = ConnectionConfig(
-  MAIL_USERNAME=settings.MAIL_USERNAME,
-  MAIL_PASSWORD=settings.MAIL_PASSWORD,
-  MAIL_FROM=settings.MAIL_FROM,
-  MAIL_PORT=settings.MAIL_PORT,
-  MAIL_SERVER=settings.MAIL_SERVER,
-  MAIL_FROM_NAME=settings.MAIL_FROM_NAME,
-  MAIL_STARTTLS=settings.MAIL_STARTTLS,
-  MAIL_SSL_TLS=settings.MAIL_SSL_TLS,
-  USE_CREDENTIALS=settings.USE_CREDENTIALS,
-  VALIDATE_CERTS=settings.VALIDATE_CERTS,
-  TEMPLATE_FOLDER=Path(__file__).parent / "templates",
-)
-
-async def send_email(email: EmailStr, username: str, host: str):
-  try:
-    token_verification = create_email_token({"sub": email})
-    message = MessageSchema(
-      subject="Confirm your email",
-      recipients=[email],
-      template_body={
-        "host": host,
-        "username": username,
-        "token": token_verification,
-      },
-      subtype=MessageType.html,
-    )
-
-    fm = FastMail(conf)
-    await fm.send_message(message, template_name="verify_email.html")
-  except ConnectionErrors as err:
-    print(err)
+
+def enqueue_email(
+  db: AsyncSession, recipient: EmailStr, subject: str, template: str, template_body: dict
+) -> EmailOutbox:
+  """
+  Adds an email to the outbox in the caller's transaction.
+
+  Nothing is committed here: the message is durable once the caller commits
+  the change that triggered it, and is then delivered by `services.email_worker`.
+
+  Args:
+    db: The session of the triggering change.
+    recipient: The recipient address.
+    subject: The email subject.
+    template: The template file name in services/templates.
+    template_body: The template variables.
+
+  Returns:
+    The pending outbox row.
+  """
+  message = EmailOutbox(
+    recipient=recipient,
+    subject=subject,
+    template=template,
+    template_body=json.dumps(template_body),
+    status="pending",
+    attempts=0,
+    next_attempt_at=datetime.utcnow(),
+  )
+  db.add(message)
+  return message
+
+def enqueue_verification_email(db: AsyncSession, email: EmailStr, username: str, host: str) -> EmailOutbox:
+  """
+  Queues the email address confirmation message.
+
+  Args:
+    db: The session of the triggering change.
+    email: The address to confirm.
+    username: The name used in the greeting.
+    host: The base URL of the API.
+
+  Returns:
+    The pending outbox row.
+  """
+  token_verification = create_email_token({"sub": email})
+  return enqueue_email(
+    db,
+    email,
+    "Confirm your email",
+    "verify_email.html",
+    {"host": str(host), "username": username, "token": token_verification},
+  )
+
+def enqueue_password_reset_email(db: AsyncSession, email: EmailStr, username: str, link: str) -> EmailOutbox:
+  """
+  Queues the password reset message.
+
+  Args:
+    db: The session of the triggering change.
+    email: The recipient address.
+    username: The name used in the greeting.
+    link: The password reset link.
+
+  Returns:
+    The pending outbox row.
+  """
+  return enqueue_email(
+    db, email, "Оновити пароль", "reset_password.html", {"username": username, "link": link}
+  )
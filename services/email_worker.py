@@ -0,0 +1,331 @@
+"""
+Delivers queued emails from the `email_outbox` table.
+
+Run as a separate process:
+  python -m services.email_worker [--once] [--metrics-port 9101]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import signal
+import time
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import formataddr
+from pathlib import Path
+
+import aiosmtplib
+from jinja2 import Environment, FileSystemLoader
+from sqlalchemy import select, update
+
+from conf.config import config, get_settings
+from database.models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_FOLDER = Path(__file__).parent / "templates"
+
+class OutboxWorker:
+  """
+  Claims batches of pending emails and sends them over one SMTP connection.
+
+  A batch is claimed with `FOR UPDATE SKIP LOCKED` and leased by pushing
+  `next_attempt_at` forward, so several workers never send the same email
+  and a crashed worker's batch is retried after the lease. Failed deliveries
+  are retried with exponential backoff until `max_attempts`; 5xx SMTP
+  replies fail the email at once.
+  """
+  def __init__(
+    self,
+    session_factory,
+    smtp_settings=None,
+    batch_size: int = config.OUTBOX_BATCH_SIZE,
+    max_attempts: int = config.OUTBOX_MAX_ATTEMPTS,
+    backoff_base: float = config.OUTBOX_BACKOFF_BASE,
+    backoff_max: float = config.OUTBOX_BACKOFF_MAX,
+    lease_seconds: int = config.OUTBOX_LEASE_SECONDS,
+  ):
+    self.session_factory = session_factory
+    self.smtp_settings = smtp_settings or get_settings()
+    self.batch_size = batch_size
+    self.max_attempts = max_attempts
+    self.backoff_base = backoff_base
+    self.backoff_max = backoff_max
+    self.lease_seconds = lease_seconds
+    self.sent = 0
+    self.failed = 0
+    self.retried = 0
+    self.batches = 0
+    self.connections = 0
+    self.started_at = time.monotonic()
+    self._smtp: aiosmtplib.SMTP | None = None
+    self._templates = Environment(loader=FileSystemLoader(TEMPLATE_FOLDER), autoescape=True)
+
+  async def claim(self) -> list:
+    """
+    Leases the next batch of due emails.
+
+    Returns:
+      The claimed rows.
+    """
+    now = datetime.utcnow()
+    due = (
+      select(EmailOutbox.id)
+      .where(
+        EmailOutbox.status == "pending",
+        EmailOutbox.next_attempt_at <= now,
+        # Rows whose last lease ran out after the final attempt stay put.
+        EmailOutbox.attempts < self.max_attempts,
+      )
+      .order_by(EmailOutbox.id)
+      .limit(self.batch_size)
+      .with_for_update(skip_locked=True)
+      .scalar_subquery()
+    )
+    stmt = (
+      update(EmailOutbox)
+      .where(EmailOutbox.id.in_(due))
+      .values(attempts=EmailOutbox.attempts + 1, next_attempt_at=now + timedelta(seconds=self.lease_seconds))
+      .returning(
+        EmailOutbox.id, EmailOutbox.recipient, EmailOutbox.subject,
+        EmailOutbox.template, EmailOutbox.template_body, EmailOutbox.attempts,
+      )
+      .execution_options(synchronize_session=False)
+    )
+    async with self.session_factory() as session:
+      rows = (await session.execute(stmt)).all()
+      await session.commit()
+    return rows
+
+  def render(self, message) -> EmailMessage:
+    s = self.smtp_settings
+    email = EmailMessage()
+    email["From"] = formataddr((s.MAIL_FROM_NAME or "", s.MAIL_FROM))
+    email["To"] = message.recipient
+    email["Subject"] = message.subject
+    html = self._templates.get_template(message.template).render(**json.loads(message.template_body))
+    email.set_content(html, subtype="html")
+    return email
+
+  async def _connection(self) -> aiosmtplib.SMTP:
+    if self._smtp is None or not self._smtp.is_connected:
+      s = self.smtp_settings
+      smtp = aiosmtplib.SMTP(
+        hostname=s.MAIL_SERVER,
+        port=s.MAIL_PORT,
+        use_tls=bool(s.MAIL_SSL_TLS),
+        start_tls=bool(s.MAIL_STARTTLS),
+        validate_certs=bool(s.VALIDATE_CERTS),
+      )
+      await smtp.connect()
+      if s.USE_CREDENTIALS:
+        await smtp.login(s.MAIL_USERNAME, s.MAIL_PASSWORD)
+      self._smtp = smtp
+      self.connections += 1
+    return self._smtp
+
+  async def deliver(self, message) -> tuple[str, bool] | None:
+    """
+    Sends one email over the shared SMTP connection.
+
+    Args:
+      message: A claimed outbox row.
+
+    Returns:
+      None on success, otherwise the error text and whether it is permanent.
+      A message that cannot be rendered fails permanently, a retry would
+      render it the same way.
+    """
+    try:
+      email = self.render(message)
+    except Exception as e:
+      return f"Cannot render {message.template}: {e!r}", True
+    try:
+      smtp = await self._connection()
+      await smtp.send_message(email)
+    except aiosmtplib.SMTPResponseException as e:
+      return str(e), e.code >= 500
+    except (aiosmtplib.SMTPException, OSError) as e:
+      # The connection is in an unknown state, open a new one next time.
+      await self._drop_connection()
+      return str(e), False
+    return None
+
+  def backoff(self, attempts: int) -> float:
+    delay = min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max)
+    return delay * random.uniform(0.8, 1.2)
+
+  async def run_once(self) -> int:
+    """
+    Claims, sends and records one batch.
+
+    Returns:
+      The number of claimed emails.
+    """
+    batch = await self.claim()
+    if not batch:
+      return 0
+    sent_ids = []
+    retries = []
+    failures = []
+    for message in batch:
+      try:
+        error = await self.deliver(message)
+      except Exception as e:
+        # Outcomes of the rest of the batch must still be recorded, or sent
+        # emails would go out again when the lease runs out.
+        logger.exception("Email %s to %s failed unexpectedly", message.id, message.recipient)
+        await self._drop_connection()
+        error = repr(e), False
+      if error is None:
+        sent_ids.append(message.id)
+        continue
+      error_text, permanent = error
+      logger.warning("Email %s to %s failed (attempt %s): %s", message.id, message.recipient, message.attempts, error_text)
+      if permanent or message.attempts >= self.max_attempts:
+        failures.append({"id": message.id, "status": "failed", "last_error": error_text})
+      else:
+        retries.append({
+          "id": message.id,
+          "last_error": error_text,
+          "next_attempt_at": datetime.utcnow() + timedelta(seconds=self.backoff(message.attempts)),
+        })
+
+    async with self.session_factory() as session:
+      if sent_ids:
+        await session.execute(
+          update(EmailOutbox)
+          .where(EmailOutbox.id.in_(sent_ids))
+          .values(status="sent", sent_at=datetime.utcnow(), last_error=None)
+          .execution_options(synchronize_session=False)
+        )
+      if retries or failures:
+        await session.execute(update(EmailOutbox), retries + failures)
+      await session.commit()
+
+    self.batches += 1
+    self.sent += len(sent_ids)
+    self.retried += len(retries)
+    self.failed += len(failures)
+    return len(batch)
+
+  async def run(self, stop: asyncio.Event, poll_interval: float = config.OUTBOX_POLL_INTERVAL):
+    """
+    Processes batches until `stop` is set, sleeping only when the outbox is empty.
+
+    Args:
+      stop: Set to finish after the current batch.
+      poll_interval: Seconds to wait when there is nothing to send.
+    """
+    while not stop.is_set():
+      try:
+        claimed = await self.run_once()
+      except Exception:
+        logger.exception("Outbox batch failed")
+        claimed = 0
+      if claimed < self.batch_size:
+        try:
+          await asyncio.wait_for(stop.wait(), timeout=poll_interval)
+        except asyncio.TimeoutError:
+          pass
+    await self.close()
+
+  async def _drop_connection(self):
+    smtp, self._smtp = self._smtp, None
+    if smtp is not None and smtp.is_connected:
+      try:
+        await smtp.quit()
+      except (aiosmtplib.SMTPException, OSError):
+        smtp.close()
+
+  async def close(self):
+    """Closes the SMTP connection."""
+    await self._drop_connection()
+
+  def stats(self) -> dict:
+    """
+    Returns the delivery counters.
+
+    Returns:
+      dict: Sent, retried and failed emails, batches, SMTP connections opened and throughput.
+    """
+    uptime = time.monotonic() - self.started_at
+    return {
+      "sent": self.sent,
+      "retried": self.retried,
+      "failed": self.failed,
+      "batches": self.batches,
+      "smtp_connections": self.connections,
+      "uptime_seconds": round(uptime, 1),
+      "sent_per_second": round(self.sent / uptime, 3) if uptime else 0.0,
+    }
+
+  def render_metrics(self) -> str:
+    """
+    Renders the counters in the Prometheus text format.
+
+    Returns:
+      The exposition text.
+    """
+    stats = self.stats()
+    lines = []
+    for name, key in (
+      ("email_outbox_sent_total", "sent"),
+      ("email_outbox_retried_total", "retried"),
+      ("email_outbox_failed_total", "failed"),
+      ("email_outbox_batches_total", "batches"),
+      ("email_outbox_smtp_connections_total", "smtp_connections"),
+    ):
+      lines += [f"# TYPE {name} counter", f"{name} {stats[key]}"]
+    lines += ["# TYPE email_outbox_sent_per_second gauge", f"email_outbox_sent_per_second {stats['sent_per_second']}"]
+    return "\n".join(lines) + "\n"
+
+async def _serve_metrics(worker: OutboxWorker, port: int):
+  async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    await reader.readuntil(b"\r\n\r\n")
+    body = worker.render_metrics().encode()
+    writer.write(
+      b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+      + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+      + body
+    )
+    await writer.drain()
+    writer.close()
+
+  return await asyncio.start_server(handle, "0.0.0.0", port)
+
+async def _main(once: bool, metrics_port: int | None):
+  from database.db import sessionmanager
+
+  worker = OutboxWorker(sessionmanager.session)
+  if once:
+    while await worker.run_once():
+      pass
+    await worker.close()
+    logger.info("Outbox drained: %s", worker.stats())
+    return
+
+  stop = asyncio.Event()
+  loop = asyncio.get_running_loop()
+  for sig in (signal.SIGINT, signal.SIGTERM):
+    loop.add_signal_handler(sig, stop.set)
+  server = await _serve_metrics(worker, metrics_port) if metrics_port else None
+  try:
+    await worker.run(stop)
+  finally:
+    if server is not None:
+      server.close()
+    logger.info("Outbox worker stopped: %s", worker.stats())
+
+def main():
+  parser = argparse.ArgumentParser(description="Deliver queued emails from the outbox.")
+  parser.add_argument("--once", action="store_true", help="drain the outbox and exit")
+  parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port")
+  args = parser.parse_args()
+  logging.basicConfig(level=logging.INFO, format="%(levelname)-5.5s [%(name)s] %(message)s")
+  asyncio.run(_main(args.once, args.metrics_port))
+
+if __name__ == "__main__":
+  main()
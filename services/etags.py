@@ -0,0 +1,66 @@
+from fastapi import Request, Response, status
+
+from repository.versions import DataVersions
+
+def make_etag(user_id: int, version: int, *parts) -> str:
+  """
+  Builds a weak ETag for a user's data at a given version.
+
+  Args:
+    user_id: The owner of the data, so shared caches never mix users.
+    version: The user's data version.
+    parts: Anything else the representation depends on, e.g. the date.
+
+  Returns:
+    The quoted ETag.
+  """
+  tag = ".".join(str(part) for part in (user_id, version, *parts))
+  return f'W/"{tag}"'
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+  """
+  Weakly compares an If-None-Match header with an ETag.
+
+  Args:
+    if_none_match: The header value, possibly a list or "*".
+    etag: The current ETag.
+
+  Returns:
+    True if the client's copy is current.
+  """
+  if not if_none_match:
+    return False
+  if if_none_match.strip() == "*":
+    return True
+  opaque = etag.removeprefix("W/")
+  return any(
+    candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(",")
+  )
+
+async def not_modified(
+  request: Request, response: Response, versions: DataVersions, user_id: int, *parts
+) -> Response | None:
+  """
+  Answers a conditional GET from the data version alone.
+
+  Must run before the data is read, so a concurrent write can only make the
+  ETag older than the body, never newer.
+
+  Args:
+    request: The HTTP request.
+    response: The response whose ETag header is set otherwise.
+    versions: The data version counters.
+    user_id: The owner of the data.
+    parts: Anything else the representation depends on.
+
+  Returns:
+    A 304 response if the client's copy is current, otherwise None.
+  """
+  version = await versions.get(request.app.state.redis, user_id)
+  if version is None:
+    return None
+  etag = make_etag(user_id, version, *parts)
+  if etag_matches(request.headers.get("if-none-match"), etag):
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+  response.headers["ETag"] = etag
+  return None
@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import os
+import signal
+import threading
+import time
+from typing import Callable, TYPE_CHECKING
+
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+
+from database.db import DatabaseSessionManager
+from services.user_cache import user_cache
+from services.users import UserService
+
+if TYPE_CHECKING:
+  from aioredis import Redis
+
+logger = logging.getLogger(__name__)
+
+# Set by the pre-fork server once the shared warmup ran, so workers inherit it
+# and only warm their own pools and local caches. The server keeps its own
+# copy of the name, since its master must not import this module.
+SHARED_WARMUP_DONE_ENV = "CONTACTS_SHARED_WARMUP_DONE"
+
+class InFlightRequests:
+  """
+  Pure ASGI middleware counting HTTP requests until their response is sent,
+  so shutdown can wait for them before closing the pools.
+  """
+  def __init__(self):
+    self.count = 0
+    self._idle = asyncio.Event()
+    self._idle.set()
+
+  def middleware(self, app):
+    async def track(scope, receive, send):
+      if scope["type"] != "http":
+        await app(scope, receive, send)
+        return
+      self.count += 1
+      self._idle.clear()
+      try:
+        await app(scope, receive, send)
+      finally:
+        self.count -= 1
+        if self.count == 0:
+          self._idle.set()
+
+    return track
+
+  async def drain(self, timeout: float) -> bool:
+    """
+    Waits until no request is in flight.
+
+    Args:
+      timeout: The maximum number of seconds to wait.
+
+    Returns:
+      True if every request finished in time.
+    """
+    # wait_for with a zero timeout times out even on a set event.
+    if self._idle.is_set():
+      return True
+    try:
+      await asyncio.wait_for(self._idle.wait(), timeout)
+    except asyncio.TimeoutError:
+      logger.warning("Shutting down with %s requests still in flight", self.count)
+      return False
+    return True
+
+def delay_shutdown_signal(app, delay: float, signum: int = signal.SIGTERM) -> Callable[[], None]:
+  """
+  Reports the app not ready as soon as `signum` arrives, and hands the signal
+  to the server's own handler only `delay` seconds later.
+
+  The server stops accepting connections when it handles the signal, so a
+  load balancer polling /readyz needs this window to take the instance out
+  before draining starts. A second signal is passed on at once.
+
+  Args:
+    app: The application whose `state.ready` is cleared.
+    delay: Seconds between readiness going off and the server shutting down.
+    signum: The signal that starts a graceful shutdown.
+
+  Returns:
+    A function restoring the previous handler.
+  """
+  if delay <= 0 or threading.current_thread() is not threading.main_thread():
+    return lambda: None
+  loop = asyncio.get_running_loop()
+  previous = signal.getsignal(signum)
+  received = []
+
+  def forward():
+    signal.signal(signum, previous)
+    if callable(previous):
+      previous(signum, None)
+    elif previous == signal.SIG_DFL:
+      signal.raise_signal(signum)
+
+  def handle(sig, frame):
+    received.append(sig)
+    if len(received) > 1:
+      loop.call_soon_threadsafe(forward)
+      return
+    app.state.ready = False
+    logger.info("Shutdown requested, reporting not ready for %.1f s before draining", delay)
+    loop.call_soon_threadsafe(loop.call_later, delay, forward)
+
+  signal.signal(signum, handle)
+
+  def restore():
+    if signal.getsignal(signum) is handle:
+      signal.signal(signum, previous)
+
+  return restore
+
+async def _open_connections(engine, connections: int):
+  # Only the persistent part of a queue pool is worth filling, overflow
+  # connections are closed on return. Other pools are just verified.
+  pool = engine.pool
+  connections = min(connections, pool.size()) if isinstance(pool, QueuePool) else 1
+
+  # Held together, so the pool has to open `connections` distinct connections.
+  async def check():
+    async with engine.connect() as connection:
+      await connection.execute(text("SELECT 1"))
+      await barrier.wait()
+
+  barrier = asyncio.Barrier(connections)
+  try:
+    # A failing check cancels the ones waiting on the barrier, which close
+    # their connections before the error is raised.
+    async with asyncio.TaskGroup() as group:
+      for _ in range(connections):
+        group.create_task(check())
+  except ExceptionGroup as error:
+    raise error.exceptions[0] from None
+
+async def warm_database(manager: DatabaseSessionManager, connections: int):
+  """
+  Opens and verifies `connections` connections on the primary and on every
+  replica, leaving them idle in the pools.
+
+  Raises:
+    Exception: If the primary cannot be reached; a failing replica is only
+      taken out of rotation.
+  """
+  if connections <= 0:
+    return
+  await _open_connections(manager.engine, connections)
+  for replica in manager.replicas:
+    try:
+      await _open_connections(replica.engine, connections)
+    except Exception:
+      logger.warning("Replica %s failed warmup", replica.name, exc_info=True)
+      replica.mark_down(manager.replica_cooldown)
+
+async def warm_redis(redis: "Redis", connections: int):
+  """
+  Opens and verifies up to `connections` pooled Redis connections.
+
+  Raises:
+    Exception: If Redis cannot be reached.
+  """
+  await asyncio.gather(*(redis.ping() for _ in range(max(1, connections))))
+
+async def warm_user_cache(
+  redis: "Redis", manager: DatabaseSessionManager, users: int, load_missing: bool = True
+) -> int:
+  """
+  Loads the most recently active users into the user cache.
+
+  Args:
+    load_missing: Load users missing from Redis from the database; off when
+      the shared tier was already filled.
+
+  Returns:
+    The number of users warmed; failures are logged, not raised.
+  """
+  async def load(usernames):
+    async with manager.read_session() as session:
+      return await UserService(session).get_users_by_usernames(usernames)
+
+  try:
+    return await user_cache.warm(redis, users, load if load_missing else None)
+  except Exception:
+    logger.warning("User cache warmup failed", exc_info=True)
+    return 0
+
+async def warm_up(redis: "Redis", manager: DatabaseSessionManager, db_connections: int, redis_connections: int, users: int):
+  """
+  Runs every warmup step and logs how long it took.
+  """
+  started = time.perf_counter()
+  await asyncio.gather(warm_database(manager, db_connections), warm_redis(redis, redis_connections))
+  shared_done = bool(os.environ.get(SHARED_WARMUP_DONE_ENV))
+  warmed = await warm_user_cache(redis, manager, users, load_missing=not shared_done)
+  logger.info(
+    "Warmup finished in %.0f ms: %s DB and %s Redis connections, %s users",
+    (time.perf_counter() - started) * 1000, db_connections, redis_connections, warmed,
+  )
+
+async def shared_warm_up(redis_url: str, manager: DatabaseSessionManager, users: int):
+  """
+  Runs the warmup shared by every worker once, before they are forked: fills
+  the Redis user tier from the database.
+  """
+  import aioredis
+
+  redis = await aioredis.from_url(redis_url, decode_responses=True)
+  try:
+    warmed = await warm_user_cache(redis, manager, users)
+  finally:
+    await redis.close()
+    await manager.close()
+  logger.info("Shared warmup finished: %s users in Redis", warmed)
+
+def main():
+  """
+  Runs the shared warmup as a process of its own, which the pre-fork server
+  starts so that its master never imports the app:
+
+    python -m services.lifecycle
+  """
+  from conf.config import config
+  from database.db import sessionmanager
+
+  logging.basicConfig(level=logging.INFO)
+  asyncio.run(shared_warm_up(config.REDIS_URL, sessionmanager, config.WARMUP_USERS))
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,198 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.routing import Match
+
+# Upper bounds of the request latency histogram, in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class RequestStats:
+  """
+  SQL and Redis work attributed to the request being served.
+  """
+  __slots__ = ("db_statements", "db_seconds", "redis_commands", "redis_seconds")
+
+  def __init__(self):
+    self.db_statements = 0
+    self.db_seconds = 0.0
+    self.redis_commands = 0
+    self.redis_seconds = 0.0
+
+class RouteSeries:
+  """
+  Aggregated metrics of one (method, route, status) combination.
+  """
+  __slots__ = ("buckets", "count", "sum", "db_statements", "db_seconds", "redis_commands", "redis_seconds")
+
+  def __init__(self):
+    self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+    self.count = 0
+    self.sum = 0.0
+    self.db_statements = 0
+    self.db_seconds = 0.0
+    self.redis_commands = 0
+    self.redis_seconds = 0.0
+
+current_request: ContextVar[RequestStats | None] = ContextVar("current_request", default=None)
+
+class Metrics:
+  """
+  Per-worker request metrics rendered in the Prometheus text format.
+
+  Every update happens on the event loop thread (SQLAlchemy runs cursor
+  events in greenlets on that thread), and no update spans an `await`, so
+  plain dicts and counters are safe without locks.
+  """
+  def __init__(self):
+    self.series: dict[tuple[str, str, str], RouteSeries] = {}
+
+  def observe(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+    """
+    Records a finished request.
+
+    Args:
+      method: The HTTP method.
+      route: The route template, e.g. /api/contacts/{contact_id}.
+      status: The response status code.
+      seconds: The request latency.
+      stats: SQL and Redis work done by the request.
+    """
+    key = (method, route, str(status))
+    series = self.series.get(key)
+    if series is None:
+      series = self.series[key] = RouteSeries()
+    series.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+    series.count += 1
+    series.sum += seconds
+    series.db_statements += stats.db_statements
+    series.db_seconds += stats.db_seconds
+    series.redis_commands += stats.redis_commands
+    series.redis_seconds += stats.redis_seconds
+
+  def render(self) -> str:
+    """
+    Renders every series in the Prometheus text exposition format.
+
+    Returns:
+      The exposition text.
+    """
+    lines = [
+      "# HELP http_request_duration_seconds Request latency by route template and status.",
+      "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, route, status), series in sorted(self.series.items()):
+      labels = f'method="{method}",route="{route}",status="{status}"'
+      cumulative = 0
+      for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), series.buckets):
+        cumulative += count
+        lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+      lines.append(f"http_request_duration_seconds_sum{{{labels}}} {series.sum}")
+      lines.append(f"http_request_duration_seconds_count{{{labels}}} {series.count}")
+    for name, attribute, help_text in (
+      ("http_request_db_statements_total", "db_statements", "SQL statements issued while serving requests."),
+      ("http_request_db_seconds_total", "db_seconds", "Time spent executing SQL statements."),
+      ("http_request_redis_commands_total", "redis_commands", "Redis commands issued while serving requests."),
+      ("http_request_redis_seconds_total", "redis_seconds", "Time spent executing Redis commands."),
+    ):
+      lines.append(f"# HELP {name} {help_text}")
+      lines.append(f"# TYPE {name} counter")
+      for (method, route, status), series in sorted(self.series.items()):
+        labels = f'method="{method}",route="{route}",status="{status}"'
+        lines.append(f"{name}{{{labels}}} {getattr(series, attribute)}")
+    return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+def _route_template(scope) -> str:
+  route = scope.get("route")
+  if route is not None:
+    return route.path
+  app = scope.get("app")
+  if app is not None:
+    for candidate in app.routes:
+      match, _ = candidate.matches(scope)
+      if match == Match.FULL:
+        return candidate.path
+  return "unmatched"
+
+class MetricsMiddleware:
+  """
+  ASGI middleware that records latency and SQL/Redis work per route template.
+  """
+  def __init__(self, app):
+    self.app = app
+
+  async def __call__(self, scope, receive, send):
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+
+    stats = RequestStats()
+    token = current_request.set(stats)
+    status_code = 500
+
+    async def send_wrapper(message):
+      nonlocal status_code
+      if message["type"] == "http.response.start":
+        status_code = message["status"]
+      await send(message)
+
+    started = time.perf_counter()
+    try:
+      await self.app(scope, receive, send_wrapper)
+    finally:
+      elapsed = time.perf_counter() - started
+      current_request.reset(token)
+      metrics.observe(scope["method"], _route_template(scope), status_code, elapsed, stats)
+
+def instrument_engine(engine: AsyncEngine):
+  """
+  Attributes every SQL statement run on `engine` to the current request.
+
+  Args:
+    engine: The application engine.
+  """
+  sync_engine = engine.sync_engine
+
+  @event.listens_for(sync_engine, "before_cursor_execute")
+  def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+  @event.listens_for(sync_engine, "after_cursor_execute")
+  def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+    stats = current_request.get()
+    if stats is not None:
+      stats.db_statements += 1
+      stats.db_seconds += elapsed
+
+def instrument_redis(redis):
+  """
+  Attributes every Redis command sent through `redis` to the current request.
+
+  All commands go through `execute_command`, so wrapping it on the instance
+  covers the whole client API.
+
+  Args:
+    redis: The application Redis client.
+
+  Returns:
+    The same client.
+  """
+  execute_command = redis.execute_command
+
+  async def instrumented_execute_command(*args, **options):
+    started = time.perf_counter()
+    try:
+      return await execute_command(*args, **options)
+    finally:
+      stats = current_request.get()
+      if stats is not None:
+        stats.redis_commands += 1
+        stats.redis_seconds += time.perf_counter() - started
+
+  redis.execute_command = instrumented_execute_command
+  return redis
@@ -0,0 +1,123 @@
+import contextlib
+import logging
+from collections import defaultdict
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+class QueryLog:
+  """
+  SQL statements executed inside a `query_log` scope.
+  """
+  def __init__(self):
+    self.statements: list[tuple[str, object]] = []
+
+  @property
+  def count(self) -> int:
+    return len(self.statements)
+
+  def repeated(self, threshold: int) -> dict[str, int]:
+    """
+    Finds the N+1 signature: one statement run many times with different parameters.
+
+    Args:
+      threshold: The number of distinct parameter sets that flags a statement.
+
+    Returns:
+      The flagged statements mapped to their number of distinct parameter sets.
+    """
+    parameters = defaultdict(set)
+    for statement, params in self.statements:
+      parameters[statement].add(repr(params))
+    return {statement: len(sets) for statement, sets in parameters.items() if len(sets) >= threshold}
+
+  def describe(self) -> str:
+    return "\n".join(f"  {statement} {params!r}" for statement, params in self.statements)
+
+_active_logs: ContextVar[tuple[QueryLog, ...]] = ContextVar("active_query_logs", default=())
+
+@contextlib.contextmanager
+def query_log():
+  """
+  Records every statement executed in the current context.
+
+  Scopes nest, a statement is recorded by every enclosing scope.
+
+  Yields:
+    The QueryLog of this scope.
+  """
+  log = QueryLog()
+  token = _active_logs.set(_active_logs.get() + (log,))
+  try:
+    yield log
+  finally:
+    _active_logs.reset(token)
+
+@contextlib.contextmanager
+def assert_query_budget(max_statements: int, repeat_threshold: int = 3):
+  """
+  Fails if the block runs more than `max_statements` statements or an N+1 pattern.
+
+  Args:
+    max_statements: The allowed number of statements.
+    repeat_threshold: The number of distinct parameter sets that flags a repeated statement.
+
+  Yields:
+    The QueryLog of the block.
+
+  Raises:
+    AssertionError: If the budget is exceeded or a statement repeats with different parameters.
+  """
+  with query_log() as log:
+    yield log
+  assert log.count <= max_statements, (
+    f"Expected at most {max_statements} statements, got {log.count}:\n{log.describe()}"
+  )
+  repeated = log.repeated(repeat_threshold)
+  assert not repeated, f"Repeated statements (possible N+1): {repeated}\n{log.describe()}"
+
+def track_queries(engine: AsyncEngine):
+  """
+  Feeds every statement run on `engine` to the active query logs.
+
+  Args:
+    engine: The engine to watch.
+  """
+  @event.listens_for(engine.sync_engine, "before_cursor_execute")
+  def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    for log in _active_logs.get():
+      log.statements.append((statement, parameters))
+
+class QueryBudgetMiddleware:
+  """
+  Development ASGI middleware that counts statements per request.
+
+  It adds an `X-Query-Count` header and logs a warning when a statement
+  repeats with `repeat_threshold` different parameter sets.
+  """
+  def __init__(self, app, repeat_threshold: int = 3):
+    self.app = app
+    self.repeat_threshold = repeat_threshold
+
+  async def __call__(self, scope, receive, send):
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+
+    with query_log() as log:
+      async def send_wrapper(message):
+        if message["type"] == "http.response.start":
+          message.setdefault("headers", [])
+          message["headers"] = list(message["headers"]) + [(b"x-query-count", str(log.count).encode())]
+        await send(message)
+
+      await self.app(scope, receive, send_wrapper)
+
+    for statement, parameter_sets in log.repeated(self.repeat_threshold).items():
+      logger.warning(
+        "Possible N+1 on %s %s: %d executions with %d different parameter sets of %s",
+        scope["method"], scope["path"], log.count, parameter_sets, statement,
+      )
@@ -0,0 +1,192 @@
+import functools
+import logging
+import math
+import time
+from typing import Callable
+
+from fastapi import Request
+
+from services.auth import token_cache
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# Token bucket shared by all workers. Refills `rate` tokens per second up to
+# `capacity` and grants up to `requested` tokens (at least one, or none).
+# Uses the Redis clock so workers with skewed clocks agree.
+TOKEN_BUCKET_LUA = """
+local key = KEYS[1]
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local state = redis.call('HMGET', key, 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+local granted = math.min(requested, math.floor(tokens))
+tokens = tokens - granted
+redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000))
+local retry_after = 0
+if granted == 0 then
+  retry_after = math.ceil((1 - tokens) / rate)
+end
+return {granted, retry_after}
+"""
+
+class RateLimitExceeded(Exception):
+  """
+  Raised when a route's rate limit is exhausted.
+  """
+  def __init__(self, limit: str, retry_after: int):
+    super().__init__(f"Rate limit exceeded: {limit}")
+    self.limit = limit
+    self.retry_after = retry_after
+
+def parse_rate(rate: str) -> tuple[int, int]:
+  """
+  Parses a limit such as "10/minute".
+
+  Args:
+    rate: The number of requests per second, minute, hour or day.
+
+  Returns:
+    The capacity and the period in seconds.
+
+  Raises:
+    ValueError: If the limit is malformed.
+  """
+  count, _, period = rate.partition("/")
+  period = period.strip().rstrip("s")
+  if period not in PERIODS or not count.strip().isdigit() or int(count) <= 0:
+    raise ValueError(f"Invalid rate limit {rate!r}")
+  return int(count), PERIODS[period]
+
+def by_ip(request: Request) -> str:
+  """Rate limit key of the client address."""
+  return f"ip:{request.client.host if request.client else 'unknown'}"
+
+def by_user(request: Request) -> str:
+  """
+  Rate limit key of the authenticated user, falling back to the client address.
+
+  The route's dependencies have already verified the bearer token, so its
+  claims are read from the token cache.
+  """
+  authorization = request.headers.get("authorization", "")
+  scheme, _, token = authorization.partition(" ")
+  if scheme.lower() == "bearer" and token:
+    payload = token_cache.get(token)
+    if payload and payload.get("sub"):
+      return f"user:{payload['sub']}"
+  return by_ip(request)
+
+class RateLimiter:
+  """
+  Token-bucket rate limiter shared across workers through Redis.
+
+  Each decision is one atomic Lua call. To skip the Redis hop on busy keys,
+  a worker may lease up to `local_burst` tokens at once and spend them
+  locally for `lease_seconds`. Leased tokens are taken from the shared
+  bucket, so the global limit is never exceeded; unused ones are only
+  forfeited when the lease runs out.
+  """
+  def __init__(self, prefix: str = "ratelimit", lease_seconds: float = 1.0):
+    self.prefix = prefix
+    self.lease_seconds = lease_seconds
+    self._leases: dict[str, list] = {}
+    self._scripts = {}
+
+  def _script(self, redis):
+    script = self._scripts.get(id(redis))
+    if script is None:
+      script = self._scripts[id(redis)] = redis.register_script(TOKEN_BUCKET_LUA)
+    return script
+
+  def _take_local(self, key: str) -> bool:
+    lease = self._leases.get(key)
+    if lease is None:
+      return False
+    if lease[1] <= time.monotonic() or lease[0] <= 0:
+      del self._leases[key]
+      return False
+    lease[0] -= 1
+    return True
+
+  def _store_lease(self, key: str, tokens: int):
+    if len(self._leases) > 10000:
+      now = time.monotonic()
+      self._leases = {k: v for k, v in self._leases.items() if v[1] > now and v[0] > 0}
+    self._leases[key] = [tokens, time.monotonic() + self.lease_seconds]
+
+  async def hit(self, redis, key: str, capacity: int, period: int, local_burst: int = 1) -> int:
+    """
+    Consumes one request from the bucket of `key`.
+
+    Args:
+      redis: The shared Redis client.
+      key: The bucket key.
+      capacity: Requests allowed per period.
+      period: The period in seconds.
+      local_burst: Tokens to lease for local use.
+
+    Returns:
+      0 if the request is allowed, otherwise the seconds until a retry can succeed.
+    """
+    if self._take_local(key):
+      return 0
+    try:
+      granted, retry_after = await self._script(redis)(
+        keys=[f"{self.prefix}:{key}"], args=[capacity / period, capacity, max(1, local_burst)]
+      )
+    except Exception:
+      # Fail open: an unavailable Redis must not take the API down with it.
+      logger.warning("Rate limiter unavailable, allowing request", exc_info=True)
+      return 0
+    granted = int(granted)
+    if granted == 0:
+      return max(1, int(retry_after))
+    if granted > 1:
+      self._store_lease(key, granted - 1)
+    return 0
+
+  def limit(self, rate: str, key: Callable[[Request], str] = by_ip, local_burst: int | None = None):
+    """
+    Decorates a route to enforce `rate` per key.
+
+    The route must accept a `request: Request` parameter.
+
+    Args:
+      rate: The limit, e.g. "10/minute".
+      key: Builds the bucket key from the request, e.g. by_ip or by_user.
+      local_burst: Tokens a worker may lease at once, defaults to 5% of the limit.
+
+    Returns:
+      The route decorator.
+    """
+    capacity, period = parse_rate(rate)
+    burst = local_burst if local_burst is not None else max(1, capacity // 20)
+
+    def decorator(func):
+      scope = f"{func.__module__}.{func.__name__}"
+
+      @functools.wraps(func)
+      async def wrapper(*args, **kwargs):
+        request = kwargs.get("request")
+        if not isinstance(request, Request):
+          raise TypeError(f"{scope} must accept a `request: Request` parameter to be rate limited")
+        retry_after = await self.hit(
+          request.app.state.redis, f"{scope}:{key(request)}", capacity, period, burst
+        )
+        if retry_after:
+          raise RateLimitExceeded(f"{capacity} per {period} seconds", retry_after)
+        return await func(*args, **kwargs)
+
+      return wrapper
+
+    return decorator
+
+limiter = RateLimiter()
@@ -0,0 +1,223 @@
+import asyncio
+import contextlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+from conf.config import config
+from repository.versions import recent_user_writes
+from schemas import CurrentUser
+
+if TYPE_CHECKING:
+  from aioredis import Redis
+
+logger = logging.getLogger(__name__)
+
+# Bump when the entry layout changes so workers never read an old format.
+ENTRY_VERSION = 1
+ENTRY_FIELDS = ("id", "username", "email", "avatar", "role", "confirmed")
+INVALIDATION_CHANNEL = "user-cache:invalidate"
+ACTIVE_USERS_KEY = "user-cache:active"
+ACTIVE_USERS_KEEP = 10000
+
+class UserCache:
+  """
+  Two-tier cache of authenticated users.
+
+  A short-TTL in-process LRU sits in front of Redis, so most requests are
+  served without a network round trip. Redis holds compact, versioned
+  entries shared by all workers. `invalidate` deletes the Redis entry and
+  broadcasts the username over pub/sub so every worker drops its local copy.
+  """
+  def __init__(self, ttl: int, local_ttl: float, local_size: int):
+    self.ttl = ttl
+    self.local_ttl = local_ttl
+    self.local_size = local_size
+    self.local_hits = 0
+    self.redis_hits = 0
+    self.misses = 0
+    self._local: OrderedDict[str, tuple[float, CurrentUser]] = OrderedDict()
+
+  @staticmethod
+  def _key(username: str) -> str:
+    return f"user:v{ENTRY_VERSION}:{username}"
+
+  @staticmethod
+  def _encode(user) -> str:
+    role = getattr(user, "role", None)
+    values = [
+      user.id, user.username, user.email, user.avatar,
+      getattr(role, "value", role) or "user", bool(getattr(user, "confirmed", False)),
+    ]
+    return json.dumps(values, separators=(",", ":"))
+
+  @staticmethod
+  def _decode(entry: str) -> CurrentUser:
+    return CurrentUser(**dict(zip(ENTRY_FIELDS, json.loads(entry))))
+
+  def _remember(self, user: CurrentUser):
+    self._local[user.username] = (time.monotonic() + self.local_ttl, user)
+    self._local.move_to_end(user.username)
+    while len(self._local) > self.local_size:
+      self._local.popitem(last=False)
+
+  async def get(self, redis: "Redis", username: str) -> CurrentUser | None:
+    """
+    Returns the cached user, checking the local tier first.
+
+    Args:
+      redis: Redis client holding the shared tier.
+      username: The username to look up.
+
+    Returns:
+      The cached user, or None on a miss in both tiers.
+    """
+    local = self._local.get(username)
+    if local is not None:
+      expires_at, user = local
+      if time.monotonic() < expires_at:
+        self._local.move_to_end(username)
+        self.local_hits += 1
+        return user
+      del self._local[username]
+
+    entry = await redis.get(self._key(username))
+    if entry is None:
+      self.misses += 1
+      return None
+    user = self._decode(entry)
+    self._remember(user)
+    self.redis_hits += 1
+    return user
+
+  async def set(self, redis: "Redis", user):
+    """
+    Stores a user in both tiers.
+
+    Args:
+      redis: Redis client holding the shared tier.
+      user: A database or schema user.
+    """
+    entry = self._encode(user)
+    await redis.set(self._key(user.username), entry, ex=self.ttl)
+    self._remember(self._decode(entry))
+
+  def drop_local(self, username: str):
+    """
+    Drops a user from the local tier only.
+
+    Args:
+      username: The username to drop.
+    """
+    self._local.pop(username, None)
+
+  async def invalidate(self, redis: "Redis", username: str):
+    """
+    Drops a user from every tier on every worker.
+
+    Args:
+      redis: Redis client holding the shared tier.
+      username: The username whose data changed.
+    """
+    self.drop_local(username)
+    # The next load must come from the primary, a replica may not have the change yet.
+    await recent_user_writes.mark(redis, username)
+    await redis.delete(self._key(username))
+    await redis.publish(INVALIDATION_CHANNEL, username)
+
+  async def record_active(self, redis: "Redis", username: str):
+    """
+    Remembers that a user signed in, for `warm` after the next deploy.
+
+    Args:
+      redis: Redis client holding the shared tier.
+      username: The user who signed in.
+    """
+    await redis.zadd(ACTIVE_USERS_KEY, {username: time.time()})
+    await redis.zremrangebyrank(ACTIVE_USERS_KEY, 0, -ACTIVE_USERS_KEEP - 1)
+
+  async def warm(self, redis: "Redis", limit: int, load) -> int:
+    """
+    Fills the local tier with the most recently active users.
+
+    Entries come from Redis with one MGET; users missing there are loaded
+    with one `load(usernames)` call and stored in both tiers.
+
+    Args:
+      redis: Redis client holding the shared tier.
+      limit: The number of users to warm.
+      load: Coroutine function returning the users with the given usernames,
+        or None to warm from Redis only.
+
+    Returns:
+      The number of users warmed.
+    """
+    usernames = await redis.zrevrange(ACTIVE_USERS_KEY, 0, limit - 1) if limit > 0 else []
+    if not usernames:
+      return 0
+    entries = await redis.mget([self._key(username) for username in usernames])
+    missing = []
+    for username, entry in zip(usernames, entries):
+      if entry:
+        self._remember(self._decode(entry))
+      else:
+        missing.append(username)
+    loaded = await load(missing) if missing and load is not None else []
+    for user in loaded:
+      await self.set(redis, user)
+    return len(usernames) - len(missing) + len(loaded)
+
+  async def listen(self, redis: "Redis", retry_min: float = 0.5, retry_max: float = 30):
+    """
+    Drops local entries named on the invalidation channel until cancelled.
+
+    A lost subscription is retried with exponential backoff. Invalidations
+    published in between are missed, so the local tier is cleared whenever
+    the subscription comes back.
+
+    Args:
+      redis: Redis client used for the subscription.
+      retry_min: The first delay before resubscribing, in seconds.
+      retry_max: The longest delay before resubscribing, in seconds.
+    """
+    delay = retry_min
+    resubscribing = False
+    while True:
+      pubsub = redis.pubsub()
+      try:
+        await pubsub.subscribe(INVALIDATION_CHANNEL)
+        if resubscribing:
+          self._local.clear()
+        delay = retry_min
+        async for message in pubsub.listen():
+          if message["type"] == "message":
+            self.drop_local(message["data"])
+      except asyncio.CancelledError:
+        return
+      except Exception:
+        logger.warning("User cache invalidation channel lost, resubscribing in %.1f s", delay, exc_info=True)
+      finally:
+        with contextlib.suppress(Exception):
+          await pubsub.unsubscribe(INVALIDATION_CHANNEL)
+          await pubsub.close()
+      resubscribing = True
+      await asyncio.sleep(delay)
+      delay = min(delay * 2, retry_max)
+
+  def stats(self) -> dict:
+    """
+    Returns the cache counters.
+
+    Returns:
+      dict: Local size, local hits, Redis hits and misses.
+    """
+    return {
+      "local_size": len(self._local),
+      "local_hits": self.local_hits,
+      "redis_hits": self.redis_hits,
+      "misses": self.misses,
+    }
+
+user_cache = UserCache(config.USER_CACHE_TTL, config.USER_CACHE_LOCAL_TTL, config.USER_CACHE_LOCAL_SIZE)
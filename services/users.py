@@ -25,11 +25,17 @@ class UserService:
   async def get_user_by_username(self, username: str):
     return await self.repository.get_user_by_username(username)
 
+  async def get_users_by_usernames(self, usernames: list[str]):
+    return await self.repository.get_users_by_usernames(usernames)
+
   async def get_user_by_email(self, email: str):
     return await self.repository.get_user_by_email(email)
 
   async def confirmed_email(self, email: str):
     return await self.repository.confirmed_email(email)
 
+  async def update_user(self, user: User):
+    return await self.repository.update_user(user)
+
   async def check_if_admin(self, user: User) -> bool:
     return user.role == Role.admin
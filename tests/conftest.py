@@ -0,0 +1,109 @@
+import os
+import tempfile
+
+# Set before the app is imported: tests run on a throwaway SQLite database and
+# never pick up the database or JWT settings of a local .env.
+os.environ["DB_URL"] = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/test.db"
+os.environ["JWT_SECRET"] = "test-secret"
+os.environ["JWT_ALGORITHM"] = "HS256"
+os.environ["SHUTDOWN_READY_DELAY"] = "0"
+
+import pytest
+import pytest_asyncio
+from fakeredis import aioredis as fake_aioredis
+from httpx import ASGITransport, AsyncClient
+
+from services.auth import create_email_token
+from services.query_budget import assert_query_budget
+
+
+@pytest.fixture
+def query_budget():
+  """
+  Usage: `with query_budget(2): await async_client.get(...)`.
+  """
+  return assert_query_budget
+
+
+@pytest_asyncio.fixture
+async def async_client(monkeypatch):
+  """
+  A client for the app running its full lifespan on an empty database and a
+  fresh fakeredis, with the in-process caches cleared.
+  """
+  import main
+  from database.db import sessionmanager
+  from database.models import Base
+  from services.auth import token_cache
+  from services.rate_limit import limiter
+  from services.user_cache import user_cache
+
+  redis = fake_aioredis.FakeRedis(decode_responses=True)
+
+  async def connect_redis():
+    return redis
+
+  monkeypatch.setattr(main, "connect_redis", connect_redis)
+  monkeypatch.setattr(user_cache, "_local", type(user_cache._local)())
+  monkeypatch.setattr(limiter, "_leases", {})
+  monkeypatch.setattr(limiter, "_scripts", {})
+  token_cache.clear()
+
+  async with sessionmanager.engine.begin() as connection:
+    await connection.run_sync(Base.metadata.drop_all)
+    await connection.run_sync(Base.metadata.create_all)
+
+  async with main.app.router.lifespan_context(main.app):
+    transport = ASGITransport(app=main.app)
+    async with AsyncClient(transport=transport, base_url="http://test/api") as client:
+      yield client
+
+
+@pytest_asyncio.fixture
+async def test_user(async_client: AsyncClient):
+  """
+  A registered and confirmed user, merged with the tokens of its login.
+  """
+  user_payload = {
+    "email": "testuser@example.com",
+    "username": "testuser",
+    "password": "securepassword"
+  }
+  response = await async_client.post("/auth/register", json=user_payload)
+  user = response.json()
+  await async_client.get(f"/auth/confirmed_email/{create_email_token({'sub': user['email']})}")
+  response = await async_client.post(
+    "/auth/login", data={"username": "testuser", "password": "securepassword"}
+  )
+  return {**user, **response.json()}
+
+
+@pytest_asyncio.fixture
+async def test_contact(async_client: AsyncClient, test_user):
+  contact_payload = {
+    "first_name": "John",
+    "last_name": "Doe",
+    "email": "johndoe@example.com",
+    "phone": "1234567890",
+    "birthday": "1990-01-01",
+    "address": "123 Test Street",
+  }
+  headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+  response = await async_client.post("/contacts/", json=contact_payload, headers=headers)
+  return response.json()
+
+
+@pytest_asyncio.fixture
+async def admin_user(test_user):
+  """
+  test_user promoted to administrator before it made any authenticated request.
+  """
+  from sqlalchemy import update
+
+  from database.db import sessionmanager
+  from database.models import Role, User
+
+  async with sessionmanager.session() as session:
+    await session.execute(update(User).where(User.id == test_user["id"]).values(role=Role.admin))
+    await session.commit()
+  return test_user
@@ -1,32 +1,7 @@
 import pytest
 from httpx import AsyncClient
-from main import app
-from database.db import override_get_db
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from database.models import Base
 from services.auth import create_email_token
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-Base.metadata.create_all(bind=engine)
-
-def get_test_db():
-  try:
-    db = TestingSessionLocal()
-    yield db
-  finally:
-    db.close()
-
-app.dependency_overrides[override_get_db] = get_test_db
-
-@pytest.fixture
-async def async_client():
-  async with AsyncClient(app=app, base_url="http://test") as client:
-    yield client
-
 
 @pytest.mark.asyncio
 async def test_register_user(async_client: AsyncClient):
@@ -52,6 +27,7 @@ async def test_login_user(async_client: AsyncClient):
     "password": "password123"
   }
   await async_client.post("/auth/register", json=register_payload)
+  await async_client.get(f"/auth/confirmed_email/{create_email_token({'sub': register_payload['email']})}")
 
   login_payload = {
     "username": "testlogin",
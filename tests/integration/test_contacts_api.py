@@ -1,7 +1,11 @@
+from datetime import UTC, datetime
+
 import pytest
 from httpx import AsyncClient
 from fastapi import status
 
+import main
+
 @pytest.mark.asyncio
 async def test_create_contact(async_client: AsyncClient, test_user):
   contact_payload = {
@@ -21,7 +25,23 @@ async def test_create_contact(async_client: AsyncClient, test_user):
 
 
 @pytest.mark.asyncio
-async def test_read_contacts(async_client: AsyncClient, test_user):
+async def test_create_contact_without_birthday(async_client: AsyncClient, test_user):
+  contact_payload = {
+    "first_name": "Jane",
+    "last_name": "Doe",
+    "email": "janedoe@example.com",
+    "phone": "1234567890",
+    "birthday": None,
+  }
+  headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+
+  response = await async_client.post("/contacts/", json=contact_payload, headers=headers)
+  assert response.status_code == status.HTTP_201_CREATED
+  assert response.json()["birthday"] is not None
+
+
+@pytest.mark.asyncio
+async def test_read_contacts(async_client: AsyncClient, test_user, test_contact):
   headers = {"Authorization": f"Bearer {test_user['access_token']}"}
   response = await async_client.get("/contacts/?first_name=John", headers=headers)
   assert response.status_code == status.HTTP_200_OK
@@ -30,6 +50,90 @@ async def test_read_contacts(async_client: AsyncClient, test_user):
   assert response.json()[0]["first_name"] == "John"
 
 
+@pytest.mark.asyncio
+async def test_read_contacts_cursor(async_client: AsyncClient, test_user):
+  headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+  for first_name in ("Ann", "Bob", "Cid"):
+    contact_payload = {
+      "first_name": first_name,
+      "last_name": "Cursor",
+      "email": f"{first_name.lower()}@example.com",
+      "phone": "1234567890",
+      "birthday": "1990-01-01",
+    }
+    await async_client.post("/contacts/", json=contact_payload, headers=headers)
+
+  response = await async_client.get("/contacts/?last_name=Cursor&limit=2&cursor=", headers=headers)
+  assert response.status_code == status.HTTP_200_OK
+  assert [c["first_name"] for c in response.json()] == ["Ann", "Bob"]
+  next_cursor = response.headers["X-Next-Cursor"]
+  assert 'rel="next"' in response.headers["Link"]
+
+  response = await async_client.get(
+    f"/contacts/?last_name=Cursor&limit=2&cursor={next_cursor}", headers=headers
+  )
+  assert response.status_code == status.HTTP_200_OK
+  assert [c["first_name"] for c in response.json()] == ["Cid"]
+  assert "X-Next-Cursor" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_read_contacts_invalid_cursor(async_client: AsyncClient, test_user):
+  headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+  response = await async_client.get("/contacts/?cursor=not-a-cursor", headers=headers)
+  assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("params", ["cursor=", "first_name=John", "email=example"])
+async def test_search_rejects_cursor_and_filters(async_client: AsyncClient, test_user, params):
+  headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+  response = await async_client.get(f"/contacts/?q=john&{params}", headers=headers)
+  assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_import_contacts_ndjson(async_client: AsyncClient, test_user):
+  headers = {
+    "Authorization": f"Bearer {test_user['access_token']}",
+    "Content-Type": "application/x-ndjson",
+  }
+  body = (
+    '{"first_name": "Bulk", "last_name": "One", "email": "one@example.com", "phone": "1", "birthday": "1990-01-01"}\n'
+    '{"first_name": "Bulk", "last_name": "Two", "email": "two@example.com", "phone": "2", "birthday": "1990-01-02"}\n'
+    '{"first_name": "Bulk"}\n'
+  )
+
+  response = await async_client.post("/contacts/bulk", content=body, headers=headers)
+  assert response.status_code == status.HTTP_200_OK
+  assert response.json()["inserted"] == 2
+  assert response.json()["failed"] == 1
+  assert response.json()["errors"][0]["row"] == 3
+
+
+@pytest.mark.asyncio
+async def test_import_contacts_rejects_missing_comma(async_client: AsyncClient, test_user):
+  headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+  body = '[{"first_name": "Bulk"} {"first_name": "Bulk"}]'
+
+  response = await async_client.post("/contacts/bulk", content=body, headers=headers)
+  assert response.status_code == status.HTTP_400_BAD_REQUEST
+  assert response.json()["detail"].startswith("Malformed body")
+
+
+@pytest.mark.asyncio
+async def test_import_contacts_rejects_trailing_data(async_client: AsyncClient, test_user):
+  headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+  body = '[{"first_name": "Bulk", "last_name": "Doe", "email": "bulk@example.com", "phone": "1"}] garbage'
+
+  response = await async_client.post("/contacts/bulk", content=body, headers=headers)
+  assert response.status_code == status.HTTP_400_BAD_REQUEST
+  assert response.json()["detail"] == "Malformed body: Unexpected data after the JSON array"
+
+  response = await async_client.get("/contacts/", headers=headers)
+  assert response.json() == []
+
+
 @pytest.mark.asyncio
 async def test_read_contact_by_id(async_client: AsyncClient, test_user, test_contact):
   headers = {"Authorization": f"Bearer {test_user['access_token']}"}
@@ -39,6 +143,92 @@ async def test_read_contact_by_id(async_client: AsyncClient, test_user, test_con
   assert response.json()["first_name"] == test_contact["first_name"]
 
 
+@pytest.mark.asyncio
+async def test_batch_get_contacts(async_client: AsyncClient, test_user, test_contact, query_budget):
+  headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+  await async_client.get("/contacts/birthdays/", headers=headers)
+  ids = [999999, test_contact["id"], test_contact["id"]]
+
+  with query_budget(1):
+    response = await async_client.post("/contacts/batch-get", json={"ids": ids}, headers=headers)
+  assert response.status_code == status.HTTP_200_OK
+  assert [c["id"] for c in response.json()["contacts"]] == [test_contact["id"]]
+  assert response.json()["missing"] == [999999]
+
+
+@pytest.mark.asyncio
+async def test_batch_get_contacts_rejects_empty_list(async_client: AsyncClient, test_user):
+  headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+  response = await async_client.post("/contacts/batch-get", json={"ids": []}, headers=headers)
+  assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_contacts_by_filter(async_client: AsyncClient, test_user, test_contact, query_budget):
+  headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+  await async_client.get("/contacts/birthdays/", headers=headers)
+  body = {"filter": {"first_name": test_contact["first_name"]}, "patch": {"phone": "555"}}
+
+  # The count against BULK_UPDATE_MAX, then the UPDATE.
+  with query_budget(2):
+    response = await async_client.post("/contacts/bulk-update", json=body, headers=headers)
+  assert response.status_code == status.HTTP_200_OK
+  assert test_contact["id"] in response.json()["ids"]
+
+  response = await async_client.get(f"/contacts/{test_contact['id']}", headers=headers)
+  assert response.json()["phone"] == "555"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("field", ["first_name", "last_name", "email", "phone", "birthday"])
+async def test_bulk_update_rejects_null_fields(async_client: AsyncClient, test_user, test_contact, field):
+  headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+  body = {"ids": [test_contact["id"]], "patch": {field: None}}
+
+  response = await async_client.post("/contacts/bulk-update", json=body, headers=headers)
+  assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+  response = await async_client.get(f"/contacts/{test_contact['id']}", headers=headers)
+  assert response.json()[field] == test_contact[field]
+
+
+@pytest.mark.asyncio
+async def test_bulk_delete_filters_must_all_match_exactly(async_client: AsyncClient, test_user, test_contact):
+  headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+  for selection in (
+    {"first_name": test_contact["first_name"], "email": "someone-else@example.com"},
+    {"first_name": test_contact["first_name"][:2]},
+  ):
+    response = await async_client.post("/contacts/bulk-delete", json={"filter": selection}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["ids"] == []
+
+  selection = {"first_name": test_contact["first_name"], "email": test_contact["email"].upper()}
+  response = await async_client.post("/contacts/bulk-delete", json={"filter": selection}, headers=headers)
+  assert response.json()["ids"] == [test_contact["id"]]
+
+
+@pytest.mark.asyncio
+async def test_bulk_delete_contacts_by_ids(async_client: AsyncClient, test_user, test_contact, query_budget):
+  headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+  await async_client.get("/contacts/birthdays/", headers=headers)
+
+  with query_budget(1):
+    response = await async_client.post(
+      "/contacts/bulk-delete", json={"ids": [test_contact["id"], 999999]}, headers=headers
+    )
+  assert response.status_code == status.HTTP_200_OK
+  assert response.json()["ids"] == [test_contact["id"]]
+
+
+@pytest.mark.asyncio
+async def test_bulk_delete_requires_one_selection(async_client: AsyncClient, test_user):
+  headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+  body = {"ids": [1], "filter": {"email": "example"}}
+  response = await async_client.post("/contacts/bulk-delete", json=body, headers=headers)
+  assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
 @pytest.mark.asyncio
 async def test_update_contact(async_client: AsyncClient, test_user, test_contact):
   updated_payload = {
@@ -80,30 +270,65 @@ async def test_upcoming_birthdays(async_client: AsyncClient, test_user):
     assert "birthday" in response.json()[0]
 
 
-@pytest.fixture
-async def test_user(async_client: AsyncClient):
-  user_payload = {
-    "email": "testuser@example.com",
-    "username": "testuser",
-    "password": "securepassword"
-  }
-  await async_client.post("/auth/register", json=user_payload)
-  response = await async_client.post(
-    "/auth/login", data={"username": "testuser", "password": "securepassword"}
+@pytest.mark.asyncio
+async def test_upcoming_birthdays_etag_uses_the_query_date(async_client: AsyncClient, test_user, test_contact):
+  headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+
+  response = await async_client.get("/contacts/birthdays/", headers=headers)
+  assert response.headers["ETag"].endswith(f'.{datetime.now(UTC).date()}"')
+
+  response = await async_client.get(
+    "/contacts/birthdays/", headers={**headers, "If-None-Match": response.headers["ETag"]}
   )
-  return response.json()
+  assert response.status_code == status.HTTP_304_NOT_MODIFIED
 
 
-@pytest.fixture
-async def test_contact(async_client: AsyncClient, test_user):
-  contact_payload = {
-    "first_name": "John",
-    "last_name": "Doe",
-    "email": "johndoe@example.com",
-    "phone": "1234567890",
+@pytest.mark.asyncio
+async def test_etag_is_not_reissued_after_the_version_is_lost(async_client: AsyncClient, test_user):
+  headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+  response = await async_client.get("/contacts/", headers=headers)
+  etag = response.headers["ETag"]
+  payload = {
+    "first_name": "Late",
+    "last_name": "Write",
+    "email": "late@example.com",
+    "phone": "1",
     "birthday": "1990-01-01",
-    "address": "123 Test Street",
   }
+  response = await async_client.post("/contacts/", json=payload, headers=headers)
+  assert response.status_code == status.HTTP_201_CREATED
+
+  # As after an eviction or a restart of Redis.
+  redis = main.app.state.redis
+  await redis.delete(*await redis.keys("version:contacts:*"))
+
+  response = await async_client.get("/contacts/", headers={**headers, "If-None-Match": etag})
+  assert response.status_code == status.HTTP_200_OK
+  assert response.headers["ETag"] != etag
+  assert [contact["email"] for contact in response.json()] == ["late@example.com"]
+
+
+@pytest.mark.asyncio
+async def test_write_endpoints_issue_one_statement(async_client: AsyncClient, test_user, test_contact, query_budget):
   headers = {"Authorization": f"Bearer {test_user['access_token']}"}
-  response = await async_client.post("/contacts/", json=contact_payload, headers=headers)
-  return response.json()
+  # Warm the user cache so get_current_user does not hit the database.
+  await async_client.get("/contacts/birthdays/", headers=headers)
+  payload = {
+    "first_name": "One",
+    "last_name": "Trip",
+    "email": "one@example.com",
+    "phone": "1",
+    "birthday": "1990-01-01",
+  }
+
+  with query_budget(1):
+    response = await async_client.post("/contacts/", json=payload, headers=headers)
+  assert response.status_code == status.HTTP_201_CREATED
+
+  with query_budget(1):
+    response = await async_client.put(f"/contacts/{test_contact['id']}", json=payload, headers=headers)
+  assert response.status_code == status.HTTP_200_OK
+
+  with query_budget(1):
+    response = await async_client.delete(f"/contacts/{test_contact['id']}", headers=headers)
+  assert response.status_code == status.HTTP_200_OK
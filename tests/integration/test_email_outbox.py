@@ -0,0 +1,125 @@
+import socket
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from aiosmtpd.controller import Controller
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from database.models import Base, EmailOutbox
+from services.email import enqueue_verification_email
+from services.email_worker import OutboxWorker
+
+
+class CollectingHandler:
+  def __init__(self):
+    self.messages = []
+
+  async def handle_DATA(self, server, session, envelope):
+    self.messages.append(envelope)
+    return "250 OK"
+
+
+def free_port():
+  with socket.socket() as sock:
+    sock.bind(("127.0.0.1", 0))
+    return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+  handler = CollectingHandler()
+  controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+  controller.start()
+  yield controller, handler
+  controller.stop()
+
+
+@pytest_asyncio.fixture
+async def session_maker(tmp_path):
+  engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/outbox.db")
+  async with engine.begin() as conn:
+    await conn.run_sync(Base.metadata.create_all)
+  yield async_sessionmaker(bind=engine, expire_on_commit=False)
+  await engine.dispose()
+
+
+def smtp_settings(port):
+  return SimpleNamespace(
+    MAIL_SERVER="127.0.0.1", MAIL_PORT=port, MAIL_FROM="noreply@example.com", MAIL_FROM_NAME="Contacts",
+    MAIL_SSL_TLS=False, MAIL_STARTTLS=False, VALIDATE_CERTS=False, USE_CREDENTIALS=False,
+    MAIL_USERNAME=None, MAIL_PASSWORD=None,
+  )
+
+
+@pytest.mark.asyncio
+async def test_worker_sends_batch_over_one_connection(smtp_server, session_maker):
+  controller, handler = smtp_server
+  async with session_maker() as session:
+    for n in range(5):
+      enqueue_verification_email(session, f"user{n}@example.com", f"user{n}", "http://test/")
+    await session.commit()
+
+  worker = OutboxWorker(session_maker, smtp_settings(controller.port), batch_size=10)
+  assert await worker.run_once() == 5
+  await worker.close()
+
+  assert len(handler.messages) == 5
+  assert worker.stats()["sent"] == 5
+  assert worker.stats()["smtp_connections"] == 1
+  async with session_maker() as session:
+    statuses = (await session.execute(select(EmailOutbox.status))).scalars().all()
+  assert statuses == ["sent"] * 5
+
+
+@pytest.mark.asyncio
+async def test_worker_retries_with_backoff(session_maker):
+  async with session_maker() as session:
+    enqueue_verification_email(session, "user@example.com", "user", "http://test/")
+    await session.commit()
+
+  worker = OutboxWorker(session_maker, smtp_settings(free_port()), backoff_base=60)
+  assert await worker.run_once() == 1
+  # The retry is scheduled in the future, so nothing is due yet.
+  assert await worker.run_once() == 0
+
+  assert worker.stats()["retried"] == 1
+  async with session_maker() as session:
+    message = (await session.execute(select(EmailOutbox))).scalar_one()
+  assert message.status == "pending"
+  assert message.attempts == 1
+  assert message.last_error
+
+
+@pytest.mark.asyncio
+async def test_worker_fails_unrenderable_email_and_records_the_batch(smtp_server, session_maker):
+  controller, handler = smtp_server
+  async with session_maker() as session:
+    enqueue_verification_email(session, "first@example.com", "first", "http://test/")
+    session.add(EmailOutbox(recipient="bad@example.com", subject="Bad", template="missing.html", template_body="{}"))
+    enqueue_verification_email(session, "last@example.com", "last", "http://test/")
+    await session.commit()
+
+  worker = OutboxWorker(session_maker, smtp_settings(controller.port), batch_size=10)
+  assert await worker.run_once() == 3
+  await worker.close()
+
+  assert len(handler.messages) == 2
+  async with session_maker() as session:
+    rows = (await session.execute(select(EmailOutbox).order_by(EmailOutbox.id))).scalars().all()
+  assert [row.status for row in rows] == ["sent", "failed", "sent"]
+  assert "missing.html" in rows[1].last_error
+
+
+@pytest.mark.asyncio
+async def test_worker_does_not_claim_exhausted_emails(session_maker):
+  async with session_maker() as session:
+    enqueue_verification_email(session, "user@example.com", "user", "http://test/")
+    await session.commit()
+    message = (await session.execute(select(EmailOutbox))).scalar_one()
+    message.attempts = 3
+    await session.commit()
+
+  worker = OutboxWorker(session_maker, smtp_settings(free_port()), max_attempts=3)
+  assert await worker.run_once() == 0
@@ -0,0 +1,114 @@
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from fastapi import status
+
+from services.auth import create_email_token, create_password_reset_token
+
+CONTACT = {
+  "first_name": "Budget",
+  "last_name": "Doe",
+  "email": "budget@example.com",
+  "phone": "1234567890",
+  "birthday": "1990-01-01",
+}
+
+
+@pytest_asyncio.fixture
+async def auth_headers(async_client: AsyncClient):
+  user_payload = {"email": "budget@example.com", "username": "budget", "password": "securepassword"}
+  await async_client.post("/auth/register", json=user_payload)
+  await async_client.get(f"/auth/confirmed_email/{create_email_token({'sub': user_payload['email']})}")
+  response = await async_client.post(
+    "/auth/login", data={"username": "budget", "password": "securepassword"}
+  )
+  headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+  # Warm the user cache so get_current_user stays out of the budget.
+  await async_client.get("/contacts/birthdays/", headers=headers)
+  return headers
+
+
+@pytest_asyncio.fixture
+async def contact_id(async_client: AsyncClient, auth_headers):
+  response = await async_client.post("/contacts/", json=CONTACT, headers=auth_headers)
+  return response.json()["id"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("url", [
+  "/contacts/",
+  "/contacts/?cursor=",
+  "/contacts/?q=budget",
+  "/contacts/?first_name=Budget",
+  "/contacts/birthdays/",
+  "/contacts/export?format=csv",
+])
+async def test_contact_reads_budget(async_client: AsyncClient, auth_headers, contact_id, query_budget, url):
+  with query_budget(1):
+    response = await async_client.get(url, headers=auth_headers)
+  assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.asyncio
+async def test_contact_writes_budget(async_client: AsyncClient, auth_headers, contact_id, query_budget):
+  with query_budget(1):
+    response = await async_client.get(f"/contacts/{contact_id}", headers=auth_headers)
+  assert response.status_code == status.HTTP_200_OK
+
+  with query_budget(1):
+    response = await async_client.post("/contacts/", json=CONTACT, headers=auth_headers)
+  assert response.status_code == status.HTTP_201_CREATED
+
+  with query_budget(1):
+    response = await async_client.post(
+      "/contacts/bulk", json=[CONTACT, CONTACT, CONTACT], headers=auth_headers
+    )
+  assert response.json()["inserted"] == 3
+
+  with query_budget(1):
+    response = await async_client.put(f"/contacts/{contact_id}", json=CONTACT, headers=auth_headers)
+  assert response.status_code == status.HTTP_200_OK
+
+  with query_budget(1):
+    response = await async_client.delete(f"/contacts/{contact_id}", headers=auth_headers)
+  assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.asyncio
+async def test_auth_budget(async_client: AsyncClient, query_budget):
+  payload = {"email": "budget-auth@example.com", "username": "budget-auth", "password": "securepassword"}
+
+  # Email and username lookups, outbox and user INSERTs, refresh.
+  with query_budget(5):
+    response = await async_client.post("/auth/register", json=payload)
+  assert response.status_code == status.HTTP_201_CREATED
+
+  # Lookup, outbox INSERT; the user is not confirmed yet.
+  with query_budget(2):
+    response = await async_client.post("/auth/request_email", json={"email": payload["email"]})
+  assert response.status_code == status.HTTP_200_OK
+
+  # Lookup, then confirmed_email re-selects and updates the user.
+  with query_budget(3):
+    response = await async_client.get(f"/auth/confirmed_email/{create_email_token({'sub': payload['email']})}")
+  assert response.status_code == status.HTTP_200_OK
+
+  # Confirmed, so this is a full successful login.
+  with query_budget(1):
+    response = await async_client.post(
+      "/auth/login", data={"username": payload["username"], "password": payload["password"]}
+    )
+  assert response.status_code == status.HTTP_200_OK
+
+  # Lookup, outbox INSERT.
+  with query_budget(2):
+    response = await async_client.post("/auth/password-reset-request", json={"email": payload["email"]})
+  assert response.status_code == status.HTTP_200_OK
+
+  # Lookup, UPDATE, refresh.
+  with query_budget(3):
+    response = await async_client.post(
+      f"/auth/password-reset/{create_password_reset_token({'sub': payload['email']})}",
+      json={"token": "", "new_password": "newpassword"},
+    )
+  assert response.status_code == status.HTTP_200_OK
@@ -2,6 +2,9 @@ import pytest
 from fastapi import status
 from httpx import AsyncClient
 
+from conf.config import config
+from services.avatars import LocalAvatarStorage
+
 
 @pytest.mark.asyncio
 async def test_get_user_me(async_client: AsyncClient, test_user):
@@ -27,11 +30,11 @@ async def test_get_user_me_rate_limit(async_client: AsyncClient, test_user):
 
 
 @pytest.mark.asyncio
-async def test_update_avatar_valid(async_client: AsyncClient, test_user, mocker):
-  headers = {"Authorization": f"Bearer {test_user['access_token']}"}
+async def test_update_avatar_valid(async_client: AsyncClient, admin_user, mocker, tmp_path):
+  headers = {"Authorization": f"Bearer {admin_user['access_token']}"}
 
-  mock_upload = mocker.patch("cloudinary.uploader.upload")
-  mock_upload.return_value = {"secure_url": "http://example.com/avatar.jpg"}
+  storage = LocalAvatarStorage(tmp_path, "http://example.com/avatars")
+  mocker.patch("api.users.avatar_storage", storage)
 
   with open("tests/assets/avatar.png", "rb") as file:
     response = await async_client.put(
@@ -41,4 +44,62 @@ async def test_update_avatar_valid(async_client: AsyncClient, test_user, mocker)
     )
 
   assert response.status_code == status.HTTP_200_OK
-  assert response.json()["avatar_url"] == "http://example.com/avatar.jpg"
+  assert response.json()["avatar_url"].startswith("http://example.com/avatars/")
+  assert len(list(tmp_path.glob("*.jpg"))) == 1
+
+
+@pytest.mark.asyncio
+async def test_update_avatar_rejects_malformed_content_length(async_client: AsyncClient, admin_user):
+  headers = {
+    "Authorization": f"Bearer {admin_user['access_token']}",
+    "Content-Type": "multipart/form-data; boundary=x",
+    "Content-Length": "many",
+  }
+  response = await async_client.put("/users/avatar", headers=headers, content=b"--x--")
+  assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_update_avatar_caps_chunked_uploads(async_client: AsyncClient, admin_user):
+  headers = {
+    "Authorization": f"Bearer {admin_user['access_token']}",
+    "Content-Type": "multipart/form-data; boundary=x",
+  }
+
+  async def body():
+    # No Content-Length: the body is sent chunked and runs past the cap.
+    yield b'--x\r\nContent-Disposition: form-data; name="file"; filename="a.png"\r\nContent-Type: image/png\r\n\r\n'
+    for _ in range(config.AVATAR_MAX_BYTES // (1024 * 1024) + 2):
+      yield b"0" * (1024 * 1024)
+
+  response = await async_client.put("/users/avatar", headers=headers, content=body())
+  assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+@pytest.mark.asyncio
+async def test_metrics_require_the_scrape_token(async_client: AsyncClient, admin_user, monkeypatch):
+  response = await async_client.get("/metrics")
+  assert response.status_code == status.HTTP_404_NOT_FOUND
+
+  monkeypatch.setattr(config, "METRICS_TOKEN", "scrape-secret")
+  response = await async_client.get("/metrics")
+  assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+  # An admin session is no substitute for the scrape token.
+  headers = {"Authorization": f"Bearer {admin_user['access_token']}"}
+  response = await async_client.get("/internal/stats", headers=headers)
+  assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_metrics_with_the_scrape_token(async_client: AsyncClient, monkeypatch):
+  monkeypatch.setattr(config, "METRICS_TOKEN", "scrape-secret")
+  headers = {"Authorization": "Bearer scrape-secret"}
+
+  response = await async_client.get("/metrics", headers=headers)
+  assert response.status_code == status.HTTP_200_OK
+  assert "http_request_duration_seconds" in response.text
+
+  response = await async_client.get("/internal/stats", headers=headers)
+  assert response.status_code == status.HTTP_200_OK
+  assert "db_pool" in response.json()
@@ -0,0 +1,106 @@
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+from services.avatars import LocalAvatarStorage, UploadSizeLimit, process_avatar, read_upload, resize_avatar
+
+
+def upload(path="tests/assets/avatar.png"):
+  with open(path, "rb") as f:
+    return UploadFile(io.BytesIO(f.read()), filename="avatar.png")
+
+
+class TestAvatars:
+  def test_resize_avatar(self):
+    with open("tests/assets/avatar.png", "rb") as f:
+      avatar = resize_avatar(f.read(), 32)
+
+    image = Image.open(io.BytesIO(avatar))
+    assert image.format == "JPEG"
+    assert image.size == (32, 32)
+
+  def test_resize_avatar_rejects_non_images(self):
+    with pytest.raises(ValueError):
+      resize_avatar(b"not an image", 32)
+
+  @pytest.mark.asyncio
+  async def test_read_upload_enforces_cap(self):
+    with pytest.raises(HTTPException) as exc_info:
+      await read_upload(upload(), max_bytes=10)
+    assert exc_info.value.status_code == 413
+
+  @pytest.mark.asyncio
+  async def test_process_avatar_deduplicates(self, tmp_path, mocker):
+    storage = LocalAvatarStorage(tmp_path, "http://example.com/avatars")
+    save = mocker.spy(storage, "save")
+
+    first = await process_avatar(upload(), storage)
+    second = await process_avatar(upload(), storage)
+
+    assert first == second
+    assert save.call_count == 1
+
+
+async def run_limited(body_chunks, headers=(), max_bytes=10):
+  """
+  Sends `body_chunks` through UploadSizeLimit to an app that reads the whole
+  body and answers 200, and returns the sent messages and what the app read.
+  """
+  read = []
+
+  async def app(scope, receive, send):
+    while True:
+      message = await receive()
+      if message["type"] == "http.disconnect":
+        break
+      read.append(message["body"])
+      if not message.get("more_body"):
+        break
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+  messages = [
+    {"type": "http.request", "body": chunk, "more_body": i < len(body_chunks) - 1}
+    for i, chunk in enumerate(body_chunks)
+  ]
+
+  async def receive():
+    return messages.pop(0)
+
+  sent = []
+
+  async def send(message):
+    sent.append(message)
+
+  scope = {"type": "http", "path": "/upload", "headers": list(headers), "method": "PUT"}
+  await UploadSizeLimit(app, {"/upload"}, max_bytes)(scope, receive, send)
+  return sent, read
+
+
+class TestUploadSizeLimit:
+  @pytest.mark.asyncio
+  async def test_chunked_body_within_cap_passes(self):
+    sent, read = await run_limited([b"12345", b"67890"])
+    assert sent[0]["status"] == 200
+    assert read == [b"12345", b"67890"]
+
+  @pytest.mark.asyncio
+  async def test_chunked_body_is_cut_off_at_the_cap(self):
+    sent, read = await run_limited([b"12345", b"67890", b"1", b"never read"])
+    assert [message["status"] for message in sent if "status" in message] == [413]
+    assert read == [b"12345", b"67890"]
+
+  @pytest.mark.asyncio
+  async def test_oversized_content_length_is_refused_unread(self):
+    sent, read = await run_limited([b"1" * 11], headers=[(b"content-length", b"11")])
+    assert sent[0]["status"] == 413
+    assert read == []
+
+  @pytest.mark.asyncio
+  @pytest.mark.parametrize("value", [b"abc", b"-1", b"1.5"])
+  async def test_malformed_content_length_is_a_bad_request(self, value):
+    sent, read = await run_limited([b"1"], headers=[(b"content-length", value)])
+    assert sent[0]["status"] == 400
+    assert read == []
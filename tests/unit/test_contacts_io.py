@@ -0,0 +1,86 @@
+from datetime import datetime
+
+import pytest
+
+from services.contacts_io import get_reader, read_csv, read_json_array, read_ndjson, write_csv, write_ndjson
+
+
+async def chunked(data: str, size: int = 3):
+  raw = data.encode()
+  for start in range(0, len(raw), size):
+    yield raw[start:start + size]
+
+
+async def collect(reader, data: str):
+  return [row async for row in reader(chunked(data))]
+
+
+class TestContactsReaders:
+  @pytest.mark.asyncio
+  async def test_read_json_array(self):
+    rows = await collect(read_json_array, ' [{"first_name": "A,]"}, {"first_name": "B"}] ')
+    assert rows == [{"first_name": "A,]"}, {"first_name": "B"}]
+
+  @pytest.mark.asyncio
+  async def test_read_json_array_malformed(self):
+    with pytest.raises(ValueError):
+      await collect(read_json_array, '[{"first_name": "A"}')
+
+  @pytest.mark.asyncio
+  @pytest.mark.parametrize("body", ['[{"a": 1} {"b": 2}]', '[{"a": 1},, {"b": 2}]', '[, {"a": 1}]', '[{"a": 1},]'])
+  async def test_read_json_array_requires_one_comma_between_elements(self, body):
+    with pytest.raises(ValueError):
+      await collect(read_json_array, body)
+
+  @pytest.mark.asyncio
+  @pytest.mark.parametrize("body", ['[{"a": 1}] garbage', '[{"a": 1}]]', '[] []'])
+  async def test_read_json_array_rejects_data_after_the_array(self, body):
+    with pytest.raises(ValueError):
+      await collect(read_json_array, body)
+
+  @pytest.mark.asyncio
+  async def test_read_json_array_numbers_split_across_chunks(self):
+    assert await collect(read_json_array, "[12345, 6789]") == [12345, 6789]
+
+  @pytest.mark.asyncio
+  async def test_read_ndjson_reports_bad_lines(self):
+    rows = await collect(read_ndjson, '{"first_name": "A"}\n\nnot json\n{"first_name": "Б"}\n')
+    assert rows[0] == {"first_name": "A"}
+    assert isinstance(rows[1], ValueError)
+    assert rows[2] == {"first_name": "Б"}
+
+  @pytest.mark.asyncio
+  async def test_read_csv(self):
+    rows = await collect(read_csv, 'first_name,last_name\r\n"Multi\nLine",Doe\nJohn,\nonly-one\n')
+    assert rows[0] == {"first_name": "Multi\nLine", "last_name": "Doe"}
+    assert rows[1] == {"first_name": "John", "last_name": None}
+    assert isinstance(rows[2], ValueError)
+
+  def test_get_reader(self):
+    assert get_reader("text/csv; charset=utf-8") is read_csv
+    assert get_reader(None) is read_json_array
+    assert get_reader("application/xml") is None
+
+
+async def batches(*items):
+  for item in items:
+    yield item
+
+
+class TestContactsWriters:
+  @pytest.mark.asyncio
+  async def test_write_ndjson(self):
+    rows = [(1, "John", "Doe", "john@example.com", "123", datetime(1990, 1, 1))]
+    chunks = [chunk async for chunk in write_ndjson(batches(rows))]
+    assert chunks == [
+      b'{"id": 1, "first_name": "John", "last_name": "Doe", "email": "john@example.com", '
+      b'"phone": "123", "birthday": "1990-01-01T00:00:00"}\n'
+    ]
+
+  @pytest.mark.asyncio
+  async def test_write_csv(self):
+    rows = [(1, "John", "Doe, Jr.", "john@example.com", "123", None)]
+    chunks = [chunk async for chunk in write_csv(batches(rows, []))]
+    assert chunks[0] == b"id,first_name,last_name,email,phone,birthday\r\n"
+    assert chunks[1] == b'1,John,"Doe, Jr.",john@example.com,123,\r\n'
+    assert chunks[2] == b""
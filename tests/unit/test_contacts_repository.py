@@ -0,0 +1,243 @@
+from datetime import date, datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from database.models import Contact, User, birthday_doy
+from schemas import ContactBase
+from repository.contacts import BatchTooLargeError, ContactRepository, birthday_windows
+from services.contacts import decode_cursor, encode_cursor
+
+class TestContactRepository:
+  def setup_method(self):
+    self.session = AsyncMock()
+    self.user = User(id=1)
+    self.repository = ContactRepository(self.session)
+
+  def create_mock_contact(self, **kwargs):
+    return Contact(id=1, user=self.user, **kwargs)
+
+  @pytest.mark.asyncio
+  async def test_get_contacts(self):
+    contacts = [self.create_mock_contact(), self.create_mock_contact()]
+    self.session.execute.return_value = MagicMock()
+    self.session.execute.return_value.scalars.return_value.all.return_value = contacts
+
+    returned_contacts = await self.repository.get_contacts(skip=0, limit=10, user=self.user)
+
+    self.session.execute.assert_called_once()
+    assert len(returned_contacts) == 2
+
+  @pytest.mark.asyncio
+  async def test_get_contact_by_id_existing(self):
+    contact = self.create_mock_contact()
+    self.session.execute.return_value = MagicMock()
+    self.session.execute.return_value.scalar_one_or_none.return_value = contact
+
+    returned_contact = await self.repository.get_contact_by_id(1, self.user)
+
+    self.session.execute.assert_called_once()
+    assert returned_contact is contact
+  
+  @pytest.mark.asyncio
+  async def test_get_contact_by_id_not_found(self):
+    self.session.execute.return_value = MagicMock()
+    self.session.execute.return_value.scalar_one_or_none.return_value = None
+
+    returned_contact = await self.repository.get_contact_by_id(1, self.user)
+
+    self.session.execute.assert_called_once()
+    assert returned_contact is None
+
+  @pytest.mark.asyncio
+  async def test_search_contacts_after(self):
+    contacts = [self.create_mock_contact(first_name="Jane", last_name="Doe")]
+    self.session.execute.return_value = MagicMock()
+    self.session.execute.return_value.scalars.return_value.all.return_value = contacts
+
+    returned_contacts = await self.repository.search_contacts_after(
+      ("Doe", "John", 1), 10, None, None, None, self.user
+    )
+
+    self.session.execute.assert_called_once()
+    statement = self.session.execute.call_args.args[0]
+    assert "(contacts.last_name, contacts.first_name, contacts.id) >" in str(statement)
+    assert "OFFSET" not in str(statement)
+    assert returned_contacts == contacts
+
+  @pytest.mark.asyncio
+  async def test_create_contact_single_statement(self):
+    body = ContactBase(
+      first_name="John", last_name="Doe", email="john@example.com", phone="1", birthday=datetime(1990, 1, 1)
+    )
+    contact = self.create_mock_contact(first_name="John")
+    self.session.execute.return_value = MagicMock()
+    self.session.execute.return_value.scalar_one.return_value = contact
+
+    returned_contact = await self.repository.create_contact(body, self.user)
+
+    self.session.execute.assert_called_once()
+    self.session.commit.assert_called_once()
+    self.session.refresh.assert_not_called()
+    assert returned_contact is contact
+
+  @pytest.mark.asyncio
+  async def test_remove_contact_single_statement(self):
+    self.session.execute.return_value = MagicMock()
+    self.session.execute.return_value.scalar_one_or_none.return_value = None
+
+    returned_contact = await self.repository.remove_contact(1, self.user)
+
+    self.session.execute.assert_called_once()
+    assert returned_contact is None
+
+  @pytest.mark.asyncio
+  async def test_mutation_bumps_data_version_after_commit(self):
+    redis = AsyncMock()
+    redis.set.return_value = False
+    repository = ContactRepository(self.session, redis)
+    contact = self.create_mock_contact()
+    self.session.execute.return_value = MagicMock()
+    self.session.execute.return_value.scalar_one_or_none.return_value = contact
+
+    await repository.remove_contact(1, self.user)
+
+    self.session.commit.assert_called_once()
+    redis.incr.assert_called_once_with("version:contacts:1")
+
+  @pytest.mark.asyncio
+  async def test_bulk_insert_bumps_data_version_on_commit(self):
+    redis = AsyncMock()
+    redis.set.return_value = False
+    repository = ContactRepository(self.session, redis)
+    body = ContactBase(
+      first_name="John", last_name="Doe", email="john@example.com", phone="1", birthday=datetime(1990, 1, 1)
+    )
+
+    await repository.create_contacts([body], self.user)
+    redis.incr.assert_not_called()
+    await repository.commit()
+
+    redis.incr.assert_called_once_with("version:contacts:1")
+
+  @pytest.mark.asyncio
+  async def test_bump_seeds_a_missing_data_version(self):
+    redis = AsyncMock()
+    redis.set.return_value = True
+    repository = ContactRepository(self.session, redis)
+    self.session.execute.return_value = MagicMock()
+    self.session.execute.return_value.scalar_one_or_none.return_value = self.create_mock_contact()
+
+    await repository.remove_contact(1, self.user)
+
+    key, seed = redis.set.call_args.args
+    assert key == "version:contacts:1"
+    assert seed > 1_000_000
+    assert redis.set.call_args.kwargs == {"nx": True}
+    redis.incr.assert_not_called()
+
+  @pytest.mark.asyncio
+  async def test_bulk_delete_over_limit_is_refused_before_writing(self):
+    self.session.scalar.return_value = 3
+
+    with pytest.raises(BatchTooLargeError):
+      await self.repository.remove_contacts(None, {"email": "john@example.com"}, self.user, max_rows=2)
+
+    self.session.scalar.assert_called_once()
+    self.session.execute.assert_not_called()
+    self.session.commit.assert_not_called()
+
+  @pytest.mark.asyncio
+  async def test_bulk_update_filters_are_exact_and_combined(self):
+    self.session.scalar.return_value = 1
+    self.session.execute.return_value = MagicMock()
+    self.session.execute.return_value.scalars.return_value.all.return_value = [1]
+
+    await self.repository.update_contacts(
+      None, {"first_name": "John", "email": "John@Example.com"}, {"phone": "1"}, self.user, max_rows=2
+    )
+
+    statement = self.session.execute.call_args.args[0]
+    where = str(statement.whereclause)
+    assert "contacts.first_name = :first_name_1 AND lower(contacts.email) = :lower_1" in where
+    assert " OR " not in where and "LIKE" not in where
+    assert statement.compile().params["lower_1"] == "john@example.com"
+
+  @pytest.mark.asyncio
+  async def test_bulk_delete_by_ids_within_limit_skips_the_count(self):
+    self.session.execute.return_value = MagicMock()
+    self.session.execute.return_value.scalars.return_value.all.return_value = [1, 2]
+
+    assert await self.repository.remove_contacts([1, 2], None, self.user, max_rows=2) == [1, 2]
+
+    self.session.scalar.assert_not_called()
+    self.session.execute.assert_called_once()
+
+  @pytest.mark.asyncio
+  async def test_bulk_write_grown_past_the_count_is_rolled_back(self):
+    self.session.scalar.return_value = 2
+    self.session.execute.return_value = MagicMock()
+    self.session.execute.return_value.scalars.return_value.all.return_value = [1, 2, 3]
+
+    with pytest.raises(BatchTooLargeError):
+      await self.repository.remove_contacts(None, {"last_name": "Doe"}, self.user, max_rows=2)
+
+    self.session.rollback.assert_called_once()
+    self.session.commit.assert_not_called()
+
+  @pytest.mark.asyncio
+  async def test_get_upcoming_birthdays_filters_by_day_of_year(self):
+    contacts = [self.create_mock_contact(first_name="John")]
+    self.session.execute.return_value = MagicMock()
+    self.session.execute.return_value.scalars.return_value.all.return_value = contacts
+
+    returned_contacts = await self.repository.get_upcoming_birthdays(self.user, 7, today=date(2025, 12, 28))
+
+    self.session.execute.assert_called_once()
+    statement = str(self.session.execute.call_args.args[0])
+    assert statement.count("contacts.birthday_doy BETWEEN") == 2
+    assert returned_contacts == contacts
+
+  @pytest.mark.asyncio
+  async def test_search_contacts_ranked_fallback(self):
+    self.session.bind.dialect.name = "sqlite"
+    contacts = [
+      Contact(id=1, first_name="Olga", last_name="Doe", email="olga@example.com"),
+      Contact(id=2, first_name="Olena", last_name="Doe", email="olena@example.com"),
+    ]
+    self.session.execute.return_value = MagicMock()
+    self.session.execute.return_value.scalars.return_value.all.return_value = contacts
+
+    returned_contacts = await self.repository.search_contacts_ranked("olena", 0, 10, self.user)
+
+    self.session.execute.assert_called_once()
+    assert [contact.id for contact in returned_contacts] == [2, 1]
+
+
+def test_cursor_round_trip():
+  contact = Contact(id=7, first_name="Jane", last_name="Doe")
+  assert decode_cursor(encode_cursor(contact)) == ("Doe", "Jane", 7)
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor(Contact(id=None, first_name="a", last_name="b"))])
+def test_decode_cursor_rejects_malformed(cursor):
+  with pytest.raises(ValueError):
+    decode_cursor(cursor)
+
+
+def test_birthday_doy_ignores_leap_days_after_february():
+  assert birthday_doy(date(1990, 3, 1)) == birthday_doy(date(1992, 3, 1)) == 61
+  assert birthday_doy(date(1992, 2, 29)) == 60
+
+
+def test_birthday_windows_within_year():
+  assert birthday_windows(date(2025, 3, 10), 7) == [(70, 77)]
+
+
+def test_birthday_windows_wraps_year_end():
+  assert birthday_windows(date(2025, 12, 28), 7) == [(363, 366), (1, 4)]
+
+
+def test_birthday_windows_feb_29_in_non_leap_year():
+  assert birthday_windows(date(2025, 2, 21), 7) == [(52, 60)]
+  assert birthday_windows(date(2024, 2, 21), 7) == [(52, 59)]
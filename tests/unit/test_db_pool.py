@@ -0,0 +1,99 @@
+import sqlite3
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+from database.db import DatabaseSessionManager, PoolStats, instrumented_pool
+from repository.versions import RecentWrites
+from services.query_budget import assert_query_budget, track_queries
+
+
+class TestInstrumentedPool:
+  def test_records_checkout_wait_and_timeouts(self):
+    stats = PoolStats()
+    pool_class = instrumented_pool(stats, base=QueuePool)
+    pool = pool_class(lambda: sqlite3.connect(":memory:"), pool_size=1, max_overflow=0, timeout=0.01)
+
+    connection = pool.connect()
+    with pytest.raises(TimeoutError):
+      pool.connect()
+    connection.close()
+
+    assert stats.checkouts == 1
+    assert stats.timeouts == 1
+    assert stats.as_dict()["wait_max_ms"] >= 0
+
+
+class TestReadReplicaRouting:
+  def setup_method(self):
+    self.manager = DatabaseSessionManager(
+      "sqlite+aiosqlite:///:memory:",
+      replica_urls=["sqlite+aiosqlite:///:memory:", "sqlite+aiosqlite:///:memory:"],
+      replica_cooldown=60,
+    )
+
+  @pytest.mark.asyncio
+  async def test_reads_go_to_least_busy_replica(self):
+    first, second = self.manager.replicas
+    first.in_flight = 3
+
+    async with self.manager.read_session() as session:
+      assert session.bind is second.engine
+      assert second.in_flight == 1
+    assert second.in_flight == 0
+
+  @pytest.mark.asyncio
+  async def test_recent_write_reads_from_primary(self):
+    async with self.manager.read_session(recent_write=True) as session:
+      assert session.bind is self.manager.engine
+
+  @pytest.mark.asyncio
+  async def test_failed_replica_is_skipped_until_cooldown(self):
+    first, second = self.manager.replicas
+    second.in_flight = 1
+    with pytest.raises(OSError):
+      async with self.manager.read_session():
+        raise ConnectionRefusedError()
+
+    assert not first.available
+    async with self.manager.read_session() as session:
+      assert session.bind is second.engine
+    second.mark_down(60)
+    async with self.manager.read_session() as session:
+      assert session.bind is self.manager.engine
+
+  @pytest.mark.asyncio
+  async def test_replica_reads_count_towards_query_budget(self):
+    for engine in self.manager.engines:
+      track_queries(engine)
+
+    with assert_query_budget(1) as log:
+      async with self.manager.read_session() as session:
+        assert session.bind is not self.manager.engine
+        await session.execute(text("SELECT 1"))
+
+    assert log.count == 1
+
+
+class TestRecentWrites:
+  @pytest.mark.asyncio
+  async def test_local_mark_skips_redis(self):
+    redis = AsyncMock()
+    writes = RecentWrites("contacts", window=5)
+
+    await writes.mark(redis, 1)
+
+    assert await writes.check(redis, 1)
+    redis.set.assert_called_once_with("recent-write:contacts:1", 1, px=5000)
+    redis.exists.assert_not_called()
+
+  @pytest.mark.asyncio
+  async def test_other_workers_check_redis(self):
+    redis = AsyncMock()
+    redis.exists.return_value = 0
+
+    assert not await RecentWrites("contacts", window=5).check(redis, 1)
+    redis.exists.assert_called_once_with("recent-write:contacts:1")
@@ -0,0 +1,16 @@
+from services.etags import etag_matches, make_etag
+
+
+def test_make_etag_includes_user_and_parts():
+  assert make_etag(1, 5) == 'W/"1.5"'
+  assert make_etag(1, 5, "2025-03-10") == 'W/"1.5.2025-03-10"'
+
+
+def test_etag_matches_weakly_against_a_list():
+  etag = make_etag(1, 5)
+
+  assert etag_matches('"1.4", W/"1.5"', etag)
+  assert etag_matches('"1.5"', etag)
+  assert etag_matches("*", etag)
+  assert not etag_matches('W/"1.4"', etag)
+  assert not etag_matches(None, etag)
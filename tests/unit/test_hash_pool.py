@@ -0,0 +1,50 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from services.auth import HashPool
+
+
+class TestHashPool:
+  @pytest.mark.asyncio
+  async def test_run_returns_result(self):
+    pool = HashPool(workers=2, max_pending=4)
+
+    assert await pool.run(pow, 2, 10) == 1024
+    assert pool.stats()["pending"] == 0
+
+  @pytest.mark.asyncio
+  async def test_run_rejects_when_full(self):
+    pool = HashPool(workers=1, max_pending=1)
+    release = threading.Event()
+    busy = asyncio.ensure_future(pool.run(release.wait))
+    await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as exc_info:
+      await pool.run(pow, 2, 10)
+
+    release.set()
+    await busy
+    assert exc_info.value.status_code == 503
+    assert pool.stats()["rejected"] == 1
+
+  @pytest.mark.asyncio
+  async def test_cancelled_caller_keeps_its_slot_until_the_job_ends(self):
+    pool = HashPool(workers=1, max_pending=1)
+    release = threading.Event()
+    busy = asyncio.ensure_future(pool.run(release.wait))
+    await asyncio.sleep(0)
+    busy.cancel()
+    await asyncio.sleep(0)
+
+    try:
+      with pytest.raises(HTTPException):
+        # Bounded, so an accepted call fails the test instead of waiting forever.
+        await asyncio.wait_for(pool.run(pow, 2, 10), 1)
+    finally:
+      release.set()
+    while pool.stats()["pending"]:
+      await asyncio.sleep(0.01)
+    assert await pool.run(pow, 2, 10) == 1024
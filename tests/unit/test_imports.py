@@ -0,0 +1,24 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+
+@pytest.mark.parametrize("module", ["services.auth", "api.users", "main"])
+def test_heavy_subsystems_load_lazily(module):
+  # A fresh interpreter, so modules imported by other tests do not count.
+  code = (
+    f"import sys, {module}; "
+    "loaded = [m for m in ('cloudinary', 'aioredis', 'slowapi') if m in sys.modules]; "
+    "assert not loaded, loaded; "
+    f"assert {module!r} == 'main' or 'main' not in sys.modules, 'app graph imported'"
+  )
+  subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_config_imports_without_environment(tmp_path):
+  # Outside the repo, so no .env is loaded either.
+  code = "import conf.config"
+  env = {"PYTHONPATH": str(Path(__file__).parents[2])}
+  subprocess.run([sys.executable, "-c", code], check=True, env=env, cwd=tmp_path)
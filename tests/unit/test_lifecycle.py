@@ -0,0 +1,85 @@
+import asyncio
+import signal
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.pool import QueuePool
+
+from services.lifecycle import InFlightRequests, _open_connections, delay_shutdown_signal
+
+
+class TestInFlightRequests:
+  @pytest.mark.asyncio
+  async def test_drain_waits_for_running_requests(self):
+    tracker = InFlightRequests()
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+      await release.wait()
+
+    request = asyncio.create_task(tracker.middleware(app)({"type": "http"}, None, None))
+    await asyncio.sleep(0)
+    assert tracker.count == 1
+    assert not await tracker.drain(timeout=0.01)
+
+    release.set()
+    assert await tracker.drain(timeout=1)
+    await request
+    assert tracker.count == 0
+
+  @pytest.mark.asyncio
+  async def test_drain_returns_at_once_when_idle(self):
+    assert await InFlightRequests().drain(timeout=0)
+
+
+class TestDelayShutdownSignal:
+  @pytest.mark.asyncio
+  async def test_readiness_goes_off_before_the_server_sees_the_signal(self):
+    app = SimpleNamespace(state=SimpleNamespace(ready=True))
+    forwarded = []
+    previous = signal.signal(signal.SIGTERM, lambda signum, frame: forwarded.append(signum))
+    try:
+      restore = delay_shutdown_signal(app, 0.05)
+      signal.raise_signal(signal.SIGTERM)
+      await asyncio.sleep(0)
+
+      assert app.state.ready is False
+      assert forwarded == []
+      await asyncio.sleep(0.1)
+      assert forwarded == [signal.SIGTERM]
+      restore()
+    finally:
+      signal.signal(signal.SIGTERM, previous)
+
+  @pytest.mark.asyncio
+  async def test_no_delay_keeps_the_server_handler(self):
+    handler = signal.getsignal(signal.SIGTERM)
+    restore = delay_shutdown_signal(SimpleNamespace(state=SimpleNamespace()), 0)
+    assert signal.getsignal(signal.SIGTERM) is handler
+    restore()
+
+
+class TestOpenConnections:
+  @pytest.mark.asyncio
+  async def test_a_failed_check_releases_the_other_connections(self):
+    opened, closed = [], []
+
+    class Connection:
+      async def execute(self, statement):
+        if len(opened) == 3:
+          raise ConnectionError("refused")
+
+    @asynccontextmanager
+    async def connect():
+      opened.append(1)
+      try:
+        yield Connection()
+      finally:
+        closed.append(1)
+
+    engine = SimpleNamespace(pool=QueuePool(lambda: None, pool_size=3), connect=connect)
+
+    with pytest.raises(ConnectionError):
+      await asyncio.wait_for(_open_connections(engine, 3), timeout=1)
+    assert len(closed) == 3
@@ -0,0 +1,20 @@
+from services.metrics import Metrics, RequestStats
+
+
+class TestMetrics:
+  def test_render_histogram_and_attribution(self):
+    metrics = Metrics()
+    stats = RequestStats()
+    stats.db_statements = 2
+    stats.redis_commands = 1
+
+    metrics.observe("GET", "/api/contacts/{contact_id}", 200, 0.02, stats)
+    metrics.observe("GET", "/api/contacts/{contact_id}", 200, 3.0, RequestStats())
+    text = metrics.render()
+
+    labels = 'method="GET",route="/api/contacts/{contact_id}",status="200"'
+    assert f'http_request_duration_seconds_bucket{{{labels},le="0.025"}} 1' in text
+    assert f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in text
+    assert f"http_request_duration_seconds_count{{{labels}}} 2" in text
+    assert f"http_request_db_statements_total{{{labels}}} 2" in text
+    assert f"http_request_redis_commands_total{{{labels}}} 1" in text
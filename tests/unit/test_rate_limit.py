@@ -0,0 +1,42 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from services.rate_limit import RateLimiter, parse_rate
+
+def test_parse_rate():
+  assert parse_rate("10/minute") == (10, 60)
+  assert parse_rate("100/seconds") == (100, 1)
+  with pytest.raises(ValueError):
+    parse_rate("10/fortnight")
+  with pytest.raises(ValueError):
+    parse_rate("0/minute")
+
+
+class TestRateLimiter:
+  def setup_method(self):
+    self.script = AsyncMock()
+    self.redis = MagicMock()
+    self.redis.register_script.return_value = self.script
+    self.limiter = RateLimiter()
+
+  @pytest.mark.asyncio
+  async def test_lease_is_spent_locally(self):
+    self.script.return_value = [3, 0]
+
+    results = [await self.limiter.hit(self.redis, "ip:1", 60, 60, local_burst=3) for _ in range(3)]
+
+    assert results == [0, 0, 0]
+    self.script.assert_called_once_with(keys=["ratelimit:ip:1"], args=[1.0, 60, 3])
+
+  @pytest.mark.asyncio
+  async def test_exhausted_bucket_returns_retry_after(self):
+    self.script.return_value = [0, 7]
+
+    assert await self.limiter.hit(self.redis, "ip:1", 10, 60) == 7
+
+  @pytest.mark.asyncio
+  async def test_fails_open_without_redis(self):
+    self.script.side_effect = ConnectionError
+
+    assert await self.limiter.hit(self.redis, "ip:1", 10, 60) == 0
@@ -0,0 +1,34 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+from fastapi import Response
+
+from schemas import ContactResponse
+from services.serializers import contacts_response, dump_contacts
+
+
+def make_contact(id, birthday):
+  return SimpleNamespace(
+    id=id, first_name="John", last_name="Doe", email="john@example.com", phone="1", birthday=birthday, user_id=1
+  )
+
+
+def test_dump_contacts_matches_response_model():
+  contacts = [make_contact(1, datetime(1990, 1, 1, 12, 30)), make_contact(2, None)]
+
+  expected = [ContactResponse.model_validate(c).model_dump(mode="json") for c in contacts]
+
+  assert json.loads(dump_contacts(contacts)) == expected
+
+
+def test_contacts_response_keeps_route_headers():
+  route_response = Response()
+  del route_response.headers["content-length"]
+  route_response.headers["ETag"] = 'W/"1.2"'
+
+  response = contacts_response([make_contact(1, None)], route_response)
+
+  assert response.headers["etag"] == 'W/"1.2"'
+  assert response.headers["content-type"] == "application/json"
+  assert json.loads(response.body)[0]["id"] == 1
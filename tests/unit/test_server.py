@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from conf.config import config
+from server import SHARED_WARMUP_DONE_ENV, Worker, options
+from services import lifecycle
+
+
+def test_options_come_from_config():
+  settings = options()
+
+  assert settings["workers"] == config.SERVER_WORKERS
+  assert settings["max_requests"] == config.SERVER_MAX_REQUESTS
+  assert settings["max_requests_jitter"] == config.SERVER_MAX_REQUESTS_JITTER
+  assert settings["worker_class"] is Worker
+  assert settings["graceful_timeout"] >= config.SHUTDOWN_READY_DELAY + config.SHUTDOWN_DRAIN_SECONDS
+
+
+def test_worker_prefers_fast_loop_and_parser():
+  assert Worker.CONFIG_KWARGS["loop"] == "auto"
+  assert Worker.CONFIG_KWARGS["http"] == "auto"
+  assert Worker.CONFIG_KWARGS["lifespan"] == "on"
+
+
+
+def test_preload_is_off_by_default(tmp_path):
+  # HUP reloads only pick up new code when workers import the app themselves.
+  env = {key: value for key, value in os.environ.items() if key != "SERVER_PRELOAD"}
+  env["PYTHONPATH"] = str(Path(__file__).parents[2])
+  code = "from conf.config import config; assert not config.SERVER_PRELOAD"
+  subprocess.run([sys.executable, "-c", code], check=True, env=env, cwd=tmp_path)
+
+
+def test_master_leaves_app_modules_to_the_workers():
+  # HUP forks workers from the master, so whatever it imported would be stale.
+  code = (
+    "import subprocess, sys, types, server; "
+    "subprocess.run = lambda *args, **kwargs: types.SimpleNamespace(returncode=0); "
+    "server.on_starting(types.SimpleNamespace(cfg=types.SimpleNamespace(workers=1, preload_app=False))); "
+    "loaded = [m for m in ('conf.config', 'database.db', 'services.lifecycle', 'main') if m in sys.modules]; "
+    "assert not loaded, loaded"
+  )
+  subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_shared_warmup_flag_matches_the_workers():
+  assert SHARED_WARMUP_DONE_ENV == lifecycle.SHARED_WARMUP_DONE_ENV
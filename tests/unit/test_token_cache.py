@@ -0,0 +1,35 @@
+import time
+
+from services.auth import TokenCache
+
+
+class TestTokenCache:
+  def test_hit_and_miss(self):
+    cache = TokenCache(maxsize=10)
+    payload = {"sub": "user", "exp": time.time() + 60}
+
+    assert cache.get("token") is None
+    cache.put("token", payload)
+
+    assert cache.get("token") == payload
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+  def test_expired_entry_is_dropped(self):
+    cache = TokenCache(maxsize=10)
+    cache.put("token", {"sub": "user", "exp": time.time() - 1})
+
+    assert cache.get("token") is None
+    assert cache.stats()["size"] == 0
+
+  def test_evicts_least_recently_used(self):
+    cache = TokenCache(maxsize=2)
+    exp = time.time() + 60
+    cache.put("a", {"sub": "a", "exp": exp})
+    cache.put("b", {"sub": "b", "exp": exp})
+    cache.get("a")
+    cache.put("c", {"sub": "c", "exp": exp})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
@@ -0,0 +1,94 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from database.models import User
+from services.user_cache import UserCache, INVALIDATION_CHANNEL
+
+
+class TestUserCache:
+  def setup_method(self):
+    self.redis = AsyncMock()
+    self.cache = UserCache(ttl=3600, local_ttl=60, local_size=10)
+    self.user = User(id=1, username="testuser", email="test@example.com", avatar="a.png", confirmed=True)
+
+  @pytest.mark.asyncio
+  async def test_local_tier_skips_redis(self):
+    await self.cache.set(self.redis, self.user)
+
+    cached = await self.cache.get(self.redis, "testuser")
+
+    self.redis.get.assert_not_called()
+    assert cached.id == 1
+    assert cached.confirmed
+    assert self.cache.stats()["local_hits"] == 1
+
+  @pytest.mark.asyncio
+  async def test_redis_tier_fills_local_tier(self):
+    self.redis.get.return_value = '[1,"testuser","test@example.com","a.png","admin",true]'
+
+    first = await self.cache.get(self.redis, "testuser")
+    second = await self.cache.get(self.redis, "testuser")
+
+    self.redis.get.assert_called_once_with("user:v1:testuser")
+    assert first.role == "admin"
+    assert second == first
+
+  @pytest.mark.asyncio
+  async def test_invalidate_broadcasts(self):
+    await self.cache.set(self.redis, self.user)
+    self.redis.get.return_value = None
+
+    await self.cache.invalidate(self.redis, "testuser")
+
+    self.redis.delete.assert_called_once_with("user:v1:testuser")
+    self.redis.publish.assert_called_once_with(INVALIDATION_CHANNEL, "testuser")
+    assert await self.cache.get(self.redis, "testuser") is None
+
+  @pytest.mark.asyncio
+  async def test_warm_loads_active_users_missing_from_redis(self):
+    other = User(id=2, username="other", email="other@example.com", avatar="b.png", confirmed=True)
+    self.redis.zrevrange.return_value = ["testuser", "other"]
+    self.redis.mget.return_value = ['[1,"testuser","test@example.com","a.png","user",true]', None]
+    loaded = []
+
+    async def load(usernames):
+      loaded.append(usernames)
+      return [other]
+
+    assert await self.cache.warm(self.redis, 10, load) == 2
+    assert loaded == [["other"]]
+    assert (await self.cache.get(self.redis, "testuser")).id == 1
+    assert (await self.cache.get(self.redis, "other")).id == 2
+    self.redis.get.assert_not_called()
+
+  @pytest.mark.asyncio
+  async def test_listen_resubscribes_after_a_connection_error(self):
+    await self.cache.set(self.redis, self.user)
+    resubscribed = asyncio.Event()
+
+    async def lost():
+      raise ConnectionError("connection reset")
+      yield
+
+    async def invalidations():
+      resubscribed.set()
+      yield {"type": "message", "data": "other"}
+      await asyncio.Event().wait()
+
+    first, second = MagicMock(), MagicMock()
+    for pubsub, messages in ((first, lost), (second, invalidations)):
+      pubsub.subscribe, pubsub.unsubscribe, pubsub.close = AsyncMock(), AsyncMock(), AsyncMock()
+      pubsub.listen = messages
+    self.redis.pubsub = MagicMock(side_effect=[first, second])
+
+    listener = asyncio.create_task(self.cache.listen(self.redis, retry_min=0))
+    await asyncio.wait_for(resubscribed.wait(), 1)
+    listener.cancel()
+    await listener
+
+    first.close.assert_called_once()
+    second.subscribe.assert_called_once_with(INVALIDATION_CHANNEL)
+    # Invalidations missed while unsubscribed cannot be replayed.
+    assert self.cache.stats()["local_size"] == 0